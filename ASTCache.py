@@ -0,0 +1,202 @@
+# Content addressed on-disk cache of parsed programs. An entry is keyed by a hash of the source text and of the
+# compiler modules that build the tree, so editing either one misses. Entries are the pickled nodes, read back
+# without running the Lexer or the Parser. The directory is kept under a size limit by deleting the least
+# recently used entries, a hit touches its entry's mtime.
+import gc
+import hashlib
+import os
+import pickle
+from collections import Counter
+
+import ASTNodes as ast
+import Lexer as lex
+import Parser
+
+# Bumped whenever the layout of an entry changes
+FormatVersion = 2
+# Modules whose code decides what tree a source parses to
+CompilerModules = (lex, Parser, ast)
+# Digest of FormatVersion and CompilerModules, see compilerVersion()
+CompilerDigest = None
+
+def compilerVersion():
+    '''Digest of the files of the modules the tree comes from, hashed once per process'''
+    global CompilerDigest
+    if CompilerDigest is None:
+        digest = hashlib.blake2b(str(FormatVersion).encode(), digest_size=16)
+        for module in CompilerModules:
+            with open(module.__file__, 'rb') as file:
+                digest.update(file.read())
+        CompilerDigest = digest.digest()
+    return CompilerDigest
+
+def sourceKey(source):
+    '''Hex key of a source (str, bytes or a memory map) for this compiler'''
+    digest = hashlib.blake2b(compilerVersion(), digest_size=20)
+    digest.update(source.encode('utf-8') if isinstance(source, str) else source)
+    return digest.hexdigest()
+
+def flatten(root, symbols):
+    '''Picklable data of a tree and the names of its symbols. The nodes are listed children first, so pickling
+    them only ever meets nodes it has already written and trees of any depth pickle without deep recursion.
+    Lazy function bodies are parsed, see ast.fields()'''
+    order = []
+    pending = [root]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, list):
+            pending.extend(item for item in node if item is not None)
+            continue
+        order.append(node)
+        pending.extend(value for _, value in ast.fields(node) if isinstance(value, (ast.ASTNode, list)))
+    order.reverse()
+    first = symbols.firstIdentifier
+    return (FormatVersion, order, symbols.names[first:], symbols.kinds[first:])
+
+def unflatten(data, symbols=None):
+    '''Tree and SymbolPool of data from flatten(). With a symbols pool the names are interned into it and the
+    ids the tree refers to are translated'''
+    version, order, names, kinds = data
+    if version != FormatVersion:
+        raise ValueError(f"AST cache entry of version {version}")
+    if symbols is None:
+        symbols = lex.SymbolPool()
+    first = symbols.firstIdentifier
+    if len(symbols) + 1 == first:
+        # A pool holding only the reserved words takes the names with the ids they were stored with
+        symbols.ids.update(zip(names, range(first, first + len(names))))
+        symbols.names.extend(names)
+        symbols.kinds.extend(kinds)
+        return order[-1], symbols
+    translate = [symbols.intern(name, kind) for name, kind in zip(names, kinds)]
+    if translate != list(range(first, first + len(translate))):
+        # Nodes shared by a HashCons.NodeFactory are listed once per use, each is translated once
+        for node in {id(node) : node for node in order}.values():
+            symbol = getattr(node, 'symbol', 0)
+            if symbol >= first:
+                node.symbol = translate[symbol - first]
+    return order[-1], symbols
+
+
+class ASTCache():
+    '''Parsed programs stored under directory, at most maxBytes of them. stats counts hits, misses, writes,
+    evictions and unreadable entries'''
+    def __init__(self, directory, maxBytes=256 << 20):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.stats = Counter()
+        # Bytes in the directory, only known after the first scan
+        self.size = None
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.ast')
+
+    def load(self, key, symbols=None):
+        '''(tree, symbols) stored under key, or None on a miss'''
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+            # Every node loaded stays alive, collections started while loading would only cost time
+            collecting = gc.isenabled()
+            gc.disable()
+            try:
+                data = pickle.loads(data)
+            finally:
+                if collecting:
+                    gc.enable()
+            root, symbols = unflatten(data, symbols)
+        except FileNotFoundError:
+            self.stats['misses'] += 1
+            return None
+        except (OSError, EOFError, ValueError, TypeError, KeyError, IndexError, AttributeError,
+                pickle.UnpicklingError):
+            # Written by another compiler or cut short, parsed again and replaced
+            self.stats['misses'] += 1
+            self.stats['unreadable'] += 1
+            return None
+        self.stats['hits'] += 1
+        try:
+            # The mtime is the recency eviction goes by
+            os.utime(path)
+        except OSError:
+            pass
+        return root, symbols
+
+    def store(self, key, root, symbols):
+        data = pickle.dumps(flatten(root, symbols), pickle.HIGHEST_PROTOCOL)
+        path = self.path(key)
+        # Written next to the entry and renamed, so concurrent compilers never read half an entry
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, 'wb') as file:
+                file.write(data)
+            os.replace(temporary, path)
+        except OSError:
+            return
+        self.stats['writes'] += 1
+        if self.size is not None:
+            self.size += len(data)
+        if self.size is None or self.size > self.maxBytes:
+            self.evict()
+
+    def evict(self):
+        '''Deletes the least recently used entries until the directory fits in maxBytes'''
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith('.ast'):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        self.size = sum(size for _, size, _ in entries)
+        entries.sort()
+        for _, size, path in entries:
+            if self.size <= self.maxBytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
+            self.stats['evictions'] += 1
+
+    def parse(self, source, symbols=None, **options):
+        '''(tree, symbols, hit) of source, parsed with Parser(source, **options) on a miss. Only programs without
+        syntax errors are stored, so a hit is the tree any other parser options give. Storing a tree reads all
+        of it, so a miss parses function bodies right away even when lazy is asked for. A hit can give neither a
+        FlatAST nor nodes shared with a HashCons factory, so flat and factory are refused'''
+        if options.get('flat') or options.get('factory') is not None:
+            raise ValueError("the AST cache only holds object trees, parse with flat=False and factory=None")
+        key = sourceKey(source)
+        cached = self.load(key, symbols)
+        if cached is not None:
+            return cached + (True,)
+        # An eager parse reports the syntax errors of every body before the tree is stored
+        parser = Parser.Parser(source, symbols=symbols, **dict(options, lazy=False))
+        parser.Parse()
+        if not parser.diagnostics:
+            self.store(key, parser.ASTroot, parser.symbols)
+        return parser.ASTroot, parser.symbols, False
+
+    def parse_path(self, path, symbols=None, **options):
+        '''parse() of a source file, a hit costs one read of the file and one of its entry'''
+        with open(path, 'rb') as file:
+            source = file.read()
+        return self.parse(source, symbols, **options)
+
+    def hitRate(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+    def clear(self):
+        '''Deletes every entry'''
+        saved, self.maxBytes = self.maxBytes, -1
+        try:
+            self.evict()
+        finally:
+            self.maxBytes = saved
+        self.size = 0
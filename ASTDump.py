@@ -0,0 +1,217 @@
+# Streaming dumps of object trees to any file-like object, in three formats: the indented text PrintNodesVisitor
+# prints, JSON Lines with one node per line, and S-expressions. Everything goes out through one Writer that hands
+# the file large chunks, the dump of a whole tree is never held in memory. readJSON() and loadJSON() read the
+# JSON form back, a record or a node at a time. Trees of any depth dump and load without recursion.
+# Usage:  python ASTDump.py [source] [text|json|sexp]
+import io
+import json
+import sys
+
+import ASTNodes as ast
+import ASTWalker
+import Lexer as lex
+
+# Characters a Writer collects before it writes them to its file
+BufferSize = 1 << 16
+
+# Slots that are not dumped. A lazy function's body is dumped parsed, as its block
+IgnoredFields = ('bodyParser', 'structuralHash')
+# Per node kind, the fields dumped, in slot order
+DumpFields = [tuple(name for name in cls.fieldNames if name not in IgnoredFields) for cls in ast.NodeKinds]
+# Node class by name. Of the two ASTHeightNode classes this keeps the later one, the one the Parser builds
+Classes = {cls.__name__ : cls for cls in ast.NodeKinds}
+
+class Writer():
+    '''Collects text and writes it to file about size characters at a time. A binary file gets the text as UTF-8'''
+    def __init__(self, file, size=BufferSize):
+        self.file = file
+        self.size = size
+        self.binary = isinstance(file, (io.RawIOBase, io.BufferedIOBase))
+        self.parts = []
+        self.length = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.length += len(text)
+        if self.length >= self.size:
+            self.flush()
+
+    def flush(self):
+        '''Writes out what was collected, the file itself is not flushed'''
+        text = ''.join(self.parts)
+        self.parts.clear()
+        self.length = 0
+        if text:
+            self.file.write(text.encode('utf-8') if self.binary else text)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.flush()
+
+
+class TextDumper(ast.PrintNodesVisitor):
+    '''PrintNodesVisitor writing its lines to a Writer, line for line what print() gives'''
+    def __init__(self, writer):
+        super().__init__()
+        self.writer = writer
+        # Indent of each tab count met so far, with print()'s separating space
+        self.indents = {}
+
+    def line(self, *values):
+        indent = self.indents.get(self.tab_count)
+        if indent is None:
+            indent = self.indents[self.tab_count] = '\t' * self.tab_count + ' '
+        write = self.writer.write
+        write(indent)
+        write(' '.join(map(str, values)) + '\n')
+
+def preorder(root):
+    '''(node, depth, field) of root and every node under it in preorder, field is the parent's field holding the
+    node, None for root. Lazy function bodies are parsed'''
+    stackFields = ASTWalker.StackFields
+    Node = ast.ASTNode
+    pending = [(root, 0, None)]
+    pop, push = pending.pop, pending.append
+    while pending:
+        entry = pop()
+        yield entry
+        node, depth, _ = entry
+        depth += 1
+        for name in stackFields[node.kind]:
+            value = getattr(node, name)
+            if value.__class__ is list:
+                for item in reversed(value):
+                    if item is not None:
+                        push((item, depth, name))
+            elif isinstance(value, Node):
+                push((value, depth, name))
+
+def dumpText(root, file):
+    '''root in the indented layout of PrintNodesVisitor'''
+    with Writer(file) as writer:
+        ASTWalker.walk(root, TextDumper(writer))
+
+def encodeValue(value):
+    # The only field values JSON has no type for are TokenTypes
+    if value.__class__ is lex.TokenType:
+        return {'token' : value.name}
+    raise TypeError(f"{type(value).__name__} field value {value!r}")
+
+def decodeValue(record):
+    if len(record) == 1 and 'token' in record:
+        return lex.TokenType[record['token']]
+    return record
+
+def dumpJSON(root, file):
+    '''root as JSON Lines, a record per node in preorder: its depth, the parent's field it is in, the node's class
+    name and its fields. List fields are written as [] and filled by the records of their items, fields holding
+    None are left out and TokenType values are {"token": name}'''
+    encode = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, default=encodeValue).encode
+    Node = ast.ASTNode
+    with Writer(file) as writer:
+        write = writer.write
+        for node, depth, field in preorder(root):
+            record = {'depth' : depth, 'field' : field, 'node' : type(node).__name__}
+            for name in DumpFields[node.kind]:
+                value = getattr(node, name)
+                if value is None or isinstance(value, Node):
+                    continue
+                record[name] = [] if value.__class__ is list else value
+            write(encode(record) + '\n')
+
+def readJSON(file):
+    '''The records of a dumpJSON() file one line at a time, as dicts with their TokenType values decoded'''
+    decode = json.JSONDecoder(object_hook=decodeValue).decode
+    for line in file:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if line.strip():
+            yield decode(line)
+
+def loadJSON(file):
+    '''The tree of a dumpJSON() file. Only the path from the root to the last node read is kept aside'''
+    root = None
+    # The nodes from the root down to the last one read, by depth
+    path = []
+    for number, record in enumerate(readJSON(file), 1):
+        depth, field, name = record.pop('depth'), record.pop('field'), record.pop('node')
+        cls = Classes.get(name)
+        if cls is None or depth > len(path) or (depth == 0) != (root is None):
+            raise ValueError(f"AST dump line {number}: unexpected {name} at depth {depth}")
+        node = cls.__new__(cls)
+        try:
+            for key, value in record.items():
+                setattr(node, key, value)
+        except AttributeError:
+            raise ValueError(f"AST dump line {number}: {name} has no field {key}") from None
+        if depth:
+            del path[depth:]
+            parent = path[-1]
+            children = getattr(parent, field)
+            if children.__class__ is list:
+                children.append(node)
+            else:
+                setattr(parent, field, node)
+        else:
+            root = node
+        path.append(node)
+    return root
+
+def formatValue(value):
+    if value.__class__ is str:
+        return json.dumps(value, ensure_ascii=False)
+    if value.__class__ is lex.TokenType:
+        return value.name
+    return str(value)
+
+def dumpSExpression(root, file):
+    '''root as an S-expression, a node per line indented by depth: (class :field value ... :child (...)). List
+    fields are written as :field ( items ) with an item per line'''
+    stackFields = ASTWalker.StackFields
+    Node = ast.ASTNode
+    # The stack holds (node, depth, label) to write a node, or text to write as it is
+    pending = [(root, 0, '')]
+    pop, push = pending.pop, pending.append
+    with Writer(file) as writer:
+        write = writer.write
+        while pending:
+            entry = pop()
+            if entry.__class__ is str:
+                write(entry)
+                continue
+            node, depth, label = entry
+            write(f"{label}({type(node).__name__}")
+            for name in DumpFields[node.kind]:
+                value = getattr(node, name)
+                if value is not None and value.__class__ is not list and not isinstance(value, Node):
+                    write(f" :{name} {formatValue(value)}")
+            push(')\n' if depth == 0 else ')')
+            indent = '\n' + '  ' * (depth + 1)
+            for name in stackFields[node.kind]:
+                value = getattr(node, name)
+                if value.__class__ is list:
+                    push(')')
+                    itemIndent = indent + '  '
+                    for item in reversed(value):
+                        if item is not None:
+                            push((item, depth + 2, itemIndent))
+                    push(f"{indent}:{name} (")
+                elif isinstance(value, Node):
+                    push((value, depth + 1, f"{indent}:{name} "))
+
+# Dump function of each format name
+Formats = {'text' : dumpText, 'json' : dumpJSON, 'sexp' : dumpSExpression}
+
+def dump(root, file, format='text'):
+    '''root written to file in one of Formats'''
+    Formats[format](root, file)
+
+
+if __name__ == '__main__':
+    import Parser
+
+    parser = Parser.Parser.from_path(sys.argv[1] if len(sys.argv) > 1 else './something.txt')
+    parser.Parse()
+    dump(parser.ASTroot, sys.stdout, sys.argv[2] if len(sys.argv) > 2 else 'text')
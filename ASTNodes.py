@@ -1,325 +1,436 @@
+from contextlib import contextmanager
+from enum import Enum
 
 import Lexer as lex
 
 #First some AST Node classes we'll use to build the AST with
+# Every node class by its kind, see ASTNode.kind
+NodeKinds = []
+
 class ASTNode:
+    # Nodes keep their attributes in slots, no per instance __dict__. offset is the source offset of the node's
+    # first token, set by the Parser. Line/column come from Lexer.lines() on demand
+    __slots__ = ('offset',)
+    # Kind of node, shared by the class. name is kept for output, kind is a small integer that indexes NodeKinds
+    name = "ASTNode"
+    kind = 0
+    # Every slot of the class and its bases, in declaration order from the base down
+    slotNames = ('offset',)
+    # slotNames with a slot kept behind a property read through the property instead, '_block' as 'block'
+    fieldNames = ('offset',)
+
+    def __init_subclass__(cls, **options):
+        super().__init_subclass__(**options)
+        cls.kind = len(NodeKinds)
+        NodeKinds.append(cls)
+        cls.slotNames = tuple(name for base in reversed(cls.__mro__) for name in base.__dict__.get('__slots__', ()))
+        cls.fieldNames = tuple(name[1:] if isinstance(getattr(cls, name[1:], None), property) else name
+                               for name in cls.slotNames)
+
     def __init__(self):
-        self.name = "ASTNode"    
+        pass
+
+    def accept(self, visitor):
+        # Walks the node and everything under it for visitor, see ASTWalker
+        import ASTWalker
+        ASTWalker.walk(self, visitor)
+
+    def __getattr__(self, name):
+        # Only called for attributes not found, slots never assigned read as None like the class defaults they
+        # replace
+        if name in type(self).slotNames:
+            return None
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+NodeKinds.append(ASTNode)
+
+def fields(node):
+    '''(name, value) of every attribute of a node, what vars(node).items() gave before nodes had slots. A lazy
+    function's body is read as its block, which parses it'''
+    return [(name, getattr(node, name)) for name in type(node).fieldNames]
+
+# Tracers counting the nodes built, innermost last, see countingConstructedNodes()
+CountingTracers = []
+
+def wrapConstructors(enabled):
+    '''Wraps the constructor of every node class to count into the innermost of CountingTracers, or puts the
+    original constructors back'''
+    pending = [ASTNode]
+    while pending:
+        cls = pending.pop()
+        pending.extend(cls.__subclasses__())
+        init = cls.__dict__.get('__init__')
+        if init is None:
+            continue
+        original = getattr(init, 'uncounted', init)
+        if not enabled:
+            cls.__init__ = original
+            continue
+
+        def countedInit(self, *args, original=original, **kwargs):
+            if CountingTracers:
+                CountingTracers[-1].count('parser.nodes')
+            original(self, *args, **kwargs)
+        countedInit.uncounted = original
+        cls.__init__ = countedInit
+
+@contextmanager
+def countingConstructedNodes(tracer):
+    '''While the with block runs every AST node built adds one to the tracer's parser.nodes counter. The
+    constructors are wrapped when the outermost block starts and put back when it ends, so building nodes costs
+    nothing extra otherwise. Nodes built by other threads meanwhile are counted too'''
+    CountingTracers.append(tracer)
+    if len(CountingTracers) == 1:
+        wrapConstructors(True)
+    try:
+        yield
+    finally:
+        CountingTracers.pop()
+        if not CountingTracers:
+            wrapConstructors(False)
+
 class ASTProgramNode(ASTNode):
+    __slots__ = ('block',)
+    name = "ASTProgramNode"
+
     def __init__(self, block):
-        self.name = "ASTProgramNode"
         self.block = block
-    
-    def accept(self, visitor):
-        visitor.visit_program_node(self)
 
 class ASTStatementNode(ASTNode):
+    __slots__ = ()
+    name = "ASTStatementNode"
+
     def __init__(self):
-        self.name = "ASTStatementNode"
+        pass
 
 class ASTExpressionNode(ASTNode):
+    # Most expression nodes only know their type once the semantic analyzer has run, until then it reads as None.
+    # structuralHash is set on the nodes a HashCons.NodeFactory shares
+    __slots__ = ('type', 'structuralHash')
+    name = "ASTExpressionNode"
+
     def __init__(self):
-        self.name = "ASTExpressionNode"
         self.type = None
 
 class ASTVariableNode(ASTExpressionNode):
-    def __init__(self, lexeme):
-        self.name = "ASTVariableNode"
-        self.lexeme = lexeme
+    __slots__ = ('lexeme', 'symbol')
+    name = "ASTVariableNode"
 
-    def accept(self, visitor):
-        visitor.visit_variable_node(self)
+    def __init__(self, lexeme, symbol=0):
+        self.lexeme = lexeme
+        # SymbolPool id of the name, the key used by the semantic analyzer
+        self.symbol = symbol
 
 class ASTUnaryNode(ASTExpressionNode):
-    def __init__(self, lexeme):
-        self.name = "ASTUnaryNode"
-        self.lexeme = lexeme
+    __slots__ = ('lexeme', 'expr')
+    name = "ASTUnaryNode"
 
-    def accept(self, visitor):
-        visitor.visit_unary_node(self)
+    def __init__(self, lexeme, expr=None):
+        # The operator, '-' or 'not'
+        self.lexeme = lexeme
+        self.expr = expr
 
 class ASTFactorNode(ASTExpressionNode):
+    __slots__ = ('lexeme',)
+    name = "ASTFactorNode"
+
     def __init__(self, lexeme, type):
-        self.name = "ASTFactorNode"
         self.lexeme = lexeme
         self.type = type
-    
-    def accept(self, visitor):
-        visitor.visit_factor_node(self)
 
 class ASTSimpleExpNode(ASTExpressionNode):
+    __slots__ = ('adop', 'left', 'right')
+    name = "ASTAdopNode"
+
     def __init__(self, lhs, adop=None, rhs=None, type = None):
-        self.name = "ASTAdopNode"
         self.adop = adop
+        self.offset = getattr(lhs, 'offset', None)
         self.left = lhs 
         self.right = rhs
         self.type = type
-    
-    def accept(self, visitor):
-        visitor.visit_simpleexp_node(self)
 
 class ASTExpNode(ASTExpressionNode):
+    __slots__ = ('op', 'left', 'right')
+    name = "ASTExpNode"
+
     def __init__(self, lhs, type=None, op=None, rhs=None):
-        self.name = "ASTExpNode"
         self.op = op
+        self.offset = getattr(lhs, 'offset', None)
         self.left = lhs
         self.right = rhs
         self.type = type
 
-    def accept(self,visitor):
-        visitor.visit_exp_node(self)
-
 class ASTDeclareNode(ASTNode):
+    __slots__ = ('var', 'type')
+    name = "ASTDeclareNode"
+
     def __init__(self, var, type):
-        self.name = "ASTDeclareNode"
         self.var = var
         self.type = type
-    
-    def accept(self, visitor):
-        visitor.visit_declare_node(self)
 
 class ASTReturnNode(ASTNode):
+    __slots__ = ('expr', 'type')
+    name = "ASTReturnNode"
+
     def __init__(self, expr, type):
-        self.name = "ASTReturnNode"
         self.expr = expr
         self.type = type
-    
-    def accept(self, visitor):
-        visitor.visit_return_node(self)
 
 class ASTIfNode(ASTNode):
+    __slots__ = ('conds', 'block', 'elseBlock')
+    name = "ASTIfNode"
+
     def __init__(self, conds, block, elseBlock = None):
-        self.name = "ASTIfNode"
         self.conds = conds
         self.block = block
         self.elseBlock = elseBlock
-    
-    def accept(self, visitor):
-        visitor.visit_if_node(self)
         
 class ASTForNode(ASTNode):
+    __slots__ = ('init', 'cond', 'step', 'block')
+    name = "ASTForNode"
+
     def __init__(self, init, cond, step, block=None):
-        self.name = "ASTForNode"
         self.init = init
         self.cond = cond
         self.step = step
         self.block = block
-    
-    def accept(self, visitor):
-        visitor.visit_for_node(self)
 
 class ASTWhileNode(ASTNode):
+    __slots__ = ('expr', 'block')
+    name = "ASTWhileNode"
+
     def __init__(self, expr, block):
-        self.name = "ASTWhileNode"
         self.expr = expr
         self.block = block
 
-    def accept(self, visitor):
-        visitor.visit_while_node(self)
-
 class ASTWidthNode(ASTExpressionNode):
+    __slots__ = ()
+    name = "ASTWidthNode"
+
     def __init__(self):
-        self.name = "ASTWidthNode"
         self.type = lex.TokenType.Integer
-    
-    def accept(self, visitor):
-        visitor.visit_width_node(self)
 
 class ASTHeightNode(ASTExpressionNode):
+    __slots__ = ()
+    name = "ASTHeightNode"
+
     def __init__(self):
-        self.name = "ASTHeightNode"
         self.type = lex.TokenType.Integer
-    
-    def accept(self, visitor):
-        visitor.visit_height_node(self)
+
+class ASTRandNode(ASTExpressionNode):
+    __slots__ = ('expr',)
+    name = "ASTRandNode"
+
+    def __init__(self, expr):
+        self.expr = expr
+        self.type = lex.TokenType.Integer
 
 class ASTReadNode(ASTNode):
+    __slots__ = ()
+    name = "ASTWidthNode"
+
     def __init__(self, expr):
-        self.name = "ASTWidthNode"
-    
-    def accept(self, visitor):
-        visitor.visit_height_node(self)
+        pass
 
 class ASTHeightNode(ASTNode):
+    __slots__ = ()
+    name = "ASTWidthNode"
+
     def __init__(self):
-        self.name = "ASTWidthNode"
-    
-    def accept(self, visitor):
-        visitor.visit_height_node(self)
+        pass
 
 class ASTDelayNode(ASTNode):
+    __slots__ = ('expr',)
+    name = "ASTDelayNode"
+
     def __init__(self, val):
-          self.name = "ASTDelayNode"
           self.expr = val
-    def accept(self, visitor):
-          visitor.visit_delay_node(self)
 
 class ASTWriteBoxNode(ASTNode):
+    __slots__ = ('u', 'v', 'x', 'y', 'color')
+    name = "ASTWriteBoxNode"
+
     def __init__(self, u, v, x, y, color):
-          self.name = "ASTWriteBoxNode"
           self.u, self.v = u, v
           self.x, self.y = x, y
           self.color = color
 
-    def accept(self, visitor):
-          visitor.visit_writeBox_node(self)
-
 class ASTWriteNode(ASTNode):
+    __slots__ = ('u', 'v', 'color')
+    name = "ASTWriteNode"
+
     def __init__(self, u, v, color):
-          self.name = "ASTWriteNode"
           self.u, self.v = u, v
           self.color = color
 
-    def accept(self, visitor):
-          visitor.visit_write_node(self)
-
 class ASTPrintNode(ASTNode):
+      __slots__ = ('expr',)
+      name = "ASTPrintNode"
+
       def __init__(self, expr):
-          self.name = "ASTPrintNode"
           self.expr = expr
-      def accept(self, visitor):
-          visitor.visit_print_node(self)
 
 class ASTTermNode(ASTExpressionNode):
+    __slots__ = ('mulop', 'left', 'right')
+    name = "ASTTermNode"
+
     def __init__(self, lhs, mulop=None, rhs=None, type=None):
-        self.name = "ASTTermNode"
         self.mulop = mulop
+        self.offset = getattr(lhs, 'offset', None)
         self.left = lhs 
         self.right = rhs
         self.type = type
 
-    def accept(self, visitor):
-        visitor.visit_term_node(self)
-
 class ASTIntegerNode(ASTExpressionNode):
+    __slots__ = ('value',)
+    name = "ASTIntegerNode"
+
     def __init__(self, v):
-        self.name = "ASTIntegerNode"
         self.value = v
         self.type = lex.TokenType.Integer
-    def accept(self, visitor):
-        visitor.visit_integer_node(self)   
 
 class ASTColourNode(ASTExpressionNode):
+    __slots__ = ('colour',)
+    name = "ASTColourNode"
+
     def __init__(self, colour):
-        self.name = "ASTColourNode"
         self.colour = colour
         self.type = lex.TokenType.ColourLiteral
 
-    def accept(self, visitor):
-        visitor.visit_colour_node(self)
-
 class ASTFloatNode(ASTExpressionNode):
+    __slots__ = ('value',)
+    name = 'ASTFloatNode'
+
     def __init__(self,v):
-        self.name = 'ASTFloatNode'
         self.value = v  
         self.type = lex.TokenType.FloatLiteral 
-    
-    def accept(self, visitor):
-        visitor.visit_float_node(self)
 
 class ASTBoolNode(ASTExpressionNode):
+    __slots__ = ('value',)
+    name = "ASTBoolNode"
+
     def __init__(self, v : bool):
-        self.name = "ASTBoolNode"
         self.value = v
         self.type = lex.TokenType.BooleanLiteral 
 
-    def accept(self, visitor):
-        visitor.visit_bool_node(self)
-
 class ASTStringNode(ASTExpressionNode):
+    __slots__ = ('string',)
+    name = "ASTStringNode"
+
     def __init__ (self, string):
-        self.name = "ASTStringNode"
         self.string = string 
         self.type = lex.TokenType.String
-    
-    def accept(self, visitor):
-        visitor.visit_string_node(self)
  
 class ASTAssignmentNode(ASTNode):
+    __slots__ = ('id', 'expr')
+    name = "ASTAssignmentNode"
+
     def __init__(self, id, ast_expression_node):
-        self.name = "ASTAssignmentNode"        
         self.id   = id
         self.expr = ast_expression_node
 
-    def accept(self, visitor):
-        visitor.visit_assignment_node(self)       
-
 class ASTReAssignNode(ASTNode):
+    __slots__ = ('id', 'expr')
+    name = "ASTReAssignNode"
+
     def __init__(self, id, expr):
-        self.name = "ASTReAssignNode"
         self.id = id
         self.expr = expr
-    
-    def accept(self, visitor):
-        visitor.visit_reassign_node(self)
          
 
 class ASTActualParamsNode(ASTNode):
+    __slots__ = ('params',)
+    name = 'ASTActualParamsNode'
+
     def __init__(self):
-        self.name = 'ASTActualParamsNode'
         self.params = []
 
     def add_params(self, param):
         self.params.append(param)
-    
-    def accept(self, visitor):  
-        visitor.visit_actual_params_node(self)
 
 class ASTFormalParamNode(ASTNode):
-    def __init__(self, var, type):
-        self.name = "ASTFormalParamNode"
+    __slots__ = ('var', 'type', 'symbol')
+    name = "ASTFormalParamNode"
+
+    def __init__(self, var, type, symbol=0):
         self.var = var
         self.type = type
-    
-    def accept(self, visitor):
-        visitor.visit_formalparam_node(self)
+        self.symbol = symbol
 
 class ASTFormalParamsNode(ASTNode):
+    __slots__ = ('params',)
+    name = 'ASTActualParamsNode'
+
     def __init__(self):
-        self.name = 'ASTActualParamsNode'
         self.params = []
 
     def add_params(self, param):
         self.params.append(param)
-    
-    def accept(self, visitor):  
-        visitor.visit_formalparams_node(self)
 
 class ASTFunctionNode(ASTNode):
-    def __init__(self, name=None, params= ASTFormalParamsNode() ):
+    # name is the function's name, set by the Parser
+    __slots__ = ('name', 'symbol', 'params', 'returnType', '_block', 'bodyParser')
+
+    def __init__(self, name=None, params=None):
         self.name = "ASTFunctionNode"
+        self.symbol = 0
         # ASTFormalParams
-        self.params = params
+        self.params = ASTFormalParamsNode() if params is None else params
         self.returnType = None
         self.block : ASTBlockNode = None
+        # Set by a lazy Parser instead of block, parses the body the first time block is read
+        self.bodyParser = None
+
+    @property
+    def block(self):
+        if self.bodyParser is not None:
+            self._block = self.bodyParser()
+            self.bodyParser = None
+        return self._block
+
+    @block.setter
+    def block(self, block):
+        self._block = block
+        self.bodyParser = None
 
     def accept_params(self, visitor):
-        for x in self.params:
+        for x in self.params.params:
             x.accept(visitor)
 
-    def accept(self, visitor):
-        visitor.visit_func_node(self)
-
 class ASTFunctionCall(ASTNode):
+    # name is the called function's name, set by the Parser
+    __slots__ = ('name', 'symbol', 'params')
+
     def __init__(self, params = None):
         self.name = "ASTFunctionCall"
+        self.symbol = 0
         self.params = params
 
-    def accept(self, visitor):
-        visitor.visit_func_call(self)
+class ASTErrorNode(ASTNode):
+    __slots__ = ('message',)
+    name = "ASTErrorNode"
+    # Stands in for a statement the parser could not read when it recovers from syntax errors
+    def __init__(self, message):
+        self.message = message
 
 class ASTBlockNode(ASTNode):
+    __slots__ = ('stmts',)
+    name = "ASTBlockNode"
+
     def __init__(self):
-        self.name = "ASTBlockNode"
         self.stmts = []
 
     def add_statement(self, node):
         self.stmts.append(node)
 
-    def accept(self, visitor):
-        visitor.visit_block_node(self)   
+class Walk(Enum):
+    # Returned by a visit method to steer an ASTWalker.Walker, None carries on into the node's children
+    Skip = 1   # the children of the node are not visited for this visitor, its leave method still runs
+    Stop = 2   # this visitor gets no more calls, the walk ends once every visitor has stopped
 
 class ASTVisitor:
+    # One method per node kind, called by an ASTWalker.Walker, node.accept(visitor) walks node with one. A Walker
+    # leaves out the methods still raising NotImplementedError here
     def visit_integer_node(self, node):
         raise NotImplementedError()
 
@@ -352,6 +463,9 @@ class ASTVisitor:
     
     def visit_formalparams_node(self, node):
         raise NotImplementedError()
+
+    def visit_formalparam_node(self, node):
+        raise NotImplementedError()
     
     def visit_unary_node(self, node):
         raise NotImplementedError()
@@ -400,6 +514,12 @@ class ASTVisitor:
     
     def visit_bool_node(self, node):
         raise NotImplementedError()
+
+    def visit_error_node(self, node):
+        raise NotImplementedError()
+
+    def visit_return_node(self, node):
+        raise NotImplementedError()
     
     def inc_tab_count(self):
         raise NotImplementedError()
@@ -407,19 +527,21 @@ class ASTVisitor:
     def dec_tab_count(self):
         raise NotImplementedError()
     
-    def visit_declare_node(self):
+    def visit_declare_node(self, node):
         raise NotImplementedError()
     
-    def visit_if_node(self):
+    def visit_if_node(self, node):
         raise NotImplementedError()
     
-    def visit_while_node(self):
+    def visit_while_node(self, node):
         raise NotImplementedError()
     
-    def visit_for_node(self):
+    def visit_for_node(self, node):
         raise NotImplementedError()
 
 class PrintNodesVisitor(ASTVisitor):
+    # Driven by ASTWalker: every visit_*_node prints its node before the children are walked, leave_*_node runs
+    # after them and visit_field prints the labels between children.  ASTWalker.walk(root, PrintNodesVisitor())
     def __init__(self):
         self.name = "Print Tree Visitor"
         self.node_count = 0
@@ -428,276 +550,280 @@ class PrintNodesVisitor(ASTVisitor):
     def inc_tab_count(self):
         self.tab_count += 1
 
+    def dec_tab_count(self):
+        self.tab_count -= 1
+
+    def line(self, *values):
+        # Every line goes out through here, ASTDump.TextDumper writes them to a file instead
+        print('\t' * self.tab_count, *values)
+
+    def visit_field(self, node, field):
+        # Labels printed before the children held in field of node
+        if isinstance(node, ASTFunctionNode):
+            if field == 'block':
+                self.line("Return Type:: ", node.returnType)
+        elif isinstance(node, (ASTTermNode, ASTSimpleExpNode, ASTExpNode)):
+            if isinstance(node, ASTTermNode) or node.right:
+                self.line(field)
+        elif isinstance(node, ASTForNode):
+            if field != 'init':
+                self.dec_tab_count()
+            self.line(ForLabels[field])
+            self.inc_tab_count()
+        elif isinstance(node, ASTWhileNode):
+            if field == 'block':
+                self.dec_tab_count()
+        elif isinstance(node, ASTIfNode):
+            if field == 'elseBlock':
+                self.line("Else:: ")
+
     def visit_program_node(self, node):
         self.node_count += 1
-        print('\t' * self.tab_count, "Program Node => ")
+        self.line("Program Node => ")
         self.inc_tab_count()
-        node.block.accept(self)
-        self.dec_tab_count()
 
-    def dec_tab_count(self):
-        self.tab_count -= 1
+    def leave_program_node(self, node):
+        self.dec_tab_count()
         
     def visit_integer_node(self, int_node):
         self.node_count += 1
-        print('\t' * self.tab_count, "Integer value::", int_node.value)
+        self.line("Integer value::", int_node.value)
 
     def visit_float_node(self, float_node):
         self.node_count += 1
-        print('\t' * self.tab_count, "Float value::", float_node.value)
+        self.line("Float value::", float_node.value)
 
     def visit_func_node(self, func_node):
         self.node_count += 1
-        print('\t' * self.tab_count, "Function name::", func_node.name)
-        print('\t' * self.tab_count, "Parameters:: ")
-        func_node.params.accept(self)
-        print('\t' * self.tab_count, "Return Type:: ", func_node.returnType)
-        self.visit_block_node(func_node.block)
+        self.line("Function name::", func_node.name)
+        self.line("Parameters:: ")
 
     def visit_func_call(self, func_call):
         self.node_count += 1
-        print('\t' * self.tab_count, "Function Call =>")
+        self.line("Function Call =>")
         self.inc_tab_count()
-        print('\t' * self.tab_count, "Function Name ::", func_call.name)
-        print('\t' * self.tab_count, "Arguments:: ")
+        self.line("Function Name ::", func_call.name)
+        self.line("Arguments:: ")
         self.inc_tab_count()
-        for arg in func_call.params:
-            arg.accept(self)
+
+    def leave_func_call(self, func_call):
         self.dec_tab_count()
    
     def visit_bool_node(self, node):
         self.node_count += 1
-        print('\t' * self.tab_count, "Boolean value::", node.value)
+        self.line("Boolean value::", node.value)
         
     def visit_assignment_node(self, ass_node):
         self.node_count += 1
-        print('\t' * self.tab_count, "Assignment node => ")
+        self.line("Assignment node => ")
         self.inc_tab_count()        
-        ass_node.id.accept(self)
-        ass_node.expr.accept(self)
+
+    def leave_assignment_node(self, ass_node):
         self.dec_tab_count()
 
     def visit_reassign_node(self, node):
         self.node_count += 1
-        print('\t' * self.tab_count, "Reassignment node => ")
+        self.line("Reassignment node => ")
         self.inc_tab_count()        
-        node.id.accept(self)
-        node.expr.accept(self)
+
+    def leave_reassign_node(self, node):
         self.dec_tab_count()
  
     def visit_width_node(self, node):
         self.node_count += 1
         self.inc_tab_count()    
-        print('\t' * self.tab_count, "Width Constant")
+        self.line("Width Constant")
         self.dec_tab_count()
 
     def visit_height_node(self, node):
         self.node_count += 1
         self.inc_tab_count()    
-        print('\t' * self.tab_count, "Height Constant")
+        self.line("Height Constant")
         self.dec_tab_count()
 
     def visit_read_node(self, node):
         self.node_count += 1
         self.inc_tab_count()    
-        print('\t' * self.tab_count, "Read node")
+        self.line("Read node")
         self.dec_tab_count()
 
     def visit_print_node(self, node):
         self.node_count += 1
         self.inc_tab_count()    
-        print('\t' * self.tab_count, "Print Node =>")
+        self.line("Print Node =>")
         self.inc_tab_count()
-        node.expr.accept(self)
+
+    def leave_print_node(self, node):
         self.dec_tab_count()
 
-    def visit_read_node(self, node):
+    def visit_delay_node(self, node):
         self.node_count += 1
         self.inc_tab_count()    
-        print('\t' * self.tab_count, "Delay node :: ", node.val)
+        self.line("Delay node => ")
+
+    def leave_delay_node(self, node):
         self.dec_tab_count()
 
     def visit_write_node(self, node):
         self.node_count += 1
-        self.inc_tab_count()    
-        print('\t' * self.tab_count, "Write node =>")
+        self.inc_tab_count()
+        self.line("Write node =>")
         self.inc_tab_count()   
-        print('\t' * self.tab_count, "pos u ::", node.u)
-        print('\t' * self.tab_count, "pos v ::", node.v)
-        print('\t' * self.tab_count, "color::", node.color)
+        self.line("pos u ::", node.u)
+        self.line("pos v ::", node.v)
+        self.line("color::", node.color)
         self.dec_tab_count()
 
     def visit_writeBox_node(self, node):
         self.node_count += 1
-        print('\t' * self.tab_count, "Write Box node =>")
+        self.line("Write Box node =>")
         self.inc_tab_count()   
-        print('\t' * self.tab_count, "pos u ::", node.u)
-        print('\t' * self.tab_count, "pos v ::", node.v)
-        print('\t' * self.tab_count, "size x ::", node.x)
-        print('\t' * self.tab_count, "size y ::", node.y)    
-        print('\t' * self.tab_count, "color::", node.color)
+        self.line("pos u ::", node.u)
+        self.line("pos v ::", node.v)
+        self.line("size x ::", node.x)
+        self.line("size y ::", node.y)    
+        self.line("color::", node.color)
         self.dec_tab_count()
 
     def visit_unary_node(self, node):
-        pass
+        self.node_count += 1
+        self.line("Unary Operator => ", node.lexeme)
+        self.inc_tab_count()
+
+    def leave_unary_node(self, node):
+        self.dec_tab_count()
+
+    def visit_rand_node(self, node):
+        self.node_count += 1
+        self.line("Random Int =>")
+        self.inc_tab_count()
+
+    def leave_rand_node(self, node):
+        self.dec_tab_count()
 
     def visit_string_node(self, node):
         self.node_count += 1
         self.inc_tab_count()
-        print('\t' * self.tab_count, "String Value:: ", self.node.string)
+        self.line("String Value:: ", node.string)
         self.dec_tab_count()
 
     def visit_declare_node(self,node):
         self.node_count += 1
-        print('\t' * self.tab_count, "Declare node => ")
+        self.line("Declare node => ")
         self.inc_tab_count()
-        print('\t' * self.tab_count, "Type:: ", node.type)
-        node.var.accept(self)
+        self.line("Type:: ", node.type)
+
+    def leave_declare_node(self, node):
         self.dec_tab_count()
         
     def visit_colour_node(self, node):
         self.node_count += 1
-        print('\t' * self.tab_count, "Colour value::", node.colour)
+        self.line("Colour value::", node.colour)
 
     def visit_term_node(self, node):
         self.node_count += 1
-        # If not a singular factor
-        # if node.mulop and node.left and node.right:
-        print('\t' * self.tab_count, "Multiplicative Operator => ", node.mulop)
+        self.line("Multiplicative Operator => ", node.mulop)
         self.inc_tab_count()
-        print('\t' * self.tab_count, 'left')
-        node.left.accept(self)
-        print('\t' * self.tab_count, 'right')
-        node.right.accept(self)
+
+    def leave_term_node(self, node):
         self.dec_tab_count()
-        # else:
-        #     self.inc_tab_count()
-        #     node.left.accept(self)
-        #     self.dec_tab_count()
 
     def visit_return_node(self, node):
         self.node_count += 1
-        print('\t' * self.tab_count, "Return node => ")
+        self.line("Return node => ")
         self.inc_tab_count()
-        print('\t' * self.tab_count, "Return Type ::  ", node.type)
-        node.expr.accept(self)
+        self.line("Return Type ::  ", node.type)
+
+    def leave_return_node(self, node):
         self.dec_tab_count()
     
     def visit_for_node(self, node):
         self.node_count += 1
-        print('\t' * self.tab_count, "For node => ")
-        self.inc_tab_count()
-        print('\t' * self.tab_count, "Initialization::")
-        self.inc_tab_count()
-        node.init.accept(self)
-        self.dec_tab_count()
-        print('\t' * self.tab_count, "Condition::")
-        self.inc_tab_count()
-        node.cond.accept(self)
-        self.dec_tab_count()
-        print('\t' * self.tab_count, "Step::")
+        self.line("For node => ")
         self.inc_tab_count()
-        node.step.accept(self)
-        self.dec_tab_count()
-        print('\t' * self.tab_count, "Block::")
-        self.inc_tab_count()
-        node.block.accept(self)
+
+    def leave_for_node(self, node):
         self.dec_tab_count()
 
     def visit_while_node(self, node):
         self.node_count += 1
-        print('\t' * self.tab_count, "While Node =>")
-        print('\t' * self.tab_count, "Conditions:: ")
+        self.line("While Node =>")
+        self.line("Conditions:: ")
         self.inc_tab_count()
-        node.expr.accept(self)
-        self.dec_tab_count()
-        node.block.accept(self)
 
     def visit_if_node(self, node):
         self.node_count += 1
-        print('\t' * self.tab_count, "If Node =>")
-        print('\t' * self.tab_count, "Conditions:: ")
+        self.line("If Node =>")
+        self.line("Conditions:: ")
         self.inc_tab_count()
-        node.conds.accept(self)
-        node.block.accept(self)
-        
-        if node.elseBlock:
-            print('\t' * self.tab_count, "Else:: ")
-            node.elseBlock.accept(self)
+
+    def leave_if_node(self, node):
         self.dec_tab_count()
         
     def visit_simpleexp_node(self, node):
         self.node_count += 1
         # If not a singular Term
-        if node and node.left and node.right:
-            print('\t' * self.tab_count, "Additive Operator => ", node.adop)
-            self.inc_tab_count()
-            print('\t' * self.tab_count, 'left')
-            node.left.accept(self)
-            print('\t' * self.tab_count, 'right')
-            node.right.accept(self)
-            self.dec_tab_count()
-        # Print left single Term
-        else:
-            self.inc_tab_count()
-            node.left.accept(self)
-            self.dec_tab_count()
+        if node.right:
+            self.line("Additive Operator => ", node.adop)
+        self.inc_tab_count()
+
+    def leave_simpleexp_node(self, node):
+        self.dec_tab_count()
 
     def visit_exp_node(self, node):
         self.node_count += 1
-        print('\t' * self.tab_count, "Expression Node =>")
-        # print('\t' * self.tab_count, "of Type : ", node.type)
-        if node and node.left and node.right:
-            print('\t' * self.tab_count, "Expression Operator:: ", node.op)
-            self.inc_tab_count()
-            print('\t' * self.tab_count, 'left')
-            node.left.accept(self)
-            print('\t' * self.tab_count, 'right')
-            node.right.accept(self)
-            self.dec_tab_count()
-        else:
-            self.inc_tab_count()
-            node.left.accept(self)
-            self.dec_tab_count()
+        self.line("Expression Node =>")
+        if node.right:
+            self.line("Expression Operator:: ", node.op)
+        self.inc_tab_count()
+
+    def leave_exp_node(self, node):
+        self.dec_tab_count()
 
     def visit_actualparams_node(self, node):
         self.node_count += 1
         self.inc_tab_count()
+        return Walk.Skip
 
     def visit_formalparams_node(self, node):
         self.node_count += 1
         self.inc_tab_count()
-        print('\t' * self.tab_count, "Formal Parameters =>")
+        self.line("Formal Parameters =>")
         self.inc_tab_count()
-        for param in node.params:
-            param.accept(self)
+
+    def leave_formalparams_node(self, node):
         self.dec_tab_count()
         self.dec_tab_count()
     
     def visit_formalparam_node(self, node):
         self.node_count += 1
         self.inc_tab_count()
-        print('\t' * self.tab_count, "Formal Parameter :: ", node.var, " Type ::" , node.type)
+        self.line("Formal Parameter :: ", node.var, " Type ::" , node.type)
         self.dec_tab_count()
 
-
     def visit_factor_node(self, node):
         self.node_count += 1
         self.inc_tab_count()
-        node.lexeme.accept(self)
 
     def visit_variable_node(self, var_node):
         self.node_count += 1
-        print('\t' * self.tab_count, "Variable => ", var_node.lexeme)
+        self.line("Variable => ", var_node.lexeme)
+
+    def visit_error_node(self, node):
+        self.node_count += 1
+        self.line("Error :: ", node.message)
 
     def visit_block_node(self, block_node):
         self.node_count += 1
-        print('\t' * self.tab_count, "New Block => ")
+        self.line("New Block => ")
         self.inc_tab_count()
-        for st in block_node.stmts:
-            st.accept(self)
+
+    def leave_block_node(self, block_node):
         self.dec_tab_count()
 
+# Labels PrintNodesVisitor prints before each part of a for loop
+ForLabels = {'init' : "Initialization::", 'cond' : "Condition::", 'step' : "Step::", 'block' : "Block::"}
+
                 
 #Create a print visitor instance
 print_visitor = PrintNodesVisitor()
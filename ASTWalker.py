@@ -0,0 +1,224 @@
+# Walks object trees with an explicit stack instead of visit methods recursing into the children, node.accept()
+# is walk() of the node.
+# A visitor only handles the node it is given: the walker calls its visit_*_node method (the same names as
+# ASTVisitor) before the node's children and its leave_*_node method, when it has one, after them. What a visit
+# method returns steers the walk, see Walk. visit_node and leave_node, when a visitor has them, stand in for the
+# kinds it has no method for, and visit_field(node, field) is called before the children held in each field.
+# The methods of a visitor class are looked up once into tables indexed by ASTNode.kind. Several visitors
+# given to one Walker all run in a single pass over the tree.
+import ASTNodes as ast
+from ASTNodes import Walk
+
+Skip = Walk.Skip
+Stop = Walk.Stop
+
+# Name of the methods for each node class, after the visit_ or leave_ prefix
+MethodNames = {
+    'ASTProgramNode' : 'program_node',
+    'ASTVariableNode' : 'variable_node',
+    'ASTUnaryNode' : 'unary_node',
+    'ASTFactorNode' : 'factor_node',
+    'ASTSimpleExpNode' : 'simpleexp_node',
+    'ASTExpNode' : 'exp_node',
+    'ASTDeclareNode' : 'declare_node',
+    'ASTReturnNode' : 'return_node',
+    'ASTIfNode' : 'if_node',
+    'ASTForNode' : 'for_node',
+    'ASTWhileNode' : 'while_node',
+    'ASTWidthNode' : 'width_node',
+    'ASTHeightNode' : 'height_node',
+    'ASTRandNode' : 'rand_node',
+    'ASTReadNode' : 'read_node',
+    'ASTDelayNode' : 'delay_node',
+    'ASTWriteBoxNode' : 'writeBox_node',
+    'ASTWriteNode' : 'write_node',
+    'ASTPrintNode' : 'print_node',
+    'ASTTermNode' : 'term_node',
+    'ASTIntegerNode' : 'integer_node',
+    'ASTColourNode' : 'colour_node',
+    'ASTFloatNode' : 'float_node',
+    'ASTBoolNode' : 'bool_node',
+    'ASTStringNode' : 'string_node',
+    'ASTAssignmentNode' : 'assignment_node',
+    'ASTReAssignNode' : 'reassign_node',
+    'ASTActualParamsNode' : 'actualparams_node',
+    'ASTFormalParamNode' : 'formalparam_node',
+    'ASTFormalParamsNode' : 'formalparams_node',
+    'ASTFunctionNode' : 'func_node',
+    'ASTFunctionCall' : 'func_call',
+    'ASTErrorNode' : 'error_node',
+    'ASTBlockNode' : 'block_node',
+}
+
+# Fields that never hold a node
+ScalarFields = ('offset', 'type', 'symbol', 'returnType', 'bodyParser', 'structuralHash')
+# Fields that can hold children per kind, in the order they are walked. A lazy function's body is read through
+# its block property so it gets parsed
+ChildFields = [tuple(name for name in cls.fieldNames if name not in ScalarFields) for cls in ast.NodeKinds]
+# The same fields last to first, the order they go on the stack
+StackFields = [tuple(reversed(names)) for names in ChildFields]
+
+# (visits, leaves, field) of each visitor class, see dispatchTable()
+Tables = {}
+
+def method(cls, name):
+    '''Function cls has for name, None when it has none or only ASTVisitor's placeholder'''
+    function = getattr(cls, name, None)
+    if function is None or function is getattr(ast.ASTVisitor, name, None):
+        return None
+    return function
+
+def methodTable(cls, prefix):
+    '''Function per node kind for the methods starting with prefix, None when cls has none at all'''
+    fallback = method(cls, prefix + 'node')
+    functions = []
+    for node in ast.NodeKinds:
+        name = MethodNames.get(node.__name__)
+        function = method(cls, prefix + name) if name is not None else None
+        functions.append(fallback if function is None else function)
+    return tuple(functions) if any(functions) else None
+
+def dispatchTable(cls):
+    '''(visit table, leave table, visit_field) of a visitor class, worked out once per class'''
+    table = Tables.get(cls)
+    if table is None:
+        table = Tables[cls] = (methodTable(cls, 'visit_'), methodTable(cls, 'leave_'), method(cls, 'visit_field'))
+    return table
+
+class Walker():
+    '''Walks trees for one or more visitors at once'''
+    def __init__(self, *visitors):
+        self.visitors = visitors
+        tables = [dispatchTable(type(visitor)) for visitor in visitors]
+        self.visits = [visits for visits, _, _ in tables]
+        self.leaves = [leaves for _, leaves, _ in tables]
+        self.fields = [field for _, _, field in tables]
+
+    def walk(self, root):
+        '''Runs the visitors over root and everything under it, in preorder. Returns False when every visitor
+        stopped early'''
+        if len(self.visitors) == 1 and self.fields[0] is None:
+            return self.walkOne(root)
+        visitors, fields = self.visitors, self.fields
+        kinds = range(len(ast.NodeKinds))
+        # Per kind, (index, function) of the visitors with a visit or leave method for it, and the indexes of
+        # those without a visit method, which always go on into the children
+        kindVisits = [tuple((index, table[kind]) for index, table in enumerate(self.visits)
+                            if table is not None and table[kind] is not None) for kind in kinds]
+        kindLeaves = [tuple((index, table[kind]) for index, table in enumerate(self.leaves)
+                            if table is not None and table[kind] is not None) for kind in kinds]
+        bare = [tuple(index for index, table in enumerate(self.visits) if table is None or table[kind] is None)
+                for kind in kinds]
+        labelling = tuple(index for index, field in enumerate(fields) if field is not None)
+        # Visitors still getting calls. A visitor skipping a node's children is inactive until that node's leave
+        # entry comes off the stack, one that stopped for good
+        active = [True] * len(visitors)
+        inactive = stopped = 0
+        stackFields = StackFields
+        Node = ast.ASTNode
+        # The stack holds a node to visit, (node, indexes) to leave a node and reactivate the visitors that
+        # skipped its children, or (node, field) to label the children in field
+        pending = [root]
+        pop, push = pending.pop, pending.append
+        while pending:
+            entry = pop()
+            if entry.__class__ is tuple:
+                node, extra = entry
+                if extra.__class__ is str:
+                    for index in labelling:
+                        if active[index]:
+                            fields[index](visitors[index], node, extra)
+                    continue
+                for index in extra:
+                    active[index] = True
+                inactive -= len(extra)
+                for index, function in kindLeaves[node.kind]:
+                    if active[index]:
+                        function(visitors[index], node)
+                continue
+
+            node = entry
+            kind = node.kind
+            skipping = ()
+            if inactive:
+                descend = any(active[index] for index in bare[kind])
+            else:
+                descend = bool(bare[kind])
+            for index, function in kindVisits[kind]:
+                if inactive and not active[index]:
+                    continue
+                result = function(visitors[index], node)
+                if result is None:
+                    descend = True
+                elif result is Skip:
+                    skipping += (index,)
+                    active[index] = False
+                    inactive += 1
+                elif result is Stop:
+                    active[index] = False
+                    inactive += 1
+                    stopped += 1
+                    if stopped == len(visitors):
+                        return False
+            if skipping or kindLeaves[kind]:
+                push((node, skipping))
+            if not descend:
+                continue
+
+            for name in stackFields[kind]:
+                value = getattr(node, name)
+                if value.__class__ is list:
+                    for item in reversed(value):
+                        if item is not None:
+                            push(item)
+                elif isinstance(value, Node):
+                    push(value)
+                else:
+                    continue
+                if labelling:
+                    push((node, name))
+        return True
+
+    def walkOne(self, root):
+        # walk() for a single visitor without visit_field, the stack holds the nodes themselves and a 1-tuple
+        # for each node waiting for its leave method
+        visitor = self.visitors[0]
+        visits = self.visits[0] or (None,) * len(ast.NodeKinds)
+        leaves = self.leaves[0]
+        stackFields = StackFields
+        Node = ast.ASTNode
+        pending = [root]
+        pop, push = pending.pop, pending.append
+        while pending:
+            node = pop()
+            if node.__class__ is tuple:
+                node = node[0]
+                function = leaves[node.kind]
+                if function is not None:
+                    function(visitor, node)
+                continue
+            kind = node.kind
+            function = visits[kind]
+            if function is not None:
+                result = function(visitor, node)
+                if result is not None:
+                    if result is Stop:
+                        return False
+                    if leaves is not None:
+                        push((node,))
+                    continue
+            if leaves is not None:
+                push((node,))
+            for name in stackFields[kind]:
+                value = getattr(node, name)
+                if value.__class__ is list:
+                    for item in reversed(value):
+                        if item is not None:
+                            push(item)
+                elif isinstance(value, Node):
+                    push(value)
+        return True
+
+def walk(root, *visitors):
+    '''Walker(*visitors).walk(root)'''
+    return Walker(*visitors).walk(root)
@@ -1,6 +1,8 @@
 import Parser as Parser
 import Lexer as lex
 import ASTNodes as ast
+import ASTWalker
+from ASTWalker import Skip
 
 
 
@@ -32,6 +34,23 @@ class CodeGen:
         self.addressStack[node.name] = self.pIndex
         self.program.append(f".{funcName}")
 
+    def generate(self, root):
+        # Walks the program with ASTWalker, only functions generate anything so far
+        ASTWalker.walk(root, self)
+
+    def visit_program_node(self, node):
+        pass
+
+    def visit_block_node(self, node):
+        pass
+
+    def visit_func_node(self, node):
+        self.visitFunction(node)
+        return Skip
+
+    def visit_node(self, node):
+        return Skip
+
         
 
     
@@ -63,5 +82,5 @@ if "__main__" == __name__:
     parserObj.Parse()
 
     print_visitor = ast.PrintNodesVisitor()
-    parserObj.ASTroot.accept(print_visitor)
+    ASTWalker.walk(parserObj.ASTroot, print_visitor)
 
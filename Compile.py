@@ -0,0 +1,150 @@
+# Compile driver for many programs: lexes, parses, analyzes and generates code for every .parl file given (files or
+# directories), in a pool of worker processes. Each file's result is printed as soon as it is ready and the exit
+# status is 1 if any file failed.
+# Usage:  python Compile.py [-j workers] [--cache dir] [--suffix .parl] path...
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import ASTCache
+import CodeGen
+import Lexer as lex
+import Parser
+import SemanticAnalysis
+
+# Stages in the order a file goes through them
+Stages = ('lex', 'parse', 'semantic', 'codegen')
+
+def findSources(paths, suffix):
+    '''Files named in paths and the files ending in suffix under the directories among them, in a stable order'''
+    found = []
+    for path in paths:
+        if not os.path.isdir(path):
+            found.append(path)
+            continue
+        for directory, subdirectories, files in os.walk(path):
+            subdirectories.sort()
+            found.extend(os.path.join(directory, name) for name in sorted(files) if name.endswith(suffix))
+    return found
+
+def compileFile(path, cache=None):
+    '''Runs every stage on one file. Returns a plain dict so it pickles back from a worker: the path, the stage
+    that failed (None when all passed), the diagnostics, seconds per stage and the size of the output'''
+    result = {'path' : path, 'failed' : None, 'diagnostics' : [], 'seconds' : {}, 'instructions' : 0,
+              'cached' : False}
+    seconds = result['seconds']
+    stage = 'lex'
+    try:
+        start = time.perf_counter()
+        cached = None
+        if cache is not None:
+            with open(path, 'rb') as file:
+                source = file.read()
+            key = ASTCache.sourceKey(source)
+            cached = cache.load(key)
+        if cached is not None:
+            # A hit skips lexing and parsing, both are counted as parse
+            root, symbols = cached
+            lines = lex.LineIndex(source)
+            seconds['parse'] = time.perf_counter() - start
+            result['cached'] = True
+        else:
+            # Constructing the Parser lexes the whole file
+            if cache is None:
+                parser = Parser.Parser.from_path(path, recover=True)
+            else:
+                parser = Parser.Parser(source, recover=True)
+            seconds['lex'] = time.perf_counter() - start
+
+            stage = 'parse'
+            start = time.perf_counter()
+            parser.Parse()
+            seconds['parse'] = time.perf_counter() - start
+            root, symbols, lines = parser.ASTroot, parser.symbols, parser.lexer.lines()
+            if parser.diagnostics:
+                result['failed'] = stage
+                result['diagnostics'] = [str(error) for error in parser.diagnostics]
+                return result
+            if cache is not None:
+                cache.store(key, root, symbols)
+
+        stage = 'semantic'
+        start = time.perf_counter()
+        SemanticAnalysis.SemanticAnalyzer(root, symbols, lines).analyze()
+        seconds['semantic'] = time.perf_counter() - start
+
+        stage = 'codegen'
+        start = time.perf_counter()
+        generator = CodeGen.CodeGen()
+        generator.generate(root)
+        result['instructions'] = len(generator.program)
+        seconds['codegen'] = time.perf_counter() - start
+    except Exception as error:
+        result['failed'] = stage
+        result['diagnostics'].append(f"{type(error).__name__}: {error}")
+    return result
+
+# The ASTCache of a worker process, opened once by startWorker()
+WorkerCache = None
+
+def startWorker(cacheDirectory):
+    global WorkerCache
+    WorkerCache = None if cacheDirectory is None else ASTCache.ASTCache(cacheDirectory)
+
+def compileInWorker(path):
+    return compileFile(path, WorkerCache)
+
+def compileAll(paths, workers=None, cacheDirectory=None):
+    '''Yields the result of every file as soon as it is ready, in the order they finish. Every file is a task
+    of its own, a slow file holds back no other file's result'''
+    # Built before the pool starts so forked workers share the tables instead of building their own
+    lex.lexerTables()
+    with ProcessPoolExecutor(max_workers=workers, initializer=startWorker, initargs=(cacheDirectory,)) as pool:
+        futures = {pool.submit(compileInWorker, path) : path for path in paths}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as error:
+                # The worker itself died, the file counts as failed
+                yield {'path' : futures[future], 'failed' : 'worker', 'seconds' : {}, 'instructions' : 0,
+                       'cached' : False, 'diagnostics' : [f"{type(error).__name__}: {error}"]}
+
+def formatResult(result):
+    seconds = result['seconds']
+    timings = " ".join(f"{stage} {seconds[stage] * 1000:.1f}ms" for stage in Stages if stage in seconds)
+    if result['failed'] is None:
+        return f"ok      {result['path']}  {timings}"
+    lines = [f"FAILED  {result['path']}  in {result['failed']}"]
+    lines.extend(f"    {message}" for message in result['diagnostics'])
+    return "\n".join(lines)
+
+def main(arguments=None):
+    options = argparse.ArgumentParser(prog="python Compile.py")
+    options.add_argument('paths', nargs='+', help="source files and directories to search for them")
+    options.add_argument('-j', '--workers', type=int, default=None,
+                         help="worker processes, one per core by default")
+    options.add_argument('--suffix', default='.parl', help="file suffix searched for in directories")
+    options.add_argument('--cache', help="AST cache directory, unchanged files are not parsed again")
+    options.add_argument('-q', '--quiet', action='store_true', help="only print failed files and the summary")
+    options = options.parse_args(arguments)
+
+    paths = findSources(options.paths, options.suffix)
+    start = time.perf_counter()
+    failed = cached = 0
+    for result in compileAll(paths, options.workers, options.cache):
+        failed += result['failed'] is not None
+        cached += result['cached']
+        if result['failed'] is not None or not options.quiet:
+            print(formatResult(result), flush=True)
+    elapsed = time.perf_counter() - start
+    summary = (f"{len(paths) - failed} of {len(paths)} files compiled, {failed} failed, {elapsed:.2f}s "
+               f"({len(paths) / elapsed if elapsed else 0:,.1f} files/s)")
+    if options.cache:
+        summary += f", {cached} parsed trees from the cache"
+    print(summary)
+    return 1 if failed or not paths else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
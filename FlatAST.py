@@ -0,0 +1,244 @@
+# Flat AST: every node of a tree is an integer handle into a few parallel arrays instead of an object of its own.
+# A node has a kind (ASTNode.kind of its class), its first child and next sibling, its source offset and an
+# operand, the index of a tuple in the constants table holding the node's other fields. Child lists, such as
+# ASTBlockNode.stmts, are entries of kind ListKind whose children are the items.
+# Handles are given out children first, so a node's children always come before it, the root comes last and
+# every subtree added by addTree() or the Parser is one contiguous run of handles. The Parser adds each block
+# as soon as it ends, before the statement holding it, so a subtree need not start at its leftmost leaf.
+from array import array
+
+import ASTNodes as ast
+
+# Kinds of the entries that are not nodes: a list of children, and a None item in such a list
+ListKind = 255
+NoneKind = 254
+# No child or no next sibling
+NoHandle = -1
+# Stands in an operand tuple for a field that holds a child, the children fill them in order
+Child = ...
+# No source offset, the offsets array has no None
+NoOffset = -1
+
+class FlatAST():
+    '''The arrays of a flat tree and the constants its operands index. root is the handle of the whole tree.
+    Pickles as the bytes of the arrays and the constants'''
+    def __init__(self, kinds=None, firstChild=None, nextSibling=None, offsets=None, operands=None, constants=None,
+                 root=NoHandle):
+        self.kinds = array('B') if kinds is None else kinds
+        self.firstChild = array('i') if firstChild is None else firstChild
+        self.nextSibling = array('i') if nextSibling is None else nextSibling
+        self.offsets = array('i') if offsets is None else offsets
+        self.operands = array('I') if operands is None else operands
+        self.constants = [] if constants is None else constants
+        self.root = root
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getstate__(self):
+        return (self.kinds.tobytes(), self.firstChild.tobytes(), self.nextSibling.tobytes(),
+                self.offsets.tobytes(), self.operands.tobytes(), self.constants, self.root)
+
+    def __setstate__(self, state):
+        kinds, firstChild, nextSibling, offsets, operands, self.constants, self.root = state
+        self.kinds, self.firstChild, self.nextSibling = array('B', kinds), array('i'), array('i')
+        self.offsets, self.operands = array('i'), array('I')
+        self.firstChild.frombytes(firstChild)
+        self.nextSibling.frombytes(nextSibling)
+        self.offsets.frombytes(offsets)
+        self.operands.frombytes(operands)
+
+    def nbytes(self):
+        '''Bytes of the arrays, the constants they share are not counted'''
+        return sum(len(column) * column.itemsize for column in
+                   (self.kinds, self.firstChild, self.nextSibling, self.offsets, self.operands))
+
+    def nodeClass(self, handle):
+        '''Class of the node at handle, None for a list or a None item'''
+        kind = self.kinds[handle]
+        return None if kind >= NoneKind else ast.NodeKinds[kind]
+
+    def offset(self, handle):
+        offset = self.offsets[handle]
+        return None if offset == NoOffset else offset
+
+    def operand(self, handle):
+        '''Fields of the node at handle other than offset, in fieldNames order, Child where a child goes'''
+        return self.constants[self.operands[handle]]
+
+    def children(self, handle):
+        child = self.firstChild[handle]
+        nextSibling = self.nextSibling
+        while child != NoHandle:
+            yield child
+            child = nextSibling[child]
+
+    def walk(self, handle=None):
+        '''(handle, depth) of every entry under handle, the root by default, in preorder. Without recursion'''
+        firstChild, nextSibling = self.firstChild, self.nextSibling
+        pending = [(self.root if handle is None else handle, 0)]
+        while pending:
+            handle, depth = pending.pop()
+            yield handle, depth
+            child = firstChild[handle]
+            if child == NoHandle:
+                continue
+            following = []
+            while child != NoHandle:
+                following.append((child, depth + 1))
+                child = nextSibling[child]
+            following.reverse()
+            pending.extend(following)
+
+    def start(self, handle):
+        '''First handle of the subtree at handle. The subtrees of the children are runs ending at the children,
+        the earliest run is the one of the child with the lowest handle'''
+        firstChild, nextSibling = self.firstChild, self.nextSibling
+        while firstChild[handle] != NoHandle:
+            child = handle = firstChild[handle]
+            while child != NoHandle:
+                handle = min(handle, child)
+                child = nextSibling[child]
+        return handle
+
+    def toTree(self, handle=None):
+        '''Object tree of the subtree at handle, the whole tree by default. The handles of the subtree are built in
+        order, every child before its parent, so this is one pass over the arrays without recursion'''
+        if handle is None:
+            handle = self.root
+        begin = self.start(handle)
+        kinds, firstChild, nextSibling = self.kinds, self.firstChild, self.nextSibling
+        offsets, operands, constants = self.offsets, self.operands, self.constants
+        classes = ast.NodeKinds
+        built = []
+        for current in range(begin, handle + 1):
+            kind = kinds[current]
+            children = []
+            child = firstChild[current]
+            while child != NoHandle:
+                children.append(built[child - begin])
+                child = nextSibling[child]
+            if kind == ListKind:
+                built.append(children)
+                continue
+            if kind == NoneKind:
+                built.append(None)
+                continue
+            cls = classes[kind]
+            node = cls.__new__(cls)
+            offset = offsets[current]
+            if offset != NoOffset:
+                node.offset = offset
+            filling = iter(children)
+            for name, value in zip(cls.fieldNames[1:], constants[operands[current]]):
+                setattr(node, name, next(filling) if value is Child else value)
+            built.append(node)
+        return built[-1]
+
+
+class FlatBuilder():
+    '''Adds nodes to a FlatAST, children before their parents. Operands that are equal share one constant'''
+    def __init__(self, tree=None):
+        self.tree = FlatAST() if tree is None else tree
+        self.constantIds = {operand : index for index, operand in enumerate(self.tree.constants)}
+
+    def constant(self, operand):
+        index = self.constantIds.get(operand)
+        if index is None:
+            index = self.constantIds[operand] = len(self.tree.constants)
+            self.tree.constants.append(operand)
+        return index
+
+    def add(self, kind, operand=(), children=(), offset=None):
+        '''Handle of a new entry of kind, with the tuple operand. children are handles already added, in order,
+        that have no parent yet'''
+        tree = self.tree
+        handle = len(tree.kinds)
+        tree.kinds.append(kind)
+        tree.firstChild.append(children[0] if children else NoHandle)
+        tree.nextSibling.append(NoHandle)
+        tree.offsets.append(NoOffset if offset is None else offset)
+        tree.operands.append(self.constant(operand))
+        nextSibling = tree.nextSibling
+        for index in range(1, len(children)):
+            nextSibling[children[index - 1]] = children[index]
+        return handle
+
+    def addList(self, children):
+        return self.add(ListKind, (), children)
+
+    def addTree(self, root):
+        '''Handle of the object tree root after adding all of it. Works without recursion and parses the bodies
+        of lazy functions'''
+        handles = []
+        pending = [root]
+        while pending:
+            value = pending.pop()
+            if isinstance(value, tuple):
+                # Every child of an entry is added, add the entry itself
+                kind, offset, operand, count = value
+                children = handles[len(handles) - count:]
+                del handles[len(handles) - count:]
+                handles.append(self.add(kind, operand, children, offset))
+            elif value is None:
+                handles.append(self.add(NoneKind))
+            elif isinstance(value, list):
+                pending.append((ListKind, None, (), len(value)))
+                pending.extend(reversed(value))
+            elif isinstance(value, Emitted):
+                handles.append(value.handle)
+            else:
+                operand, children = [], []
+                # Reading block parses the body of a lazy function
+                for name in type(value).fieldNames[1:]:
+                    field = getattr(value, name)
+                    if isinstance(field, (ast.ASTNode, list, Emitted)):
+                        operand.append(Child)
+                        children.append(field)
+                    else:
+                        operand.append(field)
+                pending.append((value.kind, value.offset, tuple(operand), len(children)))
+                pending.extend(reversed(children))
+        return handles[0]
+
+    def finish(self, root):
+        '''The FlatAST, with root as its root'''
+        self.tree.root = root
+        return self.tree
+
+
+class Emitted():
+    '''Stands in an object node's field for a subtree already in the builder, addTree() uses its handle'''
+    __slots__ = ('handle',)
+
+    def __init__(self, handle):
+        self.handle = handle
+
+
+class BlockEmitter():
+    '''Stands in for an ASTBlockNode while a flat Parser fills it. Every statement is added to the builder as
+    soon as it is finished, and its blocks were added when they ended, so only the objects of the statements
+    still being parsed are alive at a time, at most one per nesting level'''
+    def __init__(self, builder, offset):
+        self.builder = builder
+        self.offset = offset
+        self.stmts = []
+
+    def add_statement(self, node):
+        self.stmts.append(self.builder.addTree(node))
+
+    def finish(self):
+        '''Adds the block, returns the Emitted the statement holding it keeps as its field'''
+        builder = self.builder
+        statements = builder.addList(self.stmts)
+        return Emitted(builder.add(ast.ASTBlockNode.kind, (Child,), [statements], self.offset))
+
+    def finishProgram(self):
+        '''Adds the block as the block of the program node, returns the FlatAST'''
+        builder = self.builder
+        return builder.finish(builder.add(ast.ASTProgramNode.kind, (Child,), [self.finish().handle]))
+
+def fromTree(root):
+    '''FlatAST of an object tree'''
+    builder = FlatBuilder()
+    return builder.finish(builder.addTree(root))
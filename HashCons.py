@@ -0,0 +1,97 @@
+# Hash consing of expression nodes: a NodeFactory keeps one node per distinct expression, and every equal
+# expression parsed afterwards is replaced by that node. Children are shared before their parents, so two
+# expressions are equal exactly when their kinds and fields are, comparing children by identity. Shared nodes
+# must not be changed: their offset is the one of the first occurrence. Each shared node carries a structural
+# hash of its fields and its children's hashes, equal for equal expressions within one process, and equal
+# shared expressions are the same object, so "a is b" tells if two expressions are equal.
+from operator import attrgetter
+
+import ASTNodes as ast
+
+# Node classes the factory shares, the expressions without side effects. Function calls, __random_int and
+# __read give a new value each time they run and are never shared, nor is anything holding them
+SharedClasses = (ast.ASTIntegerNode, ast.ASTFloatNode, ast.ASTColourNode, ast.ASTBoolNode, ast.ASTStringNode,
+                 ast.ASTWidthNode, ast.ASTHeightNode, ast.ASTVariableNode, ast.ASTUnaryNode,
+                 ast.ASTSimpleExpNode, ast.ASTTermNode, ast.ASTExpNode)
+
+# Fields that are not part of an expression's structure
+IgnoredFields = ('offset', 'structuralHash')
+
+def keyGetter(cls):
+    '''Reads the key of a cls node, its kind followed by the fields that make up its structure'''
+    names = tuple(name for name in cls.slotNames if name not in IgnoredFields)
+    if not names:
+        return lambda node: (node.kind,)
+    return attrgetter('kind', *names)
+
+# Per node kind, the key getter of a shared class or None. Only expression nodes have a structuralHash, the
+# ASTHeightNode the Parser builds is a later plain ASTNode class of the same name and is not shared
+KeyGetters = [keyGetter(cls) if cls in SharedClasses and issubclass(cls, ast.ASTExpressionNode) else None
+              for cls in ast.NodeKinds]
+# Fields holding child expressions
+ChildFields = ('left', 'right', 'expr')
+# Per node kind, the positions of the child fields in its key, after the kind
+ChildIndexes = [tuple(index + 1 for index, name in enumerate(name for name in cls.slotNames
+                                                             if name not in IgnoredFields) if name in ChildFields)
+                for cls in ast.NodeKinds]
+
+class NodeFactory():
+    '''Shares equal expression nodes. nodes maps the key of every distinct expression to its node, shared
+    counts the nodes replaced by an equal one'''
+    def __init__(self):
+        self.nodes = {}
+        self.shared = 0
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def share(self, node):
+        '''The node equal to node made before, or node itself after recording it. The children of node must be
+        shared already'''
+        getter = KeyGetters[node.kind]
+        if getter is None:
+            return node
+        key = getter(node)
+        found = self.nodes.get(key)
+        if found is not None:
+            self.shared += 1
+            return found
+        self.nodes[key] = node
+        children = ChildIndexes[node.kind]
+        if children:
+            # Children hash by their own structure, a child that is not shared (a call) by its identity
+            key = list(key)
+            for index in children:
+                child = key[index]
+                if child is not None:
+                    key[index] = getattr(child, 'structuralHash', None) or id(child)
+            key = tuple(key)
+        node.structuralHash = hash(key)
+        return node
+
+    def shareTree(self, root):
+        '''root with every expression under it shared, children before parents. Without recursion'''
+        # Every node is pushed twice, the second time (expanded) once its children are in order
+        pending = [(root, False)]
+        order = []
+        while pending:
+            node, expanded = pending.pop()
+            if expanded:
+                order.append(node)
+                continue
+            pending.append((node, True))
+            for name, value in ast.fields(node):
+                if isinstance(value, ast.ASTNode):
+                    pending.append((value, False))
+                elif isinstance(value, list):
+                    pending.extend((item, False) for item in value if isinstance(item, ast.ASTNode))
+        # order has every node after its children, replace the children of each by their shared nodes
+        replaced = {}
+        for node in order:
+            for name, value in ast.fields(node):
+                if isinstance(value, ast.ASTNode):
+                    setattr(node, name, replaced.get(id(value), value))
+                elif isinstance(value, list):
+                    value[:] = [replaced.get(id(item), item) for item in value]
+            replaced[id(node)] = self.share(node)
+        return replaced[id(root)]
@@ -1,5 +1,17 @@
+import marshal
+import mmap
+import os
 import re 
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
 from enum import Enum
+from itertools import accumulate
+from types import MappingProxyType
+
+import Tracing
+from Tracing import Level
 
 class TokenType(Enum):
     Identifier = 1
@@ -84,134 +96,878 @@ Function = {'fun'}
 Booleans = {'true', 'false'}
 cast_operators = {'->'}
 
+# Every word __checkKeyword recognises, in the order symbol ids are handed out to them
+ReservedWords = {word : TokenType.Keyword for word in sorted(Keywords)}
+ReservedWords.update(Types)
+ReservedWords.update({'or' : TokenType.Or, 'and' : TokenType.And, 'true' : TokenType.BooleanLiteral,
+                      'false' : TokenType.BooleanLiteral, 'fun' : TokenType.Function,
+                      '__width' : TokenType.PadWidth, '__height' : TokenType.PadHeight, '__read' : TokenType.PadRead,
+                      '__random_int' : TokenType.PadRandI, '__write_box' : TokenType.WriteBox,
+                      '__write' : TokenType.Write, '__print' : TokenType.Print})
+
+
+# Class code the table engine gives '-', kept apart from '+' so the '->' check only runs on '-'
+MinusCategory = 'minus'
+# Marks the transition out of the dead state (-1), which the reference engine fails on
+DeadTransition = -2
+# Characters classified per translate() call, keeps the class buffer small on huge sources
+ScanBlockSize = 1 << 16
+# Pending offset segments a TokenBuffer keeps after incremental updates, past that the shortest is rewritten
+MaxShiftSegments = 256
+# Entries a TokenBuffer's gap grows by at least, when update() inserts more tokens than it has room for
+GapGrowth = 1024
+# Pieces a PieceTable is made of before an edit joins them back into one text
+MaxPieces = 512
+
+
+def getCharCategory(ch):
+    '''Returns the DFA input category of a single character'''
+    cat = 'other' 
+    if ch.isspace():
+        cat = 'whitespace'
+    if ch in ['_', ".", "#", ":"]:
+        cat = ch
+    elif ch in AddOp:
+        cat = 'addop'
+    elif ch in MulOp:
+        cat = 'mulop'
+    elif ch in SemiColon:
+        cat = 'semicolon'
+    elif ch in Colon:
+        cat = 'colon'
+    elif ch in Comma:
+        cat = 'comma'
+    elif ch in RelationOp:
+        cat = 'relop'
+    elif ch in AssignOp:
+        cat = 'assign_op'
+    elif ch in Declaration_R:
+        cat = 'declare_R'
+    elif ch in Declaration_L:
+        cat = 'declare_L'
+    elif ch in Parameter_R:
+        cat = 'parameter_R'
+    elif ch in Parameter_L:
+        cat = 'parameter_L'
+    elif ch in Array_L:
+        cat = 'array_L'
+    elif ch in Array_R:
+        cat = 'array_R'
+    elif re.search(r"[a-zA-Z]", ch):
+        return 'letter'
+    elif re.search(r"[0-9]", ch):
+        return 'digit'
+    return cat
+
+
+class CharClassTable(dict):
+    '''Precomputed 256 entry ordinal -> class code table for str.translate, with a unicode fallback'''
+    def __init__(self, codes, latin1=None):
+        super().__init__()
+        self.codes = codes
+        # latin1 holds the 256 precomputed codes as bytes, when the tables come from a cache file
+        for i in range(256):
+            self[i] = self.__classOf(chr(i)) if latin1 is None else latin1[i]
+
+    def __classOf(self, ch):
+        if ch == '-':
+            return self.codes[MinusCategory]
+        return self.codes[getCharCategory(ch)]
+
+    def __missing__(self, ordinal):
+        # Beyond latin-1 only whitespace is recognised, everything else is 'other'
+        code = self.codes['whitespace'] if chr(ordinal).isspace() else self.codes['other']
+        self[ordinal] = code
+        return code
+
+
+# Alternatives of the regex engine's master pattern, each tagged with the DFA state its lexeme ends in.
+# Every run mirrors a self looping state of States, '-' never enters an Addop run in front of '>'
+RegexTokens = [
+    ('cast', None, r'->'),
+    ('funcall', 25, r'[A-Za-z_][A-Za-z0-9_]*\(\)*'),
+    ('word', 1, r'[A-Za-z_][A-Za-z0-9_]*'),
+    ('float', 10, r'[0-9]+\.[0-9]*'),
+    ('integer', 2, r'[0-9]+'),
+    ('whitespace', 4, r'WHITESPACE+'),
+    ('addop', 8, r'(?:\+|-(?!>))+'),
+    ('mulfloat', 10, r'[*/][*/][0-9]*'),
+    ('mulop', 9, r'[*/]'),
+    ('relop', 24, r'[!<>][!<>=]*|==[!<>=]*'),
+    ('assign', 7, r'='),
+    ('colour', 21, r'#[#0-9A-Za-z]*'),
+    ('end', 6, r';+'),
+    ('array_L', 11, r'\[+'),
+    ('array_R', 12, r'\]+'),
+    ('parameter_L', 13, r'\(+'),
+    ('parameter_R', 14, r'\)+'),
+    ('declare_L', 15, r'\{+'),
+    ('declare_R', 16, r'\}+'),
+    ('comma', 18, r',+'),
+    ('colon', 23, r':+'),
+    # '.' is rejected by the start state, anything else drives the DFA into its dead state
+    ('dot', None, r'\.'),
+    ('other', -1, r'.'),
+]
+
+def compileMasterPattern(forBytes):
+    '''Compiles RegexTokens into one alternation, str.isspace() whitespace for text and its ASCII subset for bytes'''
+    whitespace = r'[\t\n\x0b\x0c\r\x1c-\x1f ]' if forBytes else r'\s'
+    pattern = '|'.join(f'(?P<{name}>{regex})' for name, _, regex in RegexTokens).replace('WHITESPACE', whitespace)
+    return re.compile(pattern.encode('ascii') if forBytes else pattern, re.DOTALL)
+
+# Compiled on the first use of the regex engine, by text (False) or bytes (True)
+MasterPatterns = {}
+
+def masterPattern(forBytes):
+    pattern = MasterPatterns.get(forBytes)
+    if pattern is None:
+        pattern = MasterPatterns[forBytes] = compileMasterPattern(forBytes)
+    return pattern
+
+
+# TokenType by its integer value, the form token types are stored in by TokenBuffer
+TokenTypeByCode = [None] * 256
+for _tokenType in TokenType:
+    TokenTypeByCode[_tokenType.value] = _tokenType
+
+
+# DFA of the lexer, state -> {input category -> next state}, shared and read only
+_states = {
+    # Start
+    0 : {'letter' : 1, 
+         'digit' : 2,
+         'comment' : 3, 
+         "whitespace" : 4,
+         "other" : -1, 
+         "_" : 1, 
+         "semicolon" : 6, 
+         'assign_op' : 7, 
+         'addop': 8, 
+         'mulop': 9, 
+         'operator': 5,
+         'array_L': 11,
+         'array_R': 12,
+         'parameter_L' : 13,
+         'parameter_R' : 14,
+         'declare_L' : 15,
+         'declare_R' : 16,
+         'colon' : 17,
+         'comma' : 18,
+         'function' : 19,
+         'relation' : 20,
+         '#' : 21,
+         ',' : 22,
+         ':' : 23,
+         'relop' : 24,
+         'funCall' : 25
+    },
+    # String
+    1 : {'letter' : 1, 'digit' : 1, '_' : 1, 'parameter_L' : 25},
+    # Digit
+    2 : {'digit' : 2, "." : 10},
+    # Comment
+    3 : {'comment' : 3, 'letter' : 3, 'digit': 3, 'whitespace' : 3, 'other' : 3, 'separator' : 3},
+    # Whitespace
+    4 : {'whitespace' : 4}, # -1
+    # Operator
+    5 : {'operator' : 5}, # -1
+    # Separator
+    6 : {'semicolon' : 6}, # -1
+    # Assign Op (=)
+    7 : {'assign_op' : 24, 'operator': 7}, # -1
+    # Add Op (+, -)
+    8 : {'addop' : 8 },
+    # Mul Op (*, /)
+    9 : {'mulop' : 10},
+    # Array []
+    11 : {'array_L' : 11},
+    12 : {'array_R' : 12},
+    # Parameter ()
+    13: {'parameter_L' : 13},
+    14 : {'parameter_R' : 14},
+    # Declare {}
+    15 : {'declare_L' : 15},
+    16 : {'declare_R' : 16},
+    17 : {'colon' : 17},
+    18 : {'comma' : 18},
+    19 : {'function' : 19},
+    20 : {'relation' : 20},
+    21 : {'#' : 21, 'digit' : 21, 'letter' : 21},
+    22 : {',' : 22},
+    23 : {':' : 23},
+    24 : {'relop' : 24, 'assign_op' : 24},  
+    25 : {'parameter_R' : 25},
+
+
+
+    # Exclusive States
+    # Float
+    10 : {'digit' : 10},
+}
+States = MappingProxyType({state : MappingProxyType(row) for state, row in _states.items()})
+
+# Accepting states and the token type they produce
+_accepts = {
+    1 : TokenType.Identifier,
+    2 : TokenType.Integer,
+    3 : TokenType.Comment,
+    4 : TokenType.Whitespace,
+    5 : TokenType.Operator,
+    6 : TokenType.End,
+    7 : TokenType.AssignOp,
+    8 : TokenType.Addop,
+    9 : TokenType.Mulop,
+    10 : TokenType.FloatLiteral,
+    11 : TokenType.Array_L,
+    12 : TokenType.Array_R,
+    13 : TokenType.Parameter_L,
+    14 : TokenType.Parameter_R,
+    15 : TokenType.Declaration_L,
+    16 : TokenType.Declaration_R,
+    17 : TokenType.Colon,
+    18 : TokenType.Comma,
+    19 : TokenType.Function,
+    20 : TokenType.Relation,
+    21 : TokenType.ColourLiteral,
+    22 : TokenType.Comma,
+    23 : TokenType.Colon,
+    24 : TokenType.Relop,
+    25 : TokenType.FunctionCall
+}
+Accepts = MappingProxyType(_accepts)
+del _states, _accepts
+
+
+def tablesData():
+    '''Derives the lexer tables from States and Accepts as plain data, which marshal can store in a cache file'''
+    categories = {cat for row in States.values() for cat in row}
+    categories.update(getCharCategory(chr(i)) for i in range(256))
+    categories.add(MinusCategory)
+    categories = tuple(sorted(categories))
+    codes = {cat : i for i, cat in enumerate(categories)}
+    width = len(categories)
+
+    # States are addressed by their row offset into the flat matrix, the start state being row 0
+    stateIds = [0] + sorted(s for s in States if s != 0) + [-1]
+    rows = {s : i * width for i, s in enumerate(stateIds)}
+
+    transitions = [DeadTransition] * (len(stateIds) * width)
+    for s, row in States.items():
+        for cat in categories:
+            target = row.get('addop' if cat == MinusCategory else cat)
+            transitions[rows[s] + codes[cat]] = -1 if target is None else rows[target]
+
+    # Class codes a state loops on, '-' excluded so '->' is still seen
+    loops = {}
+    for s in stateIds:
+        run = bytes(codes[cat] for cat in categories
+                    if cat != MinusCategory and transitions[rows[s] + codes[cat]] == rows[s])
+        if run:
+            loops[rows[s]] = run
+    latin1 = bytes(codes[MinusCategory] if i == ord('-') else codes[getCharCategory(chr(i))] for i in range(256))
+
+    # Rows able to hold a lexeme that starts with a letter or '_', the only rows worth a keyword lookup
+    rowAcceptCodes = [0] * len(transitions)
+    for s, tokenType in Accepts.items():
+        rowAcceptCodes[rows[s]] = tokenType.value
+    wordRows = [False] * len(transitions)
+    pending = [transitions[row + codes[cat]] for row in range(0, len(transitions), width)
+               for cat in ('letter', '_') if transitions[row + codes[cat]] >= 0]
+    while pending:
+        row = pending.pop()
+        if not wordRows[row]:
+            wordRows[row] = True
+            pending.extend(t for t in transitions[row:row + width] if t >= 0)
+
+    return {'categories' : categories, 'stateRows' : rows, 'transitions' : tuple(transitions), 'loops' : loops,
+            'latin1' : latin1, 'rowAcceptCodes' : tuple(rowAcceptCodes), 'wordRows' : tuple(wordRows)}
+
+
+class LexerTables():
+    '''Transition matrix, char class tables and per row helpers the table and regex engines run on, built from
+    tablesData(). Made once per process and shared by every Lexer, see lexerTables()'''
+    def __init__(self, data=None):
+        data = tablesData() if data is None else data
+        self.categories = data['categories']
+        codes = {cat : i for i, cat in enumerate(self.categories)}
+        self.stateRows = data['stateRows']
+        self.transitions = data['transitions']
+        self.rowAcceptCodes = data['rowAcceptCodes']
+        self.rowAccepts = {row : TokenTypeByCode[code] for row, code in enumerate(self.rowAcceptCodes) if code}
+        self.wordRows = data['wordRows']
+
+        # Per row matcher over class codes for the classes a state loops on
+        runs = [None] * len(self.transitions)
+        for row, loop in data['loops'].items():
+            runs[row] = re.compile(b'[' + re.escape(loop) + b']*').match
+        self.selfLoopRuns = tuple(runs)
+        self.classTable = CharClassTable(codes, data['latin1'])
+        self.minusClass = codes[MinusCategory]
+        self.wordChars = frozenset(chr(i) for i in range(256) if self.classTable[i] in (codes['letter'], codes['_']))
+        self.wordBytes = frozenset(ord(ch) for ch in self.wordChars)
+        # Rows whose lexemes go to the trivia table instead of the token stream
+        self.triviaRows = tuple(self.rowAccepts.get(row) in (TokenType.Whitespace, TokenType.Comment)
+                                for row in range(len(self.transitions)))
+        # bytes.translate table for ASCII only byte sources
+        self.byteClassTable = bytes(self.classTable[i] if i < 128 else codes['other'] for i in range(256))
+
+
+# Bumped whenever tablesData() changes shape, so cache files of older versions are rebuilt
+TablesVersion = 1
+# The LexerTables of this process, see lexerTables()
+SharedTables = None
+
+def tablesKey():
+    '''Identifies the tables a cache file holds: this module's file, the tables version and the Python build'''
+    stat = os.stat(__file__)
+    return f"{stat.st_mtime_ns} {stat.st_size} {TablesVersion} {sys.version}"
+
+def lexerTables(cachePath=None):
+    '''Returns the process wide LexerTables, building them on the first call. With cachePath the plain data
+    they are built from is read from that file when it was written by this exact Lexer, and written otherwise'''
+    global SharedTables
+    if SharedTables is None:
+        SharedTables = LexerTables(None if cachePath is None else cachedTablesData(cachePath))
+    return SharedTables
+
+def cachedTablesData(cachePath):
+    key = tablesKey()
+    try:
+        with open(cachePath, 'rb') as file:
+            cachedKey, data = marshal.load(file)
+        if cachedKey == key:
+            return data
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    data = tablesData()
+    # Written next to the target and renamed, so concurrent processes never read half a file
+    temporary = f"{cachePath}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, 'wb') as file:
+            marshal.dump((key, data), file)
+        os.replace(temporary, cachePath)
+    except OSError:
+        pass
+    return data
+
+
+def isAscii(code):
+    '''True if a bytes like source is plain ASCII, checked a block at a time so a memory mapped file is not
+    copied whole'''
+    if isinstance(code, (bytes, bytearray)):
+        return code.isascii()
+    return all(code[start:start + ScanBlockSize].isascii() for start in range(0, len(code), ScanBlockSize))
+
+def mapSource(path):
+    '''Read only memory map of a source file. ASCII files are lexed straight from the mapping and lexemes are
+    only decoded when asked for, so the source is never held twice. Other files are decoded into a str'''
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            # Empty files cannot be mapped
+            return b''
+        # The mapping stays valid after the file is closed
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# Sources smaller than this are lexed serially, starting worker processes costs more than it saves
+ParallelMinSize = 1 << 20
+# Chunks per worker, more and smaller chunks even out the work between workers
+ChunksPerWorker = 4
+
+def chunkBounds(code, chunks, byteClassTable):
+    '''Offsets splitting code into about chunks pieces: 0, then offsets right after a newline whose next
+    character is not whitespace and does not begin '->', then len(code). The whitespace run holding the newline
+    is the only lexeme that can reach past a newline, so the DFA is in its start state at each of them'''
+    whitespace = byteClassTable[ord('\n')]
+    bounds = [0]
+    offset = 0
+    for chunk in range(1, chunks):
+        offset = max(len(code) * chunk // chunks, offset)
+        while 0 < offset < len(code):
+            offset = code.find(b'\n', offset) + 1
+            if 0 < offset < len(code) and byteClassTable[code[offset]] != whitespace and \
+                    code[offset:offset + 2] != b'->':
+                bounds.append(offset)
+                break
+        if not 0 < offset < len(code):
+            break
+    bounds.append(len(code))
+    return bounds
+
+def lexChunk(path, begin, end):
+    '''Runs in a worker process, lexes [begin, end) of a file from the start state, see Lexer.scanRange()'''
+    code = mapSource(path)
+    return Lexer(b'').scanRange(code, begin, end)
+
+
+class SymbolPool():
+    '''Compilation wide interning table shared by the Lexer, Parser and SemanticAnalyzer, every distinct name
+    gets a small integer id. Reserved words are pre-seeded, so one dict probe both interns and classifies a word'''
+    def __init__(self):
+        self.ids = {}
+        # Id 0 stands for "no symbol"
+        self.names = [None]
+        self.kinds = [0]
+        for word, tokenType in ReservedWords.items():
+            self.intern(word, tokenType.value)
+        self.firstIdentifier = len(self.names)
+
+    def __len__(self):
+        return len(self.names) - 1
+
+    def intern(self, name, kind=0):
+        '''Returns the id of name, adding it to the pool the first time it is seen'''
+        symbol = self.ids.get(name)
+        if symbol is None:
+            symbol = self.ids[name] = len(self.names)
+            self.names.append(name)
+            self.kinds.append(kind)
+        return symbol
+
+    def lookup(self, name):
+        '''Returns the id of name, or None if it was never interned'''
+        return self.ids.get(name)
+
+    def nameOf(self, symbol):
+        return self.names[symbol]
+
+    def kindOf(self, symbol):
+        '''TokenType of a reserved word, None for plain identifiers'''
+        return TokenTypeByCode[self.kinds[symbol]] if self.kinds[symbol] else None
+
+    def isReserved(self, symbol):
+        return 0 < symbol < self.firstIdentifier
+
+
+class LineIndex():
+    '''Offsets every line of a source starts at, built once so line/column is a bisect away from any offset'''
+    def __init__(self, code):
+        newline = re.compile('\n' if isinstance(code, str) else b'\n')
+        self.lineStarts = array('I', [0])
+        self.lineStarts.extend(match.end() for match in newline.finditer(code))
+
+    def lineColumn(self, offset):
+        '''1 based line and column of offset'''
+        line = bisect_right(self.lineStarts, offset)
+        return line, offset - self.lineStarts[line - 1] + 1
+
+    def describe(self, offset):
+        if offset is None:
+            return "end of input"
+        line, column = self.lineColumn(offset)
+        return f"line {line}, column {column}"
+
+
+class PieceTable():
+    '''Source text update() edits without copying it, as pieces of the original text and of the inserted ones.
+    Indexing and slicing give what the original str or bytes would, only the characters asked for are copied'''
+    def __init__(self, text):
+        # Per piece, the text it is a slice of and the slice's bounds
+        self.texts = [text]
+        self.begins = [0]
+        self.ends = [len(text)]
+        # Offset of each piece in the whole, plus the whole length
+        self.offsets = [0, len(text)]
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def __getitem__(self, key):
+        texts, begins, ends, offsets = self.texts, self.begins, self.ends, self.offsets
+        if not isinstance(key, slice):
+            if key < 0:
+                key += offsets[-1]
+            if not 0 <= key < offsets[-1]:
+                raise IndexError("source index out of range")
+            piece = bisect_right(offsets, key) - 1
+            return texts[piece][begins[piece] + key - offsets[piece]]
+        start, stop, _ = key.indices(offsets[-1])
+        if start >= stop:
+            return texts[0][:0]
+        piece = bisect_right(offsets, start) - 1
+        parts = []
+        while start < stop:
+            begin = begins[piece] + start - offsets[piece]
+            end = min(ends[piece], begin + stop - start)
+            parts.append(texts[piece][begin:end])
+            start += end - begin
+            piece += 1
+        return parts[0] if len(parts) == 1 else parts[0][:0].join(parts)
+
+    def edited(self, offset, removed_len, inserted_text):
+        '''New PieceTable with removed_len characters at offset replaced by inserted_text, this one is left as
+        it is. Only the piece list is copied, unless it grew past MaxPieces and the text is joined again'''
+        texts, begins, ends, offsets = self.texts, self.begins, self.ends, self.offsets
+        stop = offset + removed_len
+        first = bisect_right(offsets, offset, 0, len(texts)) - 1
+        last = bisect_right(offsets, stop, 0, len(texts)) - 1
+        # What is left of the first and last piece around the removed range, then the inserted text
+        middle = [(texts[first], begins[first], begins[first] + offset - offsets[first]),
+                  (inserted_text, 0, len(inserted_text)),
+                  (texts[last], begins[last] + stop - offsets[last], ends[last])]
+        middle = [piece for piece in middle if piece[1] < piece[2]] or [(inserted_text, 0, 0)]
+
+        table = PieceTable.__new__(PieceTable)
+        table.texts = texts[:first] + [text for text, _, _ in middle] + texts[last + 1:]
+        table.begins = begins[:first] + [begin for _, begin, _ in middle] + begins[last + 1:]
+        table.ends = ends[:first] + [end for _, _, end in middle] + ends[last + 1:]
+        table.offsets = list(accumulate(map(int.__sub__, table.ends, table.begins), initial=0))
+        if len(table.texts) > MaxPieces:
+            return PieceTable(table[:])
+        return table
+
 
 class Token():
-    def __init__(self, type, lexeme):
+    __slots__ = ('type', 'lexeme', 'symbol', 'start', 'end')
+
+    def __init__(self, type, lexeme, symbol=0, start=None, end=None):
         self.type = type
         self.lexeme = lexeme
+        # SymbolPool id of identifiers and reserved words, 0 for every other token
+        self.symbol = symbol
+        # Source offsets, None for tokens the parser makes up
+        self.start = start
+        self.end = end
     def __str__(self):
         return f"Token: {self.type} Lexeme: {self.lexeme}"
 
 
+class TokenView(Token):
+    '''Token backed by one entry of a TokenBuffer, the lexeme is only sliced out of the source when read'''
+    __slots__ = ('buffer', 'index')
+
+    def __init__(self, buffer, index):
+        self.buffer = buffer
+        self.index = index
+
+    @property
+    def type(self):
+        return TokenTypeByCode[self.buffer.typeAt(self.index)]
+
+    @property
+    def lexeme(self):
+        return self.buffer.lexemeAt(self.index)
+
+    @property
+    def symbol(self):
+        return self.buffer.symbolAt(self.index)
+
+    @property
+    def lexemeView(self):
+        '''Zero copy memoryview of the lexeme, only available over bytes input. Once update() edited the
+        source the lexeme is copied out of its pieces'''
+        code = self.buffer.code
+        if isinstance(code, PieceTable):
+            return memoryview(code[self.start:self.end])
+        return memoryview(code)[self.start:self.end]
+
+    @property
+    def start(self):
+        return self.buffer.startAt(self.index)
+
+    @property
+    def end(self):
+        return self.buffer.endAt(self.index)
+
+
+class TokenBuffer():
+    '''Struct of arrays token storage, type codes, symbol ids plus start/end offsets into the source. update()
+    leaves a gap of unused entries in the arrays where it replaced tokens, the next edits near it fill or widen
+    the gap instead of moving every later token'''
+    def __init__(self, code, types=None, starts=None, ends=None, symbols=None, pool=None):
+        self.code = code
+        self.types = array('B') if types is None else types
+        self.starts = array('I') if starts is None else starts
+        self.ends = array('I') if ends is None else ends
+        self.symbols = array('I') if symbols is None else symbols
+        self.pool = SymbolPool() if pool is None else pool
+        # Pending offset moves left by update(): tokens from shiftIndexes[k] on are stale by shiftDeltas[k]
+        self.shiftIndexes = []
+        self.shiftDeltas = []
+        # Token index the gap is in front of and its length in entries, None until the first splice(). The
+        # arrays are only appended to before that
+        self.gapStart = None
+        self.gap = 0
+
+    def __len__(self):
+        return len(self.types) - self.gap
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("token index out of range")
+        return TokenView(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield TokenView(self, index)
+
+    def append(self, tokenType, start, end, symbol=0):
+        self.types.append(tokenType.value)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.symbols.append(symbol)
+
+    def slotOf(self, index):
+        '''Array entry of the token at index, past the gap'''
+        gapStart = self.gapStart
+        return index if gapStart is None or index < gapStart else index + self.gap
+
+    def typeAt(self, index):
+        return self.types[self.slotOf(index)]
+
+    def symbolAt(self, index):
+        return self.symbols[self.slotOf(index)]
+
+    def typeCodes(self):
+        '''Type codes of every token in order as bytes'''
+        if not self.gap:
+            return self.types.tobytes()
+        return self.types[:self.gapStart].tobytes() + self.types[self.gapStart + self.gap:].tobytes()
+
+    def deltaAt(self, index):
+        '''Offset move still pending for the token at index'''
+        segment = bisect_right(self.shiftIndexes, index) - 1
+        return self.shiftDeltas[segment] if segment >= 0 else 0
+
+    def startAt(self, index):
+        gapStart = self.gapStart
+        if gapStart is None:
+            return self.starts[index]
+        start = self.starts[index if index < gapStart else index + self.gap]
+        return start + self.deltaAt(index) if self.shiftIndexes else start
+
+    def endAt(self, index):
+        gapStart = self.gapStart
+        if gapStart is None:
+            return self.ends[index]
+        end = self.ends[index if index < gapStart else index + self.gap]
+        return end + self.deltaAt(index) if self.shiftIndexes else end
+
+    def lexemeAt(self, index):
+        symbol = self.symbolAt(index)
+        if symbol:
+            # Interned words are shared instead of sliced out of the source again
+            return self.pool.names[symbol]
+        lexeme = self.code[self.startAt(index):self.endAt(index)]
+        return lexeme if isinstance(lexeme, str) else lexeme.decode('ascii')
+
+    def slotRuns(self, first, last):
+        '''(begin, end) array entries of tokens [first, last), two runs when they lie on both sides of the gap'''
+        gapStart, gap = self.gapStart, self.gap
+        if gapStart is None or last <= gapStart:
+            return [(first, last)]
+        if first >= gapStart:
+            return [(first + gap, last + gap)]
+        return [(first, gapStart), (gapStart + gap, last + gap)]
+
+    def countEndingBy(self, position):
+        '''Number of leading tokens that end at or before position'''
+        if self.gapStart is None:
+            return bisect_right(self.ends, position)
+        return bisect_right(range(len(self)), position, key=self.endAt)
+
+    def moveGap(self, index):
+        '''Puts the gap in front of token index, moving the tokens in between to its other side'''
+        gapStart, gap = self.gapStart, self.gap
+        if gap and gapStart != index:
+            if index < gapStart:
+                moved, target = slice(index, gapStart), slice(index + gap, gapStart + gap)
+            else:
+                moved, target = slice(gapStart + gap, index + gap), slice(gapStart, index)
+            for entries in (self.types, self.starts, self.ends, self.symbols):
+                # One memmove, slicing the array would copy the moved entries first
+                with memoryview(entries) as view:
+                    view[target] = view[moved]
+        self.gapStart = index
+
+    def splice(self, first, last, tokens, delta):
+        '''Replaces tokens [first, last) with the tokens of another buffer, every later token moves by delta.
+        The gap is moved to first and the new tokens written into it, moves are recorded as pending segments
+        instead of rewriting every later offset'''
+        indexes, deltas = self.shiftIndexes, self.shiftDeltas
+        carried = self.deltaAt(last) + delta
+        before = bisect_left(indexes, first)
+        after = bisect_right(indexes, last)
+        count = len(tokens)
+        moved = count - (last - first)
+
+        self.moveGap(first)
+        self.gap += last - first
+        if self.gap < count:
+            # Only happens once every GapGrowth inserted tokens or so, this moves the tokens behind the gap
+            grown = max(count - self.gap, GapGrowth, len(self) >> 8)
+            for entries in (self.types, self.starts, self.ends, self.symbols):
+                entries[first:first] = array(entries.typecode, bytes(grown * entries.itemsize))
+            self.gap += grown
+        written = slice(first, first + count)
+        self.types[written] = tokens.types
+        self.starts[written] = tokens.starts
+        self.ends[written] = tokens.ends
+        self.symbols[written] = tokens.symbols
+        self.gapStart, self.gap = first + count, self.gap - count
+
+        # The new tokens carry exact offsets, everything behind them moves by this edit on top of what it had.
+        # Segments in front are kept and the ones behind moved as they are, only where they meet is checked
+        laterIndexes = list(map(moved.__add__, indexes[after:]))
+        laterDeltas = list(map(delta.__add__, deltas[after:]))
+        self.shiftIndexes, self.shiftDeltas = indexes, deltas = indexes[:before], deltas[:before]
+        for index, pending in [(first, 0), (first + count, carried)] + list(zip(laterIndexes, laterDeltas))[:1]:
+            if indexes and indexes[-1] == index:
+                # The segment before ended up empty
+                indexes.pop()
+                deltas.pop()
+            if pending != (deltas[-1] if deltas else 0):
+                indexes.append(index)
+                deltas.append(pending)
+        indexes += laterIndexes[1:]
+        deltas += laterDeltas[1:]
+        if indexes and indexes[-1] == len(self):
+            indexes.pop()
+            deltas.pop()
+
+        while len(indexes) > MaxShiftSegments:
+            self.mergeShortestSegment()
+
+    def shiftOffsets(self, first, last, delta):
+        '''Adds delta to the stored offsets of tokens [first, last)'''
+        for begin, end in self.slotRuns(first, last):
+            for offsets in (self.starts, self.ends):
+                offsets[begin:end] = array('I', map(delta.__add__, offsets[begin:end]))
+
+    def mergeShortestSegment(self):
+        '''Rewrites the offsets of the pending segment with the fewest tokens to those of the one in front of
+        it. None goes negative: the segment's tokens end behind the last one in front of it'''
+        indexes, deltas = self.shiftIndexes, self.shiftDeltas
+        bounds = indexes + [len(self)]
+        lengths = list(map(int.__sub__, bounds[1:], indexes))
+        segment = lengths.index(min(lengths))
+        previous = deltas[segment - 1] if segment > 0 else 0
+        self.shiftOffsets(bounds[segment], bounds[segment + 1], deltas[segment] - previous)
+        del indexes[segment], deltas[segment]
+        if segment < len(indexes) and deltas[segment] == previous:
+            del indexes[segment], deltas[segment]
+
+    def truncate(self, count):
+        '''Drops every token from index count on'''
+        self.settle()
+        del self.types[count:], self.starts[count:], self.ends[count:], self.symbols[count:]
+
+    def settle(self):
+        '''Applies every pending offset move to the arrays and closes the gap, they hold the tokens in order
+        with their offsets again'''
+        bounds = self.shiftIndexes + [len(self)]
+        for segment, delta in enumerate(self.shiftDeltas):
+            self.shiftOffsets(bounds[segment], bounds[segment + 1], delta)
+        self.shiftIndexes, self.shiftDeltas = [], []
+        if self.gapStart is not None:
+            count = len(self)
+            self.moveGap(count)
+            del self.types[count:], self.starts[count:], self.ends[count:], self.symbols[count:]
+            self.gapStart, self.gap = None, 0
+
+    def detach(self):
+        '''Moves the tokens gathered so far into a new buffer and restarts this one with empty arrays'''
+        block = TokenBuffer(self.code, self.types, self.starts, self.ends, self.symbols, self.pool)
+        self.types, self.starts, self.ends, self.symbols = array('B'), array('I'), array('I'), array('I')
+        return block
+
+    def nbytes(self):
+        return sum(a.itemsize * len(a) for a in (self.types, self.starts, self.ends, self.symbols))
+
+
+
+class TokenWindow():
+    '''Bounded lookahead/lookbehind buffer over a token generator, addressed by absolute token index'''
+    def __init__(self, tokens, size=64):
+        self.source = iter(tokens)
+        self.buffer = deque(maxlen=size)
+        # Absolute index of buffer[0]
+        self.base = 0
+        self.exhausted = False
+
+    def get(self, index):
+        '''Returns the token at index, or None past the end of the stream'''
+        if index < self.base:
+            raise IndexError(f"Token {index} already left the window, cannot backtrack that far")
+        buffer = self.buffer
+        while index >= self.base + len(buffer):
+            if self.exhausted:
+                return None
+            token = next(self.source, None)
+            if token is None:
+                self.exhausted = True
+                return None
+            if len(buffer) == buffer.maxlen:
+                self.base += 1
+            buffer.append(token)
+        return buffer[index - self.base]
+
+
 
 class Lexer():
     '''Implements Lexer Object'''
-    def __init__(self, code):
+    def __init__(self, code, engine="table", stream=False, symbols=None, tracer=None, workers=1, path=None):
+        if engine not in ("table", "regex", "reference"):
+            raise ValueError(f"Unknown lexer engine {engine}")
+        self.engine = engine
+        # In stream mode tokens are only produced through iter_tokens()
+        self.stream = stream
+        self.trace = Tracing.tracer if tracer is None else tracer
+        # Processes the table engine splits a large file between, see lexParallel()
+        self.workers = workers
+        # Shared by every Lexer of the process, nothing is built per instance
+        self.tables = lexerTables()
+        self.reset(code, symbols, path)
+
+    @classmethod
+    def from_path(cls, path, **options):
+        '''Lexer over a memory mapped file, see mapSource()'''
+        return cls(mapSource(path), path=path, **options)
+
+    def reset(self, code, symbols=None, path=None):
+        '''Lexes another source with this Lexer, keeping its engine, stream mode and tracer. path is the file
+        code was mapped from, worker processes map it again instead of receiving a copy of the source'''
+        if not isinstance(code, str) and not isAscii(code):
+            # Bytes are lexed in place only when they are plain ASCII
+            code = bytes(code).decode('utf-8')
         self.code = code
+        # Offsets into a decoded file are no longer its byte offsets
+        self.path = path if not isinstance(code, str) else None
         self.tokens = []
         self.current_token_index = 0
         self.position = 0
+        # Pass the same pool to every stage of a compilation so symbol ids agree between them
+        self.symbols = SymbolPool() if symbols is None else symbols
+        # Whitespace and comments, kept out of self.tokens by the table and regex engines (see triviaBefore)
+        self.trivia = None
+        # Built on the first diagnostic, see lines()
+        self.lineIndex = None
 
-        self.__initTables()
-        self.__tokenize()
-        print("\n")
-        print("\n")
-        print(self.tokens[0])
-
-    def __initTables(self):
-        ''' Initializes transition tabes and accept states for lexer'''
-        self.states = {
-            # Start
-            0 : {'letter' : 1, 
-                 'digit' : 2,
-                 'comment' : 3, 
-                 "whitespace" : 4,
-                 "other" : -1, 
-                 "_" : 1, 
-                 "semicolon" : 6, 
-                 'assign_op' : 7, 
-                 'addop': 8, 
-                 'mulop': 9, 
-                 'operator': 5,
-                 'array_L': 11,
-                 'array_R': 12,
-                 'parameter_L' : 13,
-                 'parameter_R' : 14,
-                 'declare_L' : 15,
-                 'declare_R' : 16,
-                 'colon' : 17,
-                 'comma' : 18,
-                 'function' : 19,
-                 'relation' : 20,
-                 '#' : 21,
-                 ',' : 22,
-                 ':' : 23,
-                 'relop' : 24,
-                 'funCall' : 25
-            },
-            # String
-            1 : {'letter' : 1, 'digit' : 1, '_' : 1, 'parameter_L' : 25},
-            # Digit
-            2 : {'digit' : 2, "." : 10},
-            # Comment
-            3 : {'comment' : 3, 'letter' : 3, 'digit': 3, 'whitespace' : 3, 'other' : 3, 'separator' : 3},
-            # Whitespace
-            4 : {'whitespace' : 4}, # -1
-            # Operator
-            5 : {'operator' : 5}, # -1
-            # Separator
-            6 : {'semicolon' : 6}, # -1
-            # Assign Op (=)
-            7 : {'assign_op' : 24, 'operator': 7}, # -1
-            # Add Op (+, -)
-            8 : {'addop' : 8 },
-            # Mul Op (*, /)
-            9 : {'mulop' : 10},
-            # Array []
-            11 : {'array_L' : 11},
-            12 : {'array_R' : 12},
-            # Parameter ()
-            13: {'parameter_L' : 13},
-            14 : {'parameter_R' : 14},
-            # Declare {}
-            15 : {'declare_L' : 15},
-            16 : {'declare_R' : 16},
-            17 : {'colon' : 17},
-            18 : {'comma' : 18},
-            19 : {'function' : 19},
-            20 : {'relation' : 20},
-            21 : {'#' : 21, 'digit' : 21, 'letter' : 21},
-            22 : {',' : 22},
-            23 : {':' : 23},
-            24 : {'relop' : 24, 'assign_op' : 24},  
-            25 : {'parameter_R' : 25},
-            
-
-
-            # Exclusive States
-            # Float
-            10 : {'digit' : 10},
-        }
-
-
-        self.accepts = {
-            1 : TokenType.Identifier,
-            2 : TokenType.Integer,
-            3 : TokenType.Comment,
-            4 : TokenType.Whitespace,
-            5 : TokenType.Operator,
-            6 : TokenType.End,
-            7 : TokenType.AssignOp,
-            8 : TokenType.Addop,
-            9 : TokenType.Mulop,
-            10 : TokenType.FloatLiteral,
-            11 : TokenType.Array_L,
-            12 : TokenType.Array_R,
-            13 : TokenType.Parameter_L,
-            14 : TokenType.Parameter_R,
-            15 : TokenType.Declaration_L,
-            16 : TokenType.Declaration_R,
-            17 : TokenType.Colon,
-            18 : TokenType.Comma,
-            19 : TokenType.Function,
-            20 : TokenType.Relation,
-            21 : TokenType.ColourLiteral,
-            22 : TokenType.Comma,
-            23 : TokenType.Colon,
-            24 : TokenType.Relop,
-            25 : TokenType.FunctionCall
-        }
-
+        engine = self.engine
+        if engine == "table":
+            self.tokens = TokenBuffer(code, pool=self.symbols)
+            self.trivia = TokenBuffer(code, pool=self.symbols)
+            if self.stream:
+                return
+            if self.workers > 1 and self.path is not None and len(code) >= ParallelMinSize:
+                self.lexParallel()
+            else:
+                for _ in self.__scanTable(self.tokens, self.trivia):
+                    pass
+        elif engine == "regex":
+            self.tokens = TokenBuffer(code, pool=self.symbols)
+            self.trivia = TokenBuffer(code, pool=self.symbols)
+            self.__scanRegex(self.tokens, self.trivia)
+        else:
+            if not isinstance(code, str):
+                self.code = bytes(code).decode('ascii')
+            self.__tokenize()
+        if self.trace.enabled('lexer', Level.Debug):
+            self.trace.log('lexer', Level.Debug, "%s engine: %d tokens, first %s", engine, len(self.tokens),
+                           self.tokens[0] if len(self.tokens) else None)
 
     def __checkKeyword(self, lexeme):
         if lexeme in Keywords:
@@ -246,6 +1002,14 @@ class Lexer():
         
         else: return False
     
+    def __internWord(self, lexeme):
+        '''Returns the keyword type code (0 for none) and symbol id of a lexeme starting with a letter or '_'.
+        Function call lexemes keep their parentheses, they are neither keywords nor symbols'''
+        if lexeme[-1] in '()':
+            return 0, 0
+        symbol = self.symbols.intern(lexeme)
+        return self.symbols.kinds[symbol], symbol
+
     def printTokens(self):
         for token in self.tokens:
             print(token)
@@ -254,34 +1018,39 @@ class Lexer():
         '''Begin main process of tokenizing source code'''
         state = 0
         lexeme = ""
+        tracing = self.trace.enabled('lexer', Level.Trace)
+        transitions = 0
 
         while self.position < len(self.code):
                 char = self.code[self.position]
-                type = self.__getTokenCategory(char)
-                print(f'state : {state} position : {self.position} char : {char} type : {type}')
+                type = self.__getTokenCategory(char, tracing)
+                if tracing:
+                    self.trace.log('lexer', Level.Trace, "state : %s position : %s char : %r type : %s", state, self.position, char, type)
                 # try:
 
                 # Handle Cast Operator case
                 if (self.code[self.position:self.position+2] == '->'):
-                    self.tokens.append(Token(TokenType.CastOp, '->'))
+                    self.tokens.append(Token(TokenType.CastOp, '->', 0, self.position, self.position + 2))
                     lexeme = ""
                     self.position += 2
                     continue
 
-                if type in self.states[state]:
+                if type in States[state]:
                     # go to next state
-                    state = self.states[state][type]
+                    state = States[state][type]
                     self.position += 1 
                     lexeme += char
+                    transitions += 1
                 else:
                     if lexeme:
-                        if state in self.accepts:
+                        if state in Accepts:
                             if (self.__checkKeyword(lexeme)):
                                 TokenType, lexeme = self.__checkKeyword(lexeme)
-                                self.tokens.append(Token(TokenType, lexeme))
+                                self.tokens.append(Token(TokenType, lexeme, self.symbols.intern(lexeme), self.position - len(lexeme), self.position))
                             else:
-                                 print()
-                                 self.tokens.append(Token(self.accepts[state],lexeme))
+                                 # State 1 accepts identifiers (TokenType is a local name in here)
+                                 symbol = self.symbols.intern(lexeme) if state == 1 else 0
+                                 self.tokens.append(Token(Accepts[state], lexeme, symbol, self.position - len(lexeme), self.position))
 
                             state = 0
                             lexeme = ""
@@ -289,49 +1058,456 @@ class Lexer():
                         state = 0
                         lexeme = ""
 
+        if self.trace.counting:
+            self.trace.count('lexer.transitions', transitions)
+            self.trace.count('lexer.tokens', len(self.tokens))
+
+    def __scanTable(self, sink, trivia, code=None, offset=0, blockSize=ScanBlockSize, end=None, state=0, start=None):
+        '''Table driven engine, appends the same token stream as __tokenize to sink, whitespace and comments
+        to trivia, and yields after every block.
+        Scanning may start at any offset the DFA is in its start state at, blocks double up to ScanBlockSize.
+        With end it stops there instead of at the end of code, state and start resume a lexeme begun earlier.
+        The lexeme still pending when it stops is left in self.scanState as (offset, state, start)'''
+        code = self.code if code is None else code
+        # A PieceTable slices to what it was made from
+        isText = isinstance(code[:0], str)
+        classTable = self.tables.classTable if isText else self.tables.byteClassTable
+        arrow = '>' if isText else b'>'
+        transitions = self.tables.transitions
+        accepts = self.tables.rowAcceptCodes
+        wordRows = self.tables.wordRows
+        triviaRows = self.tables.triviaRows
+        runs = self.tables.selfLoopRuns
+        minus = self.tables.minusClass
+        sentinel = bytes([minus])
+        wordChars = self.tables.wordChars if isText else self.tables.wordBytes
+        castOp = TokenType.CastOp.value
+        internWord = self.__internWord
+        # Identifiers repeat a lot, remember the token type and symbol per distinct lexeme
+        wordSymbols = {}
+        length = len(code) if end is None else end
+        start = offset if start is None else start
+        trace = self.trace
+
+        while offset < length:
+            # sink may hand out fresh arrays between blocks
+            addType, addStart, addEnd, addSymbol = sink.types.append, sink.starts.append, sink.ends.append, sink.symbols.append
+            addTrivia, addTriviaStart, addTriviaEnd = trivia.types.append, trivia.starts.append, trivia.ends.append
+            blockTokens, blockTrivia = len(sink.types), len(trivia.types)
+            # One C level pass classifies a block of characters, the loop below only indexes integers
+            block = code[offset:min(offset + blockSize, length)]
+            blockSize = min(blockSize * 2, ScanBlockSize)
+            classes = block.translate(classTable)
+            if isText:
+                classes = classes.encode('latin-1')
+            size = len(classes)
+            # Never scanned, only read by the run check below so it needs no bounds check
+            classes += sentinel
+            position = 0
+
+            while position < size:
+                cls = classes[position]
+
+                # Handle Cast Operator case, any pending lexeme is dropped exactly like __tokenize does
+                if cls == minus and code[offset + position + 1:offset + position + 2] == arrow:
+                    at = offset + position
+                    addType(castOp)
+                    addStart(at)
+                    addEnd(at + 2)
+                    addSymbol(0)
+                    position += 2
+                    start = at + 2
+                    continue
+
+                target = transitions[state + cls]
+                if target < 0:
+                    at = offset + position
+                    if target == DeadTransition:
+                        raise SyntaxError(f"Unexpected character {code[at - 1:at]!r} at offset {at - 1}")
+
+                    if start != at:
+                        if triviaRows[state]:
+                            addTrivia(accepts[state])
+                            addTriviaStart(start)
+                            addTriviaEnd(at)
+                        else:
+                            tokenType = accepts[state]
+                            symbol = 0
+                            # Every keyword and identifier starts with a letter or '_', skip the lookup for everything else
+                            if wordRows[state] and code[start] in wordChars:
+                                lexeme = code[start:at]
+                                word = wordSymbols.get(lexeme)
+                                if word is None:
+                                    word = wordSymbols[lexeme] = internWord(lexeme if isText else lexeme.decode('ascii'))
+                                keyword, symbol = word
+                                if keyword:
+                                    tokenType = keyword
+                            addType(tokenType)
+                            addStart(start)
+                            addEnd(at)
+                            addSymbol(symbol)
+                        start = at
+                    elif state == 0:
+                        # __tokenize never advances past a character the start state rejects
+                        raise SyntaxError(f"Unexpected character {code[at:at + 1]!r} at offset {at}")
+
+                    # The rejected character starts the next lexeme from the start state
+                    target = transitions[cls]
+                    if target < 0:
+                        raise SyntaxError(f"Unexpected character {code[at:at + 1]!r} at offset {at}")
+
+                state = target
+                position += 1
+                # Consume the rest of a self looping run (whitespace, identifier, digits...) in one C call, most
+                # runs are a single character and the next one is checked first
+                run = runs[state]
+                if run is not None and transitions[state + classes[position]] == state:
+                    position = run(classes, position).end()
+
+            # Trivia has no symbols, their zeros are added for the whole block at once
+            trivia.symbols.frombytes(bytes(trivia.symbols.itemsize * (len(trivia.types) - len(trivia.symbols))))
+            offset += position
+            if trace.counting:
+                # Every character is one DFA transition except the two of a '->', which skip the DFA
+                emitted = sink.types[blockTokens:]
+                trace.count('lexer.transitions', position - 2 * emitted.count(castOp))
+                trace.count('lexer.tokens', len(emitted))
+                trace.count('lexer.trivia', len(trivia.types) - blockTrivia)
+            yield
+
+        self.position = offset
+        self.scanState = (offset, state, start)
+
+    def scanRange(self, code, begin, end, state=0, start=None):
+        '''Lexes code[begin:end] with the table engine, resuming in state a lexeme begun at start. Returns plain
+        picklable data: the token and trivia arrays, the names of the symbols they refer to, and the offset,
+        state and start of the lexeme still pending at end, which is not emitted'''
+        tokens = TokenBuffer(code, pool=self.symbols)
+        trivia = TokenBuffer(code, pool=self.symbols)
+        for _ in self.__scanTable(tokens, trivia, code, begin, end=end, state=state, start=start):
+            pass
+        first = self.symbols.firstIdentifier
+        return ((tokens.types, tokens.starts, tokens.ends, tokens.symbols),
+                (trivia.types, trivia.starts, trivia.ends, trivia.symbols),
+                self.symbols.names[first:], self.symbols.kinds[first:], self.scanState)
+
+    def lexParallel(self):
+        '''Lexes the file in chunks on self.workers processes, each of which maps the file itself. Chunks start
+        at a newline followed by something other than whitespace or '->', where the DFA is back in its start
+        state. That is checked again against the state the previous chunk really ended in and a chunk that
+        started wrong is lexed again from there, so the result is the serial token stream'''
+        from concurrent.futures import ProcessPoolExecutor
+
+        code = self.code
+        bounds = chunkBounds(code, self.workers * ChunksPerWorker, self.tables.byteClassTable)
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(lexChunk, self.path, begin, end) for begin, end in zip(bounds, bounds[1:])]
+            pending = None
+            relexed = 0
+            for begin, end, future in zip(bounds, bounds[1:], futures):
+                if pending is not None:
+                    offset, state, start = pending
+                if pending is None or offset == begin and self.__startsFresh(code, offset, state):
+                    if pending is not None:
+                        # The serial engine would end the pending lexeme here and start over
+                        self.__emitPending(state, start, offset)
+                    try:
+                        result = future.result()
+                    except SyntaxError:
+                        # A chunk started in the right state raises what the serial engine would
+                        pool.shutdown(cancel_futures=True)
+                        raise
+                else:
+                    future.cancel()
+                    relexed += 1
+                    result = self.scanRange(code, offset, end, state, start)
+                pending = self.__appendChunk(*result)
+        self.position = len(code)
+        if self.trace.counting:
+            self.trace.count('lexer.chunks', len(bounds) - 1)
+            self.trace.count('lexer.relexed', relexed)
+            self.trace.count('lexer.tokens', len(self.tokens))
+            self.trace.count('lexer.trivia', len(self.trivia))
+
+    def __startsFresh(self, code, offset, state):
+        '''True if the serial engine, in state at offset, ends the pending lexeme there and goes on from the
+        start state'''
+        if offset >= len(code) or code[offset:offset + 2] == b'->':
+            return False
+        return self.tables.transitions[state + self.tables.byteClassTable[code[offset]]] == -1
+
+    def __emitPending(self, state, start, end):
+        '''Appends the lexeme [start, end) the DFA ended in state, as the table engine does'''
+        if start == end:
+            return
+        if self.tables.triviaRows[state]:
+            self.trivia.append(TokenTypeByCode[self.tables.rowAcceptCodes[state]], start, end)
+            return
+        tokenType, symbol = self.tables.rowAcceptCodes[state], 0
+        if self.tables.wordRows[state] and self.code[start] in self.tables.wordBytes:
+            keyword, symbol = self.__internWord(self.code[start:end].decode('ascii'))
+            tokenType = keyword or tokenType
+        self.tokens.append(TokenTypeByCode[tokenType], start, end, symbol)
+
+    def __appendChunk(self, tokens, trivia, names, kinds, pending):
+        '''Appends the arrays of one chunk, its symbol ids translated into this Lexer's pool. Interning the
+        names of every chunk in order gives the ids the serial engine hands out'''
+        first = self.symbols.firstIdentifier
+        translate = [self.symbols.intern(name, kind) for name, kind in zip(names, kinds)]
+        for buffer, (types, starts, ends, symbols) in ((self.tokens, tokens), (self.trivia, trivia)):
+            buffer.types.extend(types)
+            buffer.starts.extend(starts)
+            buffer.ends.extend(ends)
+            if translate != list(range(first, first + len(translate))):
+                table = list(range(first)) + translate
+                symbols = array('I', map(table.__getitem__, symbols))
+            buffer.symbols.extend(symbols)
+        return pending
+
+    def __scanRegex(self, sink, trivia):
+        '''Master regex engine, the C level matcher consumes whole lexemes and Python only replays the
+        DFA quirks between them: the lexeme in front of '->' is dropped and its state carries over'''
+        code = self.code
+        isText = isinstance(code, str)
+        matcher = masterPattern(not isText).finditer
+        arrow = '->' if isText else b'->'
+        rows = self.tables.stateRows
+        accepts = self.tables.rowAcceptCodes
+        wordRows = self.tables.wordRows
+        wordChars = self.tables.wordChars if isText else self.tables.wordBytes
+        # Master pattern group index -> row the lexeme ends in, groups are numbered in RegexTokens order
+        kinds = [None] + [None if state is None else rows[state] for _, state, _ in RegexTokens]
+        groups = {name : i + 1 for i, (name, _, _) in enumerate(RegexTokens)}
+        castGroup, dotGroup = groups['cast'], groups['dot']
+        castOp = TokenType.CastOp.value
+        internWord = self.__internWord
+        wordSymbols = {}
+        addType, addStart, addEnd, addSymbol = sink.types.append, sink.starts.append, sink.ends.append, sink.symbols.append
+        addTrivia, addTriviaStart, addTriviaEnd = trivia.types.append, trivia.starts.append, trivia.ends.append
+        addTriviaSymbol = trivia.symbols.append
+        triviaRows = self.tables.triviaRows
+        dead = rows[-1]
+        length = len(code)
+
+        # Like __tokenize a lexeme is only emitted once the next one starts, pendingRow is None when nothing is pending
+        pendingRow = None
+        pendingStart = pendingEnd = 0
+        # State left behind by a dropped lexeme, the next lexeme starts from it instead of the start state
+        retained = 0
+        position = 0
+        matches = matcher(code)
+
+        while matches is not None:
+            restart = None
+            for match in matches:
+                group = match.lastindex
+                end = match.end()
+
+                if group == castGroup:
+                    if pendingRow is not None:
+                        retained = pendingRow
+                        pendingRow = None
+                    addType(castOp)
+                    addStart(position)
+                    addEnd(end)
+                    addSymbol(0)
+                    position = end
+
+                    if retained and position < length and code[position:position + 2] != arrow:
+                        if retained == dead:
+                            raise SyntaxError(f"Unexpected character {code[position - 1:position]!r} at offset {position - 1}")
+                        # Replay the DFA from the carried over state, then resume matching behind that lexeme
+                        end, row = self.__continueFrom(retained, position)
+                        retained = 0
+                        if end != position:
+                            pendingRow, pendingStart, pendingEnd = row, position, end
+                            position = end
+                            restart = matcher(code, position)
+                            break
+                    continue
+
+                if pendingRow is not None:
+                    if pendingRow == dead:
+                        raise SyntaxError(f"Unexpected character {code[pendingStart:pendingEnd]!r} at offset {pendingStart}")
+                    if triviaRows[pendingRow]:
+                        addTrivia(accepts[pendingRow])
+                        addTriviaStart(pendingStart)
+                        addTriviaEnd(pendingEnd)
+                        addTriviaSymbol(0)
+                    else:
+                        tokenType = accepts[pendingRow]
+                        symbol = 0
+                        if wordRows[pendingRow] and code[pendingStart] in wordChars:
+                            lexeme = code[pendingStart:pendingEnd]
+                            word = wordSymbols.get(lexeme)
+                            if word is None:
+                                word = wordSymbols[lexeme] = internWord(lexeme if isText else lexeme.decode('ascii'))
+                            keyword, symbol = word
+                            if keyword:
+                                tokenType = keyword
+                        addType(tokenType)
+                        addStart(pendingStart)
+                        addEnd(pendingEnd)
+                        addSymbol(symbol)
+
+                if group == dotGroup:
+                    raise SyntaxError(f"Unexpected character {code[position:end]!r} at offset {position}")
+
+                pendingRow, pendingStart, pendingEnd = kinds[group], position, end
+                position = end
+            matches = restart
+
+        self.position = position
+        if self.trace.counting:
+            self.trace.count('lexer.transitions', position - 2 * sink.types.count(castOp))
+            self.trace.count('lexer.tokens', len(sink.types))
+            self.trace.count('lexer.trivia', len(trivia.types))
+
+    def __continueFrom(self, row, position):
+        '''Runs the DFA from row until the current lexeme ends, returns the end offset and the final row'''
+        code = self.code
+        isText = isinstance(code, str)
+        classTable = self.tables.classTable if isText else self.tables.byteClassTable
+        arrow = '>' if isText else b'>'
+        while position < len(code):
+            cls = classTable[ord(code[position])] if isText else classTable[code[position]]
+            if cls == self.tables.minusClass and code[position + 1:position + 2] == arrow:
+                break
+            target = self.tables.transitions[row + cls]
+            if target < 0:
+                break
+            row = target
+            position += 1
+        return position, row
+
+    def update(self, offset, removed_len, inserted_text):
+        '''Applies an edit to the source and re-lexes only the tokens it can affect. Lexing restarts at the
+        last token boundary the DFA is known to be in its start state at, and stops as soon as a new token
+        ends where an old one did behind the edit; everything after is kept, its offsets moved lazily.
+        The source becomes a PieceTable and the tokens are written into the gap of the TokenBuffers, an edit
+        costs about the same at any source size, only moving the gap to a far away edit copies the tokens
+        in between'''
+        tokens = self.tokens
+        if not isinstance(tokens, TokenBuffer) or self.stream:
+            raise ValueError("update() needs a table or regex engine Lexer that is not streaming")
+
+        code = self.code
+        if not isinstance(code[:0], str):
+            if isinstance(inserted_text, str):
+                inserted_text = inserted_text.encode('utf-8')
+            if not inserted_text.isascii():
+                # Offsets are still valid, the old source was ASCII
+                code = code[:].decode('ascii')
+                inserted_text = inserted_text.decode('utf-8')
+        if not isinstance(code, PieceTable):
+            code = PieceTable(code)
+        newCode = code.edited(offset, removed_len, inserted_text)
+        delta = len(inserted_text) - removed_len
+        editEnd = offset + len(inserted_text)
+        castOp = TokenType.CastOp.value
+
+        # A token is untouched if the characters that decided its end (its end and, for '->', one more) are
+        # in front of the edit. The token after a '->' starts in a carried over state, so step back past those
+        first = tokens.countEndingBy(offset - 2)
+        while first > 0 and tokens.typeAt(first - 1) == castOp:
+            first -= 1
+        restart = tokens.endAt(first - 1) if first > 0 else 0
+
+        relexed = TokenBuffer(newCode, pool=self.symbols)
+        relexedTrivia = TokenBuffer(newCode, pool=self.symbols)
+        scanner = self.__scanTable(relexed, relexedTrivia, newCode, restart, blockSize=64)
+        last = len(tokens)
+        # Old offset the re-lexed range ends at, the whole rest of the source unless the streams resync
+        oldRangeEnd = len(code)
+        oldIndex = first
+        checked = 0
+        for _ in scanner:
+            for index in range(checked, len(relexed)):
+                end = relexed.ends[index]
+                if end < editEnd or relexed.types[index] == castOp:
+                    continue
+                # Old and new lexers both sit in the start state behind a token ending here, the rest is identical
+                oldEnd = end - delta
+                while oldIndex < last and tokens.endAt(oldIndex) < oldEnd:
+                    oldIndex += 1
+                if oldIndex < last and tokens.endAt(oldIndex) == oldEnd and tokens.typeAt(oldIndex) != castOp:
+                    relexed.truncate(index + 1)
+                    relexedTrivia.truncate(relexedTrivia.countEndingBy(end))
+                    last = oldIndex + 1
+                    oldRangeEnd = oldEnd
+                    scanner.close()
+                    break
+            else:
+                checked = len(relexed)
+                continue
+            break
+
+        # Trivia inside the re-lexed range was scanned again along with the tokens
+        trivia = self.trivia
+        triviaFirst = trivia.countEndingBy(restart)
+        triviaLast = trivia.countEndingBy(oldRangeEnd)
+
+        tokens.code = trivia.code = self.code = newCode
+        self.lineIndex = None
+        tokens.splice(first, last, relexed, delta)
+        trivia.splice(triviaFirst, triviaLast, relexedTrivia, delta)
+        self.position = len(newCode)
+
+    def iter_tokens(self):
+        '''Yields tokens lazily, without materialising the whole token list'''
+        if not (self.stream and self.engine == "table"):
+            yield from self.tokens
+            return
+        sink = TokenBuffer(self.code, pool=self.symbols)
+        for _ in self.__scanTable(sink, self.trivia):
+            # Each block gets its own buffer so tokens already handed out stay valid, trivia is only
+            # kept while the tokens of its block are consumed so memory stays bounded
+            yield from sink.detach()
+            self.trivia.detach()
+
+    def triviaBefore(self, index):
+        '''Whitespace and comments between token index - 1 and token index, index len(tokens) gives the
+        trailing trivia. Together with the tokens this is enough to reconstruct the source'''
+        tokens, trivia = self.tokens, self.trivia
+        if trivia is None:
+            return []
+        first = trivia.countEndingBy(tokens.endAt(index - 1)) if index > 0 else 0
+        last = trivia.countEndingBy(tokens.startAt(index)) if index < len(tokens) else len(trivia)
+        return [trivia[i] for i in range(first, last)]
+
+    def iter_with_trivia(self):
+        '''Yields tokens and trivia merged back into source order, the stream the reference engine produces'''
+        if self.trivia is None:
+            yield from self.tokens
+            return
+        trivia = iter(self.trivia)
+        pending = next(trivia, None)
+        for token in self.tokens:
+            start = token.start
+            while pending is not None and pending.start < start:
+                yield pending
+                pending = next(trivia, None)
+            yield token
+        while pending is not None:
+            yield pending
+            pending = next(trivia, None)
+
+    def lines(self):
+        '''LineIndex of the source, only built once something asks for a line/column'''
+        if self.lineIndex is None:
+            code = self.code
+            self.lineIndex = LineIndex(code[:] if isinstance(code, PieceTable) else code)
+        return self.lineIndex
+
     def getNextToken(self):
         currentToken = self.tokens[self.current_token_index]
         self.current_token_index += 1
         return currentToken
 
-    def __getTokenCategory(self, ch):
-        cat = 'other' 
-        if ch.isspace():
-            cat = 'whitespace'
-        if ch in ['_', ".", "#", ":"]:
-            print('we have a colon')
-            cat = ch
-        elif ch in AddOp:
-            cat = 'addop'
-        elif ch in MulOp:
-            cat = 'mulop'
-        elif ch in SemiColon:
-            cat = 'semicolon'
-        elif ch in Colon:
-            cat = 'colon'
-        elif ch in Comma:
-            cat = 'comma'
-        elif ch in RelationOp:
-            cat = 'relop'
-        elif ch in AssignOp:
-            cat = 'assign_op'
-        elif ch in Declaration_R:
-            cat = 'declare_R'
-        elif ch in Declaration_L:
-            cat = 'declare_L'
-        elif ch in Parameter_R:
-            cat = 'parameter_R'
-        elif ch in Parameter_L:
-            cat = 'parameter_L'
-        elif ch in Array_L:
-            cat = 'array_L'
-        elif ch in Array_R:
-            cat = 'array_R'
-        elif re.search(r"[a-zA-Z]", ch):
-            return 'letter'
-        elif re.search(r"[0-9]", ch):
-            return 'digit'
-        return cat
+    def __getTokenCategory(self, ch, tracing=False):
+        if tracing and ch in ['_', ".", "#", ":"]:
+            self.trace.log('lexer', Level.Trace, 'we have a colon')
+        return getCharCategory(ch)
         
 
 
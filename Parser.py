@@ -1,28 +1,123 @@
 
 # Now we need the parser (using tokens produced by the Lexer) to build the AST - this code snipper is able to build ASTAssignmentNode trees. LHS can only be an integer here ....
 # A small predictive recursive descent parser
+import copy
+import sys
+
 import ASTNodes as ast
+import ASTWalker
+import FlatAST
 import Lexer as lex
+import Tracing
+from Tracing import Level
+
+# Binary operator tokens -> (precedence, node built for them), a higher precedence binds tighter
+BinaryOperators = {
+    lex.TokenType.Relop : (1, ast.ASTExpNode),
+    lex.TokenType.Addop : (2, ast.ASTSimpleExpNode),
+    lex.TokenType.Or : (2, ast.ASTSimpleExpNode),
+    lex.TokenType.Mulop : (3, ast.ASTTermNode),
+    lex.TokenType.And : (3, ast.ASTTermNode),
+}
+
+# Tokens a block stops at: ';' (and the end of input), ')' and '}'
+BlockEnd = (lex.TokenType.End, lex.TokenType.Parameter_R, lex.TokenType.Declaration_R)
+
+# Keywords that start a statement, where error recovery can pick up parsing again
+SyncKeywords = lex.Keywords - {'else'}
+
+# Statement tokens of the drawing commands
+Commands = (lex.TokenType.WriteBox, lex.TokenType.Print, lex.TokenType.Write)
+
 class Parser:
-    def __init__(self, src_program_str):
+    def __init__(self, src_program_str, streaming=False, lookbehind=64, symbols=None, tracer=None, iterative=True, recover=False, lazy=False,
+                 workers=1, path=None, flat=False, factory=None):
         self.name = "PARSEAR"
-        self.lexer = lex.Lexer(src_program_str)
+        self.trace = Tracing.tracer if tracer is None else tracer
+        self.streaming = streaming
+        self.lookbehind = lookbehind
+        # Nested blocks are parsed with an explicit stack unless iterative is False, both give the same trees
+        self.iterative = iterative
+        # When recovering, syntax errors are collected in diagnostics and the broken statements become
+        # ASTErrorNodes, otherwise the first one is raised
+        self.recover = recover
+        # Lazy parsers only find where function bodies end, each body is parsed on the first use of its block.
+        # Bodies are parsed from the token list later on, so streaming parsers are never lazy. Flat parsers add
+        # every function to the FlatAST body and all, they are never lazy either
+        self.lazy = lazy and not streaming and not flat
+        # Flat parsers leave a FlatAST.FlatAST in ASTroot. Each statement goes into it as soon as it is parsed,
+        # and each block as soon as it ends, so only the statements still open have object nodes
+        self.flat = flat
+        # A HashCons.NodeFactory shares every expression node with the equal ones parsed before it, None builds
+        # a new node for each
+        self.factory = factory
+        # workers and path let the Lexer split a large mapped file between processes
+        self.lexer = lex.Lexer(src_program_str, stream=streaming, symbols=symbols, tracer=self.trace, workers=workers,
+                               path=path)
+        self.Start(src_program_str)
+
+    @classmethod
+    def from_path(cls, path, **options):
+        '''Parser over a memory mapped source file, see Lexer.mapSource()'''
+        return cls(lex.mapSource(path), path=path, **options)
+
+    def reset(self, src_program_str, symbols=None):
+        '''Parses another program with this parser and its lexer, keeping every option'''
+        self.lexer.reset(src_program_str, symbols)
+        self.Start(src_program_str)
+
+    def Start(self, src_program_str):
+        # State of one parse over the lexer's current tokens
+        # Checked once here, so tracing that is off costs a boolean test per hook
+        self.tracing = self.trace.enabled('parser', Level.Trace)
+        self.counting = self.trace.counting
+        # Symbol pool of this compilation, shared with the lexer and handed on to the SemanticAnalyzer
+        self.symbols = self.lexer.symbols
         self.index = -1  #start at -1 so that the first token is at index 0
         self.src_program = src_program_str
         self.tokens = self.lexer.tokens
-        self.tokenTypes = [lex.TokenType.Integer, lex.TokenType.FloatLiteral, lex.TokenType.BooleanLiteral, lex.TokenType.ColourLiteral, lex.TokenType.Identifier,lex.TokenType.PadRandI, lex.TokenType.PadHeight, lex.TokenType.PadWidth, lex.TokenType.PadRead]
-        self.commands = [lex.TokenType.WriteBox, lex.TokenType.Print, lex.TokenType.Write]
-        print("[Parser] Lexer generated token list ::")
-        for t in self.tokens:
-           print(t.type, t.lexeme)
+        # When streaming, tokens are pulled from the lexer on demand and only a bounded window is kept
+        self.window = lex.TokenWindow(self.lexer.iter_tokens(), self.lookbehind) if self.streaming else None
+        if not self.streaming and self.trace.enabled('parser', Level.Debug):
+            self.trace.log('parser', Level.Debug, "Lexer generated token list ::")
+            for t in self.tokens:
+               self.trace.log('parser', Level.Debug, "%s %s", t.type, t.lexeme)
         self.crtToken = lex.Token("", lex.TokenType.Error)
         self.nextToken = lex.Token("", lex.TokenType.Error)
+        self.diagnostics = []
+        # Token type codes as bytes, made on the first function body a lazy parser skips
+        self.typeCodes = None
+        # Parser the skipped function bodies of this parse are parsed with, see BodyParser()
+        self.bodies = None
+        # FlatAST.FlatBuilder the blocks of a flat parse go into
+        self.builder = None
         self.ASTroot = ast.ASTAssignmentNode     #this will need to change once you introduce the AST program node .... that should become the new root node    
 
+    def Trace(self, message, *args):
+        # Per token detail, callers test self.tracing first so nothing is formatted while tracing is off
+        self.trace.log('parser', Level.Trace, message, *args)
+
+    def Error(self, message, offset=-1):
+        # SyntaxError pointing at offset, the current token by default
+        if offset == -1:
+            offset = self.crtToken.start
+        return SyntaxError(f"{message} ({self.lexer.lines().describe(offset)})")
+
+    def TokenAt(self, index):
+        # Returns the token at index, or None past either end of the token stream
+        if index < 0:
+            return None
+        if self.window is not None:
+            return self.window.get(index)
+        if index < len(self.tokens):
+            return self.tokens[index]
+        return None
+
     def NextTokenSkipWS(self):
         self.index += 1   #Grab the next token
-        if (self.index < len(self.tokens)):
-            self.crtToken = self.tokens[self.index]
+        token = self.TokenAt(self.index)
+        if token is not None:
+            self.crtToken = token
         else:
             self.crtToken = lex.Token(lex.TokenType.End, "END")
 
@@ -30,8 +125,7 @@ class Parser:
         self.NextTokenSkipWS()
         while (self.crtToken.type == lex.TokenType.Whitespace):
             self.NextTokenSkipWS()
-            print(self.crtToken.lexeme)
-
+            if self.tracing: self.Trace('%s', self.crtToken.lexeme)
     def GetIdentType(self):
             
             match self.crtToken.type:
@@ -40,17 +134,28 @@ class Parser:
                 case lex.TokenType.StringType: return "String"
                 case lex.TokenType.BoolType: return "Boolean"
                 case lex.TokenType.ColourType: return "Colour"
-                case _: raise Exception("Syntax Error, Invalid Type.")
+                case _: raise self.Error("Syntax Error, Invalid Type.")
+
+    def PeekToken(self):
+        # The token NextToken would move to, without moving
+        index = self.index + 1
+        token = self.TokenAt(index)
+        while token is not None and token.type == lex.TokenType.Whitespace:
+            index += 1
+            token = self.TokenAt(index)
+        return token if token is not None else lex.Token(lex.TokenType.End, "END")
 
     def PreviousTokenSkipWS(self):
         self.index -= 1   #Grab the Previous token
-        if (self.index < len(self.tokens) and self.index > -1):
-            self.crtToken = self.tokens[self.index]
+        token = self.TokenAt(self.index)
+        if token is not None:
+            self.crtToken = token
         else:
             self.crtToken = lex.Token(lex.TokenType.End, "END")
 
     def PreviousToken(self):
- 
+        if self.counting:
+            self.trace.count('parser.backtracks')
         self.PreviousTokenSkipWS()
  
         while (self.crtToken.type == lex.TokenType.Whitespace):
@@ -59,188 +164,91 @@ class Parser:
     def ReturnASTNode(self):
 
         # This function technically serves as to return a Factor.
-
+        node = self.ReturnFactor()
+        if node is not None:
+            node.offset = self.crtToken.start
+            if self.factory is not None:
+                node = self.factory.share(node)
+        return node
+
+    def ReturnFactor(self):
         match self.crtToken.type:
             case lex.TokenType.Integer: return ast.ASTIntegerNode(self.crtToken.lexeme)
             case lex.TokenType.FloatLiteral : return ast.ASTFloatNode(self.crtToken.lexeme)
             case lex.TokenType.ColourLiteral : return ast.ASTColourNode(self.crtToken.lexeme)
             case lex.TokenType.BooleanLiteral : return ast.ASTBoolNode(self.crtToken.lexeme)
             case lex.TokenType.String : return ast.ASTStringNode(self.crtToken.lexeme)
-            case lex.TokenType.Identifier : return ast.ASTVariableNode(self.crtToken.lexeme)
+            case lex.TokenType.Identifier : return ast.ASTVariableNode(self.crtToken.lexeme, self.crtToken.symbol)
             case lex.TokenType.PadWidth : return ast.ASTWidthNode()
             case lex.TokenType.PadHeight : return ast.ASTHeightNode()
             case _:
                 return 
 
-    def ParseTerm(self):
-        tempLeft = tempRight = oper = None
-        while self.crtToken.type != lex.TokenType.End:
-
-            if self.crtToken.type in self.tokenTypes:
-                if tempLeft:
-                    tempRight = self.ReturnASTNode()
-                    self.NextToken()
-                else:
-                    tempLeft = self.ReturnASTNode()
-                    self.NextToken()
-
-
-            if (self.crtToken.type == lex.TokenType.Relop):
-                return ast.ASTTermNode(tempLeft, oper, tempRight)
- 
-            
-            if self.crtToken.type == lex.TokenType.Addop:
-                self.PreviousToken()
-                tempRight = self.ParseSimpleExpression()
-
-            if self.crtToken.type == lex.TokenType.And:
-                # Check if preceding operator exists
-                if oper is None:
-                   oper = self.crtToken.lexeme
-                   self.NextToken()
-                # if exists, parse a nested simple expression e.g. 2 + (3 + 4)
-                else:
-                    self.PreviousToken()
-                    tempRight = self.ParseSimpleExpression()
-
-            if (self.crtToken.type == lex.TokenType.Mulop):
-                if oper is None:
-                    oper = self.crtToken.lexeme
-                    self.NextToken()
-                else:
-                    self.PreviousToken()
-                    tempRight = self.ParseTerm()
-
-        
-        print(f'Creating Term Node with {tempLeft}, {oper} and {tempRight}')
-        return ast.ASTTermNode(tempLeft, oper, tempRight)
-
-    def ParseSimpleExpression(self):
-        tempLeft = tempRight = oper = None
-        # Parse Expression until ; or ) or } is hit
-        while self.crtToken.type not in [lex.TokenType.End, lex.TokenType.Parameter_R, lex.TokenType.Declaration_R]:
-            if (self.crtToken.type in self.tokenTypes):
-                if tempLeft is None:
-                    tempLeft = self.ReturnASTNode()
-                else:
-                    tempRight = self.ReturnASTNode()
-                self.NextToken()
-
-
-            if (self.crtToken.type == lex.TokenType.Relop):
-                return ast.ASTSimpleExpNode(tempLeft, oper, tempRight)
-
-            if (self.crtToken.type == lex.TokenType.Addop):
-                # Check if preceding operator exists
-                if oper is None:
-                   oper = self.crtToken.lexeme
-                   self.NextToken()
-                # if exists, parse a nested simple expression e.g. 2 + (3 + 4)
-                else:
-                    self.PreviousToken()
-                    tempRight = self.ParseSimpleExpression()
-            
-            if (self.crtToken.type == lex.TokenType.Or):
-                # Check if preceding operator exists
-                if oper is None:
-                   oper = self.crtToken.lexeme
-                   self.NextToken()
-                # if exists, parse a nested simple expression e.g. 2 + (3 + 4)
-                else:
-                    self.PreviousToken()
-                    tempRight = self.ParseSimpleExpression()
-
-            if (self.crtToken.type == lex.TokenType.Mulop):
-                if oper is None:
-                    oper = self.crtToken.lexeme
-                    self.NextToken()
-                else:
-                    self.PreviousToken()
- 
-                    tempRight = self.ParseTerm()
-
-
-        
-        return ast.ASTSimpleExpNode(tempLeft, oper, tempRight)
-
-    def ParseExpression(self):
-        # Expressions defined as Left <Relop> Right
-
-        left = None
-
-        if self.crtToken.type in self.tokenTypes:
-            # Assign lhs
-            left = self.ReturnASTNode()
-            
+    def ParseExpression(self, minPrecedence=1):
+        # Precedence climbing: operands are parsed once, left to right, and every operator binding at least as
+        # tightly as minPrecedence folds into the left operand, so chains are left associative and linear time
+        left = self.ParseUnary()
+        while True:
+            operator = BinaryOperators.get(self.crtToken.type)
+            if operator is None or operator[0] < minPrecedence:
+                return left
+            precedence, nodeClass = operator
+            op = self.crtToken.lexeme
+            self.NextToken()
+            # The right operand only takes operators binding tighter than this one
+            right = self.ParseExpression(precedence + 1)
+            if self.tracing: self.Trace('Creating %s with %s, %s and %s', nodeClass.__name__, left, op, right)
+            if nodeClass is ast.ASTExpNode:
+                left = ast.ASTExpNode(left, None, op, right)
+            else:
+                left = nodeClass(left, op, right)
+            if self.factory is not None:
+                left = self.factory.share(left)
+
+    def ParseUnary(self):
+        # Unary minus and not bind tighter than any binary operator, 'not' lexes as an identifier
+        token = self.crtToken
+        if (token.type == lex.TokenType.Addop and token.lexeme == '-') or (token.type == lex.TokenType.Identifier and token.lexeme == 'not'):
+            self.NextToken()
+            node = ast.ASTUnaryNode(token.lexeme, self.ParseUnary())
+            node.offset = token.start
+            return node if self.factory is None else self.factory.share(node)
+        return self.ParseFactor()
+
+    def ParseFactor(self):
+        token = self.crtToken
+        if token.type == lex.TokenType.Parameter_L:
+            self.SplitBracket()
+            node = self.ParseExpression()
+            self.CloseBracket()
+            return node
+        if token.type == lex.TokenType.FunctionCall:
+            return self.ParseFunctionCall()
+        if token.type == lex.TokenType.PadRandI:
+            self.NextToken()
+            # Every __random_int is a value of its own, never shared by a factory
+            node = ast.ASTRandNode(self.ParseUnary())
+            node.offset = token.start
+            return node
+        node = self.ReturnASTNode()
+        if node is None:
+            raise self.Error("Expected an expression")
+        self.NextToken()
+        return node
+
+    def SplitBracket(self):
+        # Consumes one bracket of the current token. Runs like "((" or "))" lex as a single token, the brackets
+        # left over stay the current token without moving on in the stream
+        token = self.crtToken
+        if len(token.lexeme) > 1:
+            self.crtToken = lex.Token(token.type, token.lexeme[1:], 0, token.start + 1, token.end)
+        else:
             self.NextToken()
 
- 
-        while self.crtToken.type != lex.TokenType.End and self.crtToken.type != lex.TokenType.Parameter_R:
- 
-            # For N <Relop> N expressions
-            if self.crtToken.type == lex.TokenType.Relop:
-                # Get operator
-                op = self.crtToken.lexeme
-                self.NextToken()
-                # Initiate Rhs for exp
-                tempRight = None
-                if self.crtToken.type in self.tokenTypes:
-                    tempRight = self.ReturnASTNode()
-
-                    self.NextToken()
-
-                    # Case Where N <Op> m <Op> P ....
-                    if self.crtToken.type in [lex.TokenType.Addop, lex.TokenType.Mulop, lex.TokenType.Relop]:
-                        self.PreviousToken()
-                        tempRight = self.ParseExpression()
-
-                    # Case where N and M
-                    if self.crtToken.type == lex.TokenType.And:
-                        # Declare preceding Expression N
-                        tempLeft = ast.ASTExpNode(left, None, op, tempRight)
-                        # Get AND operator
-                        oper = self.crtToken.lexeme
-                        # Jump next token
-                        self.NextToken()
-                        # Parse new Right expression M
-                        tempRight = self.ParseExpression()
-                        # Return resulting expression
-                        return ast.ASTExpNode(tempLeft, None, oper, tempRight)
-                    
-                    # Case where N or M
-                    if self.crtToken.type == lex.TokenType.Or:
-                        # Declare preceding Expression N
-                        tempLeft = ast.ASTExpNode(left, None, op, tempRight)
-                        # Get AND operator
-                        oper = self.crtToken.lexeme
-                        # Jump next token
-                        self.NextToken()
-                        # Parse new Right expression M
-                        tempRight = self.ParseExpression()
-                        # Return resulting expression
-                        return ast.ASTExpNode(tempLeft, None, oper, tempRight)
-                        
-            
-
-                return ast.ASTExpNode(left, None, op, tempRight)
-
-            if self.crtToken.type == lex.TokenType.And:
-                op = self.crtToken.lexeme
-                self.NextToken()
-                right = self.ParseTerm()
-                return ast.ASTExpNode(left, None, op, right)
-
-            # For N <Addop> M expressions
-            if self.crtToken.type == lex.TokenType.Addop:
-                self.PreviousToken()
-                left = self.ParseSimpleExpression()
-
-            # For N <Mulop> M expressions
-            if self.crtToken.type == lex.TokenType.Mulop:
-                self.PreviousToken()
-                left = self.ParseTerm()
-
-        return left
+    def CloseBracket(self):
+        if self.crtToken.type != lex.TokenType.Parameter_R:
+            raise self.Error("Missing Bracket")
+        self.SplitBracket()
 
     def ParseParameters(self):
         tType = None
@@ -249,30 +257,38 @@ class Parser:
 
         if (self.crtToken.type == lex.TokenType.Identifier):
             tName = self.crtToken.lexeme 
+            tSymbol = self.crtToken.symbol
             self.NextToken()
             if (self.crtToken.type == lex.TokenType.Colon):
                 self.NextToken()
                 tType = self.GetIdentType()
-                param = ast.ASTFormalParamNode(tName, tType)
+                param = ast.ASTFormalParamNode(tName, tType, tSymbol)
                 self.NextToken()
         return param
 
     def ParseFunction(self):
+        # Generator like every statement holding a block, see ParseStatementSteps
         if (self.crtToken.type == lex.TokenType.Function):
             tempFunc = ast.ASTFunctionNode()
 
             # Skip whitespacesto get func name 
             self.NextToken()
+            brackets = ''
             if (self.crtToken.type == lex.TokenType.FunctionCall):
-                tempFunc.name = self.crtToken.lexeme.replace('(', '')
-            # Get Parameters
+                tempFunc.name, _, brackets = self.crtToken.lexeme.partition('(')
+                tempFunc.symbol = self.symbols.intern(tempFunc.name)
+            # Get Parameters, "f()" lexes as one token of a function without any
 
             # if (self.crtToken.type == lex.TokenType.Parameter_L):
-            while(self.crtToken.type != lex.TokenType.Parameter_R):
+            while(not brackets and self.crtToken.type != lex.TokenType.Parameter_R):
+                # A ';', '{' or the end of input before the ')' means it is missing
+                if self.crtToken.type in (lex.TokenType.End, lex.TokenType.Declaration_L):
+                    raise self.Error("Missing Bracket")
                 self.NextToken()
-                print(self.crtToken.lexeme)
+                if self.tracing: self.Trace('%s', self.crtToken.lexeme)
                 params = self.ParseParameters()
-                tempFunc.params.add_params(params)
+                if params is not None:
+                    tempFunc.params.add_params(params)
             self.NextToken()
 
             if (self.crtToken.type == lex.TokenType.CastOp):
@@ -281,32 +297,110 @@ class Parser:
                 self.NextToken()
             
             if (self.crtToken.type == lex.TokenType.Declaration_L):
-                    print(self.crtToken.lexeme)
+                    if self.tracing: self.Trace('%s', self.crtToken.lexeme)
                     self.NextToken()
-                    print(self.crtToken.lexeme)
-                    tempFunc.block  = self.ParseBlock()
+                    if self.tracing: self.Trace('%s', self.crtToken.lexeme)
+                    if self.lazy:
+                        tempFunc.bodyParser = self.SkipFunctionBody()
+                    else:
+                        tempFunc.block = yield
                 
             
         return tempFunc
+
+    def SkipFunctionBody(self):
+        # Moves to the '}' closing the body by counting braces, and returns a callable parsing the body from the
+        # current (first) token when called
+        first = self.index
+        bodyToken = self.crtToken
+        if isinstance(self.tokens, lex.TokenBuffer):
+            self.index = self.MatchBrace(first) - 1
+            self.NextToken()
+        else:
+            depth = 1
+            while not self.AtEnd():
+                if self.crtToken.type == lex.TokenType.Declaration_L:
+                    depth += 1
+                elif self.crtToken.type == lex.TokenType.Declaration_R:
+                    depth -= 1
+                    if depth == 0:
+                        break
+                self.NextToken()
+        bodies = self.BodyParser()
+        return lambda: bodies.Counted(bodies.ParseFunctionBody, first, bodyToken)
+
+    def BodyParser(self):
+        # A copy of this parser and its lexer made on the first skipped body. reset() and Start() rebind the
+        # tokens, source and diagnostics of this parser, the copy keeps those of this parse for the bodies left
+        if self.bodies is None:
+            bodies = copy.copy(self)
+            bodies.lexer = copy.copy(self.lexer)
+            bodies.bodies = self.bodies = bodies
+        return self.bodies
+
+    def MatchBrace(self, index):
+        # Index of the '}' closing a body that starts at index, or the number of tokens if it is never closed.
+        # Searches the token type codes as bytes, so skipping a body does not visit its tokens one by one
+        if self.typeCodes is None:
+            self.typeCodes = self.tokens.typeCodes()
+        codes = self.typeCodes
+        opening, closing = bytes([lex.TokenType.Declaration_L.value]), bytes([lex.TokenType.Declaration_R.value])
+        depth = 1
+        while True:
+            close = codes.find(closing, index)
+            if close < 0:
+                return len(codes)
+            nested = codes.find(opening, index, close)
+            if nested < 0:
+                depth -= 1
+                if depth == 0:
+                    return close
+                index = close + 1
+            else:
+                depth += 1
+                index = nested + 1
+
+    def ParseFunctionBody(self, first, bodyToken):
+        # Parses a body SkipFunctionBody stepped over, then puts the parser back where it was
+        index, crtToken = self.index, self.crtToken
+        self.index, self.crtToken = first, bodyToken
+        try:
+            return self.ParseBlock()
+        finally:
+            self.index, self.crtToken = index, crtToken
    
+    def OpenBlock(self):
+        # Moves from the '{' of a statement's block to the first token inside it
+        if self.crtToken.type != lex.TokenType.Declaration_L:
+            raise self.Error("Expected '{'")
+        self.NextToken()
+
     def ParseFunctionCall(self):
-        if self.crtToken.type == lex.TokenType.FunctionCall:
-            # Remove brackets to retrieve name
-            funcName = self.crtToken.lexeme.replace('(', '')
-            tempFuncCall = ast.ASTFunctionCall()
-            tempFuncCall.name = funcName
-            tempParams = []
-            
-        while(self.crtToken.type != lex.TokenType.Parameter_R):
-            self.NextToken()
-            param = self.ParseExpression()
-            tempParams.append(param)
-            if (self.crtToken.type == lex.TokenType.Parameter_R):
-                tempFuncCall.params = tempParams
+        # Leaves the token after the closing bracket current, both as a statement and inside expressions
+        token = self.crtToken
+        funcName, _, brackets = token.lexeme.partition('(')
+        tempFuncCall = ast.ASTFunctionCall([])
+        tempFuncCall.name = funcName
+        tempFuncCall.symbol = self.symbols.intern(funcName)
+        tempFuncCall.offset = token.start
+
+        if brackets:
+            # "f()" lexes as one token, a call without arguments
+            self.crtToken = lex.Token(lex.TokenType.Parameter_R, brackets, 0, token.end - len(brackets), token.end)
+            self.SplitBracket()
+            return tempFuncCall
+
+        self.NextToken()
+        if self.crtToken.type != lex.TokenType.Parameter_R:
+            tempFuncCall.params.append(self.ParseExpression())
+            while self.crtToken.type == lex.TokenType.Comma:
+                self.NextToken()
+                tempFuncCall.params.append(self.ParseExpression())
+        self.CloseBracket()
         return tempFuncCall
        
     def ParseWriteBox(self):
-        print(self.crtToken.lexeme)
+        if self.tracing: self.Trace('%s', self.crtToken.lexeme)
         args = {}
         arg = 0
         arg5 = None
@@ -314,7 +408,7 @@ class Parser:
   
             if self.crtToken.type == lex.TokenType.WriteBox:
                 self.NextToken()
-                print(self.crtToken.lexeme)
+                if self.tracing: self.Trace('%s', self.crtToken.lexeme)
                 continue
 
             elif (self.crtToken.type == lex.TokenType.Comma):
@@ -338,27 +432,29 @@ class Parser:
             elif self.crtToken.type == lex.TokenType.ColourLiteral:
                 arg5 = self.crtToken.lexeme
                 self.NextToken()
-                print(self.crtToken.lexeme)
+                if self.tracing: self.Trace('%s', self.crtToken.lexeme)
                 continue
             else:
-                raise SyntaxError("Invalid arguments for Write Box")
+                raise self.Error("Invalid arguments for Write Box")
 
                     
         if not arg5:
-            raise SyntaxError("Invalid argument for color in writebox")
+            raise self.Error("Invalid argument for color in writebox")
+        if arg != 4:
+            raise self.Error("Write Box takes 4 positions and a colour")
 
         return ast.ASTWriteBoxNode(args[1], args[2], args[3], args[4], arg5)
         
     def ParseWrite(self):
-        print(self.crtToken.lexeme)
+        if self.tracing: self.Trace('%s', self.crtToken.lexeme)
         args = {}
         arg = 0
         arg4 = None
         while (self.crtToken.type != lex.TokenType.End):
-            print(self.crtToken.lexeme)    
+            if self.tracing: self.Trace('%s', self.crtToken.lexeme)
             if self.crtToken.type == lex.TokenType.Write:
                 self.NextToken()
-                print(self.crtToken.lexeme)
+                if self.tracing: self.Trace('%s', self.crtToken.lexeme)
                 continue
 
             elif (self.crtToken.type == lex.TokenType.Comma):
@@ -382,15 +478,17 @@ class Parser:
             elif self.crtToken.type == lex.TokenType.ColourLiteral:
                 arg4 = self.crtToken.lexeme
                 self.NextToken()
-                print(self.crtToken.lexeme)
+                if self.tracing: self.Trace('%s', self.crtToken.lexeme)
                 continue
             else:
-                print(self.crtToken.lexeme)
-                raise SyntaxError("Invalid arguments for write statement.")
+                if self.tracing: self.Trace('%s', self.crtToken.lexeme)
+                raise self.Error("Invalid arguments for write statement.")
 
                     
         if not arg4:
-            raise SyntaxError("Invalid argument for color in write statement.")
+            raise self.Error("Invalid argument for color in write statement.")
+        if arg != 2:
+            raise self.Error("Write statement takes 2 positions and a colour.")
 
         return ast.ASTWriteNode(args[1], args[2], arg4)
 
@@ -399,27 +497,26 @@ class Parser:
         block = conds = nxtBlock = None
 
         self.NextToken()
-        if self.crtToken.type == lex.TokenType.Parameter_L:
-            self.NextToken()
-            conds = self.ParseExpression()
+        if self.crtToken.type != lex.TokenType.Parameter_L:
+            raise self.Error("Missing Bracket")
+        self.NextToken()
+        conds = self.ParseExpression()
         
-        print(self.crtToken.lexeme)
-        if self.crtToken.type == lex.TokenType.Parameter_R:
-            print('changed 1 : ', self.crtToken.lexeme)
-            self.NextToken()
-            print('changed 2 : ', self.crtToken.lexeme)
-            self.NextToken()
-            print('changed 3 : ', self.crtToken.lexeme)
-            block = self.ParseBlock()
-            self.NextToken()
+        if self.tracing: self.Trace('%s', self.crtToken.lexeme)
+        if self.crtToken.type != lex.TokenType.Parameter_R:
+            raise self.Error("Missing Bracket")
+        self.NextToken()
+        self.OpenBlock()
+        block = yield
             
-
-        if self.crtToken.lexeme == "else":
-            print('else found')
+        # Only move past the '}' for an else, otherwise the block parser moves on to the next statement
+        if self.PeekToken().lexeme == "else":
+            if self.tracing: self.Trace('else found')
             self.NextToken()
             self.NextToken()
-            print(self.crtToken.lexeme)
-            nxtBlock = self.ParseBlock()
+            self.OpenBlock()
+            if self.tracing: self.Trace('%s', self.crtToken.lexeme)
+            nxtBlock = yield
         
         return ast.ASTIfNode(conds,block,nxtBlock)
     
@@ -427,41 +524,49 @@ class Parser:
         if self.crtToken.lexeme == "for":
             self.NextToken()
         
-        if self.crtToken.type == lex.TokenType.Parameter_L:
-            # Skip let
-            self.NextToken()
-            self.NextToken()
-            # Parse Assignment Part
-            assign = self.ParseAssignment()
-            self.NextToken()
-            # Parse Condition Part
-            cond = self.ParseExpression()
-            self.NextToken()
-            # Parse Step Part
-            step = self.ParseAssignment()
-            self.NextToken()
-            self.NextToken()
-            block = self.ParseBlock()
+        if self.crtToken.type != lex.TokenType.Parameter_L:
+            raise self.Error("Missing Bracket")
+        # Skip let
+        self.NextToken()
+        self.NextToken()
+        # Parse Assignment Part
+        assign = self.ParseAssignment()
+        self.SkipSemicolon()
+        # Parse Condition Part
+        cond = self.ParseExpression()
+        self.SkipSemicolon()
+        # Parse Step Part
+        step = self.ParseAssignment()
+        if self.crtToken.type != lex.TokenType.Parameter_R:
+            raise self.Error("Missing Bracket")
+        self.NextToken()
+        self.OpenBlock()
+        block = yield
 
+        return ast.ASTForNode(assign, cond, step, block)
 
-            return ast.ASTForNode(assign, cond, step, block)
+    def SkipSemicolon(self):
+        # Moves past the ';' between the parts of a for
+        if self.crtToken.type != lex.TokenType.End:
+            raise self.Error("Expected ';'")
+        self.NextToken()
 
     def ParseWhile(self):
         if self.crtToken.lexeme == "while":
             self.NextToken()
  
         if self.crtToken.type != lex.TokenType.Parameter_L:
-            raise SyntaxError("Missing Bracket")
+            raise self.Error("Missing Bracket")
         
         self.NextToken()
         expr = self.ParseExpression()
         
         if self.crtToken.type != lex.TokenType.Parameter_R:
-            raise SyntaxError("Missing Bracket")
+            raise self.Error("Missing Bracket")
         
         self.NextToken()
-        self.NextToken()
-        block = self.ParseBlock()
+        self.OpenBlock()
+        block = yield
 
         return ast.ASTWhileNode(expr, block)
 
@@ -473,31 +578,38 @@ class Parser:
             return ast.ASTReturnNode(self.ParseExpression(), type) 
     
         elif self.crtToken.lexeme == "if":
-            return self.ParseIf()
+            return (yield from self.ParseIf())
         
         elif self.crtToken.lexeme == "for":
-            return self.ParseFor()
+            return (yield from self.ParseFor())
         
         elif self.crtToken.lexeme == "while":
-            return self.ParseWhile()
+            return (yield from self.ParseWhile())
         
         elif self.crtToken.lexeme == "let":
             return self.ParseAssignment()
 
+        raise self.Error(f"Unexpected '{self.crtToken.lexeme}'")
+
 # Used for redeclaring values of variables 
     def ParseReassignment(self):
         if self.crtToken.type == lex.TokenType.Identifier:
-            assignment_lhs = ast.ASTVariableNode(self.crtToken.lexeme)
+            assignment_lhs = ast.ASTVariableNode(self.crtToken.lexeme, self.crtToken.symbol)
+            assignment_lhs.offset = self.crtToken.start
+            if self.factory is not None:
+                assignment_lhs = self.factory.share(assignment_lhs)
             self.NextToken()
 
         if (self.crtToken.type == lex.TokenType.AssignOp):
             self.NextToken()
             tempRhs = self.ParseExpression()
-            assignment_rhs = ast.ASTExpNode(tempRhs, tempRhs.type)
+            assignment_rhs = ast.ASTExpNode(tempRhs, getattr(tempRhs, 'type', None))
+            if self.factory is not None:
+                assignment_rhs = self.factory.share(assignment_rhs)
 
             return ast.ASTReAssignNode(assignment_lhs, assignment_rhs)
         else:
-            raise SyntaxError("Invalid Statement")
+            raise self.Error("Invalid Statement")
 
     def ParseAssignment(self):  
         expType = None
@@ -505,15 +617,19 @@ class Parser:
             self.NextToken()
 
         #Assignment is made up of two main parts; the LHS (the variable) and RHS (the expression)
-        if (self.crtToken.type == lex.TokenType.Identifier):
-            #create AST node to store the identifier            
-            assignment_lhs = ast.ASTVariableNode(self.crtToken.lexeme)
-            self.NextToken()
-            # Check if statement is in the form x = expr (reassignment)
-            if (self.crtToken.type == lex.TokenType.AssignOp):
-                self.PreviousToken()
-                assignment_rhs = self.ParseReassignment()
-                return assignment_rhs
+        if (self.crtToken.type != lex.TokenType.Identifier):
+            raise self.Error("Expected a variable name")
+        #create AST node to store the identifier            
+        assignment_lhs = ast.ASTVariableNode(self.crtToken.lexeme, self.crtToken.symbol)
+        assignment_lhs.offset = self.crtToken.start
+        if self.factory is not None:
+            assignment_lhs = self.factory.share(assignment_lhs)
+        self.NextToken()
+        # Check if statement is in the form x = expr (reassignment)
+        if (self.crtToken.type == lex.TokenType.AssignOp):
+            self.PreviousToken()
+            assignment_rhs = self.ParseReassignment()
+            return assignment_rhs
 
         if (self.crtToken.type == lex.TokenType.Colon):
 
@@ -531,6 +647,8 @@ class Parser:
             tempRhs = self.ParseExpression()
 
             assignment_rhs = ast.ASTExpNode(tempRhs, expType)
+            if self.factory is not None:
+                assignment_rhs = self.factory.share(assignment_rhs)
 
             return ast.ASTAssignmentNode(assignment_lhs, assignment_rhs)
  
@@ -539,20 +657,75 @@ class Parser:
           
           return ast.ASTDeclareNode(assignment_lhs, expType)
 
+        raise self.Error("Invalid Statement")
+
     def ParseStatement(self):
-        print(self.crtToken.lexeme)
+        # Parses one statement, blocks nested in it are parsed recursively
+        steps = self.ParseStatementSteps()
+        try:
+            steps.send(None)
+            while True:
+                steps.send(self.Closed(self.ParseBlockRecursive()))
+        except StopIteration as done:
+            return done.value
+
+    def ParseStatementSteps(self):
+        # Generator over one statement. Each time the statement reaches the first token inside one of its blocks
+        # it yields, and resumes once the finished ASTBlockNode is sent back. Returns the statement node
+        start = self.crtToken.start
+        node = yield from self.ParseStatementAt()
+        # Statements end on their ';', or on the '}' of their last block
+        if self.crtToken.type not in (lex.TokenType.End, lex.TokenType.Declaration_R):
+            raise self.Error("Expected ';'")
+        # Every statement node points at the token it starts with
+        if node is not None and node.offset is None:
+            node.offset = start
+        return node
+
+    def Recover(self, block, error, startIndex, start):
+        # Panic mode: records the error, stands an ASTErrorNode in for the broken statement and skips to the next
+        # ';', '}' or statement keyword. Leaves the token the block should carry on from current
+        self.Report(block, error, start)
+        # Always drop at least one token, so a statement failing on its first token cannot stall the parser
+        if self.index == startIndex:
+            self.NextToken()
+        while not self.AtSyncPoint():
+            self.NextToken()
+        if self.crtToken.type == lex.TokenType.End and not self.AtEnd():
+            self.NextToken()
+
+    def Report(self, block, error, start):
+        if self.counting:
+            self.trace.count('parser.errors')
+        self.diagnostics.append(error)
+        node = ast.ASTErrorNode(str(error))
+        node.offset = start
+        block.add_statement(node)
+
+    def AtSyncPoint(self):
+        token = self.crtToken
+        if token.type in (lex.TokenType.End, lex.TokenType.Declaration_R):
+            return True
+        return token.type == lex.TokenType.Keyword and token.lexeme in SyncKeywords
+
+    def AtEnd(self):
+        # True past the last token, where crtToken is the END sentinel
+        return self.TokenAt(self.index) is None
+
+    def ParseStatementAt(self):
+        if self.tracing: self.Trace('%s', self.crtToken.lexeme)
         #At the moment we only have assignment statements .... you'll need to add more for the assignment - branching depends on the token type
         if self.crtToken.type == lex.TokenType.Identifier:
             return self.ParseAssignment()
         
         elif self.crtToken.type == lex.TokenType.Function:
-            return self.ParseFunction()
+            return (yield from self.ParseFunction())
         
         elif self.crtToken.type == lex.TokenType.FunctionCall:
             return self.ParseFunctionCall()
         
         elif self.crtToken.type == lex.TokenType.Keyword:
-            return self.ParseKeyword()
+            return (yield from self.ParseKeyword())
         
         elif self.crtToken.type == lex.TokenType.WriteBox:
             return self.ParseWriteBox()
@@ -560,52 +733,109 @@ class Parser:
         elif self.crtToken.type == lex.TokenType.Write:
             return self.ParseWrite()
         
-        print(self.crtToken.lexeme)
-        raise SyntaxError("Invalid Statement")
-        
-    def ParseBlock(self):
-        #At the moment we only have assignment statements .... you'll need to add more for the assignment - branching depends on the token type
+        if self.tracing: self.Trace('%s', self.crtToken.lexeme)
+        raise self.Error("Invalid Statement")
+
+    def NewBlock(self):
+        if self.builder is not None:
+            return FlatAST.BlockEmitter(self.builder, self.crtToken.start)
         block = ast.ASTBlockNode()
+        block.offset = self.crtToken.start
+        return block
 
-        # Process block before } or ;
-        while (self.crtToken.type != lex.TokenType.End and self.crtToken.type != lex.TokenType.Parameter_R and self.crtToken.type != lex.TokenType.Declaration_R):
- 
-            s = self.ParseStatement()
-            block.add_statement(s)
+    def Closed(self, block):
+        # What a statement gets for the nested block it asked for, a flat parser adds the block to its builder
+        return block if self.builder is None else block.finish()
+
+    def ParseBlock(self, block=None):
+        # Statements up to the '}', ')' or ';' ending the block, which is left as the current token. Adds them to
+        # block when given, a new ASTBlockNode otherwise
+        if self.iterative:
+            return self.ParseBlockIterative(block)
+        return self.ParseBlockRecursive(block)
+
+    def ParseBlockRecursive(self, block=None):
+        if block is None:
+            block = self.NewBlock()
+        while self.crtToken.type not in BlockEnd:
+            startIndex, start = self.index, self.crtToken.start
+            try:
+                statement = self.ParseStatement()
+            except SyntaxError as error:
+                if not self.recover:
+                    raise
+                self.Recover(block, error, startIndex, start)
+                continue
+            block.add_statement(statement)
             self.NextToken()
-            if (self.crtToken.type == lex.TokenType.End):
-                # If next token is still END 
-                if (self.crtToken.type == lex.TokenType.End): 
-                    return block
-                
-            if (self.crtToken.type == lex.TokenType.Declaration_R):
-                return block
-
-
         return block
 
+    def ParseBlockIterative(self, block=None):
+        # Same blocks as ParseBlockRecursive without recursing per nesting level. blocks holds the blocks being
+        # filled, outermost first, and waiting[i] is the statement that asked for blocks[i + 1]
+        blocks = [self.NewBlock() if block is None else block]
+        waiting = []
+        # Where each waiting statement began, for error recovery
+        starts = []
+        while True:
+            if self.crtToken.type in BlockEnd:
+                block = blocks.pop()
+                if not waiting:
+                    return block
+                # Hand the finished block to the statement that asked for it
+                steps = waiting.pop()
+                startIndex, start = starts.pop()
+                sent = self.Closed(block)
+            else:
+                steps = self.ParseStatementSteps()
+                startIndex, start = self.index, self.crtToken.start
+                sent = None
+            try:
+                steps.send(sent)
+            except StopIteration as done:
+                blocks[-1].add_statement(done.value)
+                self.NextToken()
+            except SyntaxError as error:
+                if not self.recover:
+                    raise
+                self.Recover(blocks[-1], error, startIndex, start)
+            else:
+                # The statement stopped at a nested block, parse that first
+                waiting.append(steps)
+                starts.append((startIndex, start))
+                blocks.append(self.NewBlock())
+
     def ParseProgram(self):                        
         self.NextToken()  #set crtToken to the first token (skip all WS)
-        b = self.ParseBlock()        
+        if self.flat:
+            self.builder = FlatAST.FlatBuilder()
+        b = self.NewBlock()
+        self.ParseBlock(b)
+        # A stray ')', '}' or ';' ends the outermost block early, when recovering report it and carry on
+        while self.recover and not self.AtEnd():
+            self.Report(b, self.Error(f"Unexpected '{self.crtToken.lexeme}'"), self.crtToken.start)
+            self.NextToken()
+            self.ParseBlock(b)
+        if self.flat:
+            return b.finishProgram()
         return ast.ASTProgramNode(b)       
 
+    def Counted(self, parse, *args):
+        # parse(*args), with the nodes it builds counted when this parser counts
+        if not self.counting:
+            return parse(*args)
+        with ast.countingConstructedNodes(self.trace):
+            return parse(*args)
+
     def Parse(self):        
-        self.ASTroot = self.ParseProgram()
+        self.ASTroot = self.Counted(self.ParseProgram)
 
 
 
 if __name__ == '__main__':
 
-    inputCode = ""
-    with open('./something.txt', 'r') as file:
-     inputCode = file.read()
-
-    parser = Parser("""
-                    y = 6 + y;
-                    """)
+    parser = Parser.from_path(sys.argv[1] if len(sys.argv) > 1 else './something.txt')
     parser.Parse()
 
     print_visitor = ast.PrintNodesVisitor()
-    parser.ASTroot.accept(print_visitor)
-
- 
\ No newline at end of file
+    ASTWalker.walk(parser.ASTroot, print_visitor)
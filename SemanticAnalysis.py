@@ -2,6 +2,9 @@
 import Parser as Parser
 import Lexer as lex
 import ASTNodes as ast
+import ASTWalker
+import SymbolTable
+from ASTWalker import Skip
 
 
 
@@ -11,132 +14,136 @@ import ASTNodes as ast
 
 
 class SemanticAnalyzer:
-    def __init__(self, root):
-        self.symbol_table = {}
-        self.index = 0
+    # Driven by ASTWalker. The walk goes into every block, also the bodies of if, while and for statements, and
+    # stops at expressions: the visit methods of statements and expressions return Skip. Every block and every
+    # for statement is a scope, a function's parameters are in a scope around its body
+    def __init__(self, root, symbols=None, lines=None):
+        # Keyed by SymbolPool id, the parser already resolved every name to one. Holds the global names once
+        # analyze() is done
+        self.symbol_table = SymbolTable.ScopedSymbolTable()
         self.root = root
-
-        
-    # Used for error checking function blocks only
-    def analyze_block(self, node):
-        tempIndex = 0
-        innerSymbolTable = {}
-        returnType = node.returnType
-        hasReturn = False
-        while (tempIndex < len(node.block.stmts)):
-            currentNode = node.block.stmts[tempIndex]
-
-            match type(currentNode):
-                # Assignment node
-                case ast.ASTAssignmentNode:
-                    if currentNode.id.lexeme in innerSymbolTable.keys():
-                        raise Exception(f"Variable {currentNode.id.lexeme} already Declared in function {node.name}")
-                    innerSymbolTable[currentNode.id.lexeme]  = { "type" : "assign", "varType" : currentNode.expr.type }
-                    tempIndex += 1
-                    continue
-                # ReAssignment node
-                case ast.ASTReAssignNode:
-                    if currentNode.id.lexeme in self.symbol_table.keys():
-                        self.index += 1
-                        continue
-                    else:
-                        raise Exception(f"Variable {currentNode.id.lexeme} isn't defined.")
-                # Declare node ()
-                case ast.ASTDeclareNode:
-                    if currentNode.var in innerSymbolTable :
-                        innerSymbolTable[currentNode.var] = {"type" : "declare", "varType" : currentNode.type }
-                        tempIndex += 1
-                        continue
-                
-                case ast.ASTFunctionNode:
-                    raise Exception(f"Cannot define nested functions, in {node.name}.")
-                
-
-                case ast.ASTReturnNode:
-                    if currentNode.type != returnType:
-                        raise SyntaxError(f"return type in {node.name} does not match defined return type of function. Expected {returnType}, got {currentNode.type}")
-                    hasReturn = True
-                    tempIndex += 1
-
-                case ast.ASTFunctionCall:
-                    if currentNode.name in self.symbol_table.keys():
-                        tempIndex += 1
-                        continue
-                    else:
-                        raise Exception(f"Function {currentNode.name} is not defined.")
- 
-                case _:
-                    raise SyntaxError("Invalid Statement")
-        
-        if not hasReturn:
-            raise Exception(f"Funciton {node.name} returns no value.")
-
+        # Pool the ids came from, only needed to show names
+        self.symbols = symbols
+        # Lexer LineIndex, lets diagnostics name a line and column
+        self.lines = lines
+        # Function whose body is being checked, None at the top level
+        self.function = None
+        self.hasReturn = False
+
+    def where(self, node):
+        if self.lines is None or node.offset is None:
+            return ""
+        return f" ({self.lines.describe(node.offset)})"
 
     def analyze(self):
-        # Get root block
-        Block = self.root.block
-        # Iterate throughout block statements   
-        while (self.index < len(Block.stmts)):
-            # Get current node
-            currentNode = Block.stmts[self.index]
-
-            # Match case of nodes
-            match type(currentNode):
-                # Assignment node
-                case ast.ASTAssignmentNode:
-                    if currentNode.id.lexeme in self.symbol_table.keys():
-                        raise Exception(f"Variable {currentNode.id.lexeme} already declared. ")
-                    self.symbol_table[currentNode.id.lexeme]  = { "type" : "assign", "varType" : currentNode.expr.type }
-                    self.index += 1
-                    continue
-                # ReAssignment node
-                case ast.ASTReAssignNode:
-                    if currentNode.id.lexeme in self.symbol_table.keys():
-                        self.index += 1
-                        continue
-                    else:
-                        raise Exception(f"Variable {currentNode.id.lexeme} isn't defined.")
-                # Declare node ()
-                case ast.ASTDeclareNode:
-                    self.symbol_table[currentNode.var] = {"type" : "declare", "varType" : currentNode.type }
-                    self.index += 1
-                    continue
-                
-                case ast.ASTFunctionNode:
-                    if currentNode.name not in self.symbol_table.keys():
-                            self.symbol_table[currentNode.name] = {"func_name" : currentNode.name, "type" : "function", "returnType" : currentNode.returnType }
-                            self.analyze_block(currentNode)
-                            self.index += 1
-                            continue
-                    raise Exception("Function already declared.")
-
-
-                case ast.ASTFunctionCall:
-                    if currentNode.name in self.symbol_table.keys():
-                        self.index += 1
-                        continue
-                    else:
-                        raise Exception(f"Function {currentNode.name} is not defined.")
-
-                case ast.ASTIfNode:
-                    self.index += 1
-                    continue
-
-                case ast.ASTWhileNode:
-                    self.index += 1
-                    continue
-
-                case ast.ASTForNode:
-                    self.index += 1
-                    continue
- 
-                case _:
-                    raise SyntaxError("Invalid Statement")
-
-           
+        ASTWalker.walk(self.root, self)
+
+    def visit_program_node(self, node):
+        pass
+
+    def opensScope(self, node):
+        # The program's own block is the global scope, a function's body shares the scope of its parameters
+        return node is not self.root.block and (self.function is None or node is not self.function.block)
+
+    def visit_block_node(self, node):
+        if self.opensScope(node):
+            self.symbol_table.enter()
+
+    def leave_block_node(self, node):
+        if self.opensScope(node):
+            self.symbol_table.leave()
+
+    def visit_node(self, node):
+        # Every statement without a method of its own
+        raise SyntaxError(f"Invalid Statement{self.where(node)}")
+
+    def visit_expression(self, node):
+        # Conditions of if, while and for statements, expressions are not checked
+        return Skip
+
+    visit_variable_node = visit_unary_node = visit_factor_node = visit_simpleexp_node = visit_exp_node = \
+        visit_term_node = visit_width_node = visit_height_node = visit_rand_node = visit_read_node = \
+        visit_integer_node = visit_colour_node = visit_float_node = visit_bool_node = visit_string_node = \
+        visit_expression
+
+    def visit_assignment_node(self, node):
+        if self.symbol_table.declaredHere(node.id.symbol):
+            if self.function is None:
+                raise Exception(f"Variable {node.id.lexeme} already declared{self.where(node)}.")
+            raise Exception(f"Variable {node.id.lexeme} already Declared in function {self.function.name}{self.where(node)}")
+        self.symbol_table.declare(node.id.symbol, { "type" : "assign", "varType" : node.expr.type })
+        return Skip
+
+    def visit_reassign_node(self, node):
+        if node.id.symbol not in self.symbol_table:
+            raise Exception(f"Variable {node.id.lexeme} isn't defined{self.where(node)}.")
+        return Skip
+
+    def visit_declare_node(self, node):
+        self.symbol_table.declare(node.var.symbol, {"type" : "declare", "varType" : node.type })
+        return Skip
+
+    def visit_func_node(self, node):
+        if self.function is not None:
+            raise Exception(f"Cannot define nested functions, in {self.function.name}{self.where(node)}.")
+        if self.symbol_table.declaredHere(node.symbol):
+            raise Exception(f"Function already declared{self.where(node)}.")
+        self.symbol_table.declare(node.symbol, {"func_name" : node.name, "type" : "function", "returnType" : node.returnType })
+        # The walker goes on into the body, which shares the scope the parameters are declared in
+        self.function = node
+        self.hasReturn = False
+        self.symbol_table.enter()
+        for param in node.params.params:
+            self.symbol_table.declare(param.symbol, {"type" : "param", "varType" : param.type })
+
+    def leave_func_node(self, node):
+        self.symbol_table.leave()
+        if not self.hasReturn:
+            raise Exception(f"Funciton {node.name} returns no value{self.where(node)}.")
+        self.function = None
+
+    def visit_formalparams_node(self, node):
+        return Skip
+
+    def visit_return_node(self, node):
+        if self.function is None:
+            raise SyntaxError(f"Invalid Statement{self.where(node)}")
+        if node.type != self.function.returnType:
+            raise SyntaxError(f"return type in {self.function.name} does not match defined return type of function. Expected {self.function.returnType}, got {node.type}{self.where(node)}")
+        self.hasReturn = True
+        return Skip
+
+    def visit_func_call(self, node):
+        if node.symbol not in self.symbol_table:
+            raise Exception(f"Function {node.name} is not defined{self.where(node)}.")
+        return Skip
+
+    def visit_if_node(self, node):
+        pass
+
+    visit_while_node = visit_if_node
+
+    def visit_for_node(self, node):
+        # The loop variable is declared in a scope around the loop's block
+        self.symbol_table.enter()
+
+    def leave_for_node(self, node):
+        self.symbol_table.leave()
+
+    def visit_print_node(self, node):
+        return Skip
+
+    visit_delay_node = visit_write_node = visit_writeBox_node = visit_print_node
+
+    # Statement the parser could not read, already reported
+    def visit_error_node(self, node):
+        return Skip
 
     def displaySymbolTable(self):
-        print(self.symbol_table)
+        if self.symbols is None:
+            print(dict(self.symbol_table.items()))
+            return
+        print({self.symbols.nameOf(symbol) : entry for symbol, entry in self.symbol_table.items()})
 
             
 
@@ -159,7 +166,7 @@ if "__main__" == __name__:
     parserObj.Parse()
 
     print_visitor = ast.PrintNodesVisitor()
-    parserObj.ASTroot.accept(print_visitor)
-    sAnalyzer = SemanticAnalyzer(parserObj.ASTroot)
+    ASTWalker.walk(parserObj.ASTroot, print_visitor)
+    sAnalyzer = SemanticAnalyzer(parserObj.ASTroot, parserObj.symbols, parserObj.lexer.lines())
     sAnalyzer.analyze()
     sAnalyzer.displaySymbolTable()
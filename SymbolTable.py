@@ -0,0 +1,61 @@
+# Scoped symbol table for the semantic analyzer. Names are SymbolPool ids. There is one dict of the bindings in
+# effect, each a (scope depth, entry) pair, and an undo log of the bindings each declaration replaced. Entering a
+# scope only remembers the length of the log, leaving it puts back what the declarations made since then replaced.
+# No dict is copied or chained per scope, so a scope costs the same at any nesting depth and leaving one costs
+# as much as the declarations made in it.
+
+class ScopedSymbolTable():
+    '''Bindings of symbols to entries in nested scopes. The global scope, depth 0, is never left. A declaration
+    shadows the bindings of the same symbol in enclosing scopes until its scope is left'''
+    def __init__(self):
+        # symbol -> (depth of the scope it was declared in, entry), the bindings visible now
+        self.bindings = {}
+        # (symbol, binding it replaced or None) per declaration, oldest first
+        self.log = []
+        # Length of the log when each open scope was entered, innermost last
+        self.marks = []
+
+    @property
+    def depth(self):
+        return len(self.marks)
+
+    def enter(self):
+        self.marks.append(len(self.log))
+
+    def leave(self):
+        '''Drops the innermost scope, the bindings it shadowed are visible again'''
+        if not self.marks:
+            raise IndexError("Cannot leave the global scope")
+        mark = self.marks.pop()
+        log, bindings = self.log, self.bindings
+        while len(log) > mark:
+            symbol, previous = log.pop()
+            if previous is None:
+                del bindings[symbol]
+            else:
+                bindings[symbol] = previous
+
+    def declare(self, symbol, entry):
+        '''Binds symbol to entry in the innermost scope, replacing what it was bound to there'''
+        self.log.append((symbol, self.bindings.get(symbol)))
+        self.bindings[symbol] = (len(self.marks), entry)
+
+    def lookup(self, symbol):
+        '''Entry of the innermost binding of symbol, None when it has none'''
+        binding = self.bindings.get(symbol)
+        return None if binding is None else binding[1]
+
+    def declaredHere(self, symbol):
+        '''True when symbol is bound in the innermost scope itself, not in an enclosing one'''
+        binding = self.bindings.get(symbol)
+        return binding is not None and binding[0] == len(self.marks)
+
+    def __contains__(self, symbol):
+        return symbol in self.bindings
+
+    def __len__(self):
+        return len(self.bindings)
+
+    def items(self):
+        '''(symbol, entry) of every binding visible now'''
+        return [(symbol, entry) for symbol, (_, entry) in self.bindings.items()]
@@ -0,0 +1,76 @@
+# Diagnostics shared by every compiler stage. Stages check a level once (usually when they are created) and only
+# call into the tracer when it is on, so tracing that is switched off costs a boolean test at most.
+import sys
+from collections import Counter
+from enum import IntEnum
+
+class Level(IntEnum):
+    Off = 0
+    Info = 1
+    Debug = 2
+    # Per character / per token detail
+    Trace = 3
+
+# Categories the stages log under
+Categories = ('lexer', 'parser', 'semantic', 'codegen')
+
+
+def printSink(category, level, message):
+    print(f"[{category}] {message}", file=sys.stderr)
+
+
+class Tracer():
+    '''Levels per category, callback sinks and named counters'''
+    def __init__(self):
+        self.levels = {}
+        self.defaultLevel = Level.Off
+        # Callables taking (category, level, message)
+        self.sinks = []
+        # Counters are only kept while counting is on, see count()
+        self.counting = False
+        self.counters = Counter()
+
+    def setLevel(self, level, *categories):
+        '''Sets the level of the given categories, or the default of every category when none are given'''
+        if not categories:
+            self.defaultLevel = Level(level)
+            self.levels.clear()
+        for category in categories:
+            self.levels[category] = Level(level)
+
+    def level(self, category):
+        return self.levels.get(category, self.defaultLevel)
+
+    def enabled(self, category, level):
+        '''True if messages of this level in this category reach a sink'''
+        return bool(self.sinks) and level <= self.level(category)
+
+    def addSink(self, sink):
+        self.sinks.append(sink)
+
+    def removeSink(self, sink):
+        self.sinks.remove(sink)
+
+    def log(self, category, level, message, *args):
+        '''Sends message to every sink, args are only formatted in (printf style) once the level is enabled'''
+        if not self.enabled(category, level):
+            return
+        if args:
+            message = message % args
+        for sink in self.sinks:
+            sink(category, level, message)
+
+    def setCounting(self, counting):
+        self.counting = counting
+
+    def count(self, name, amount=1):
+        if self.counting:
+            self.counters[name] += amount
+
+    def reset(self):
+        '''Clears every counter'''
+        self.counters.clear()
+
+
+# Tracer every stage uses unless it is handed another one
+tracer = Tracer()
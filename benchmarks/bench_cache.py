@@ -0,0 +1,75 @@
+# Cost of parsing through the AST cache: a cold run parses and stores every program, a warm run reads them back.
+# Checks the trees read back are the ones the parser builds, that a program with a syntax error in a lazy body is
+# never stored, and shows LRU eviction under a small size limit.
+# Run from the repository root with:  python -m benchmarks.bench_cache [files] [size] [seed]
+import os
+import sys
+import tempfile
+import time
+
+import ASTCache
+import Parser
+
+from benchmarks.bench_nesting import dump, nestedProgram
+from benchmarks.generator import generateProgram, parseSize
+
+def compileAll(cache, paths):
+    '''Seconds to get every tree through cache, each one is dropped before the next as in a build'''
+    start = time.perf_counter()
+    for path in paths:
+        cache.parse_path(path)
+    return time.perf_counter() - start
+
+# A syntax error a lazy parse only meets once the function body is read
+BrokenBody = "fun f(x:int) -> int { let y:int = ; return y; }\nlet g:int = 2;"
+
+def storesBroken(cache):
+    '''Whether a lazy, recovering parse of BrokenBody ends up in cache'''
+    for _ in range(2):
+        _, _, hit = cache.parse(BrokenBody, lazy=True, recover=True)
+    return hit
+
+def uncached(paths):
+    start = time.perf_counter()
+    for path in paths:
+        with open(path, 'rb') as file:
+            Parser.Parser(file.read()).Parse()
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    size = parseSize(sys.argv[2]) if len(sys.argv) > 2 else 64 << 10
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        sources = [generateProgram(size, seed + n) for n in range(files)] + [nestedProgram(20000, seed)]
+        for n, source in enumerate(sources):
+            paths.append(os.path.join(directory, f"program{n}.parl"))
+            with open(paths[-1], 'w') as file:
+                file.write(source)
+
+        cache = ASTCache.ASTCache(os.path.join(directory, 'cache'))
+        parseSeconds = uncached(paths)
+        coldSeconds = compileAll(cache, paths)
+        warmSeconds = compileAll(cache, paths)
+        entryBytes = cache.size
+        same = True
+        for path, source in zip(paths, sources):
+            root, _, hit = cache.parse_path(path)
+            same = same and hit and dump(Parser.Parser(source).ParseProgram()) == dump(root)
+        print(f"{len(paths)} files, {sum(map(len, sources)):,} chars, {entryBytes:,} bytes of cache entries")
+        print(f"parse only  {parseSeconds:8.4f}s")
+        print(f"cold cache  {coldSeconds:8.4f}s  parse and store")
+        print(f"warm cache  {warmSeconds:8.4f}s  {warmSeconds / parseSeconds:6.1%} of parsing")
+        print(f"stats {dict(cache.stats)}  hit rate {cache.hitRate():.0%}")
+        print("cached and parsed trees are " + ("identical" if same else "DIFFERENT"))
+        broken = storesBroken(cache)
+        print("a syntax error in a lazy body is " + ("STORED" if broken else "never stored"))
+
+        # Room for about half the entries, the oldest ones go first
+        small = ASTCache.ASTCache(os.path.join(directory, 'small'), maxBytes=entryBytes // 2)
+        compileAll(small, paths)
+        compileAll(small, paths[-len(paths) // 4:])
+        print(f"size limit {small.maxBytes:,}: {dict(small.stats)}, {small.size:,} bytes kept")
+        sys.exit(0 if same and not broken else 1)
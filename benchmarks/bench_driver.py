@@ -0,0 +1,45 @@
+# Throughput of the Compile.py driver on a batch of generated programs with 1, 2, 4 ... workers up to the core
+# count, against compiling the same files one after another in this process.
+# Run from the repository root with:  python -m benchmarks.bench_driver [files] [size] [seed]
+import os
+import sys
+import tempfile
+import time
+
+import Compile
+
+from benchmarks.generator import generateProgram, parseSize
+
+def workerCounts():
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 < cores:
+        counts.append(counts[-1] * 2)
+    return counts + [cores] if cores > 1 else counts
+
+if __name__ == '__main__':
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    size = parseSize(sys.argv[2]) if len(sys.argv) > 2 else 4 << 10
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for n in range(files):
+            paths.append(os.path.join(directory, f"program{n}.parl"))
+            with open(paths[-1], 'w') as file:
+                file.write(generateProgram(size, seed + n))
+        print(f"{files} files of {size:,} B, {os.cpu_count()} cores")
+
+        start = time.perf_counter()
+        serial = [Compile.compileFile(path) for path in paths]
+        serialSeconds = time.perf_counter() - start
+        print(f"  serial      {serialSeconds:8.3f}s  {files / serialSeconds:8.1f} files/s")
+
+        for workers in workerCounts():
+            start = time.perf_counter()
+            results = list(Compile.compileAll(paths, workers))
+            elapsed = time.perf_counter() - start
+            same = sorted(result['failed'] or '' for result in results) == \
+                   sorted(result['failed'] or '' for result in serial)
+            print(f"  {workers:3} workers {elapsed:8.3f}s  {files / elapsed:8.1f} files/s  "
+                  f"speedup {serialSeconds / elapsed:5.2f}x" + ("" if same else "  RESULTS DIFFER"))
@@ -0,0 +1,77 @@
+# Dumps a generated program's tree to files: PrintNodesVisitor printing to a redirected stdout against
+# ASTDump's buffered text dump, and the JSON Lines and S-expression dumps. Checks that the text dump matches the
+# printed one byte for byte, and that loading the JSON dump gives back the tree, also for blocks nested far
+# deeper than the recursion limit.
+# Run from the repository root with:  python -m benchmarks.bench_dump [size] [seed] [depth]
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+import ASTDump
+import ASTNodes as ast
+import ASTWalker
+import Parser
+
+from benchmarks.bench_nesting import dump, nestedProgram
+from benchmarks.generator import generateProgram, parseSize
+
+def printed(root, path):
+    with open(path, 'w') as file, contextlib.redirect_stdout(file):
+        ASTWalker.walk(root, ast.PrintNodesVisitor())
+
+def dumped(root, path, format):
+    with open(path, 'w') as file:
+        ASTDump.dump(root, file, format)
+
+def loaded(path):
+    with open(path) as file:
+        return ASTDump.loadJSON(file)
+
+def records(path):
+    with open(path) as file:
+        return sum(1 for _ in ASTDump.readJSON(file))
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+def same(first, second):
+    with open(first, 'rb') as one, open(second, 'rb') as other:
+        return one.read() == other.read()
+
+if __name__ == '__main__':
+    size = parseSize(sys.argv[1]) if len(sys.argv) > 1 else 1 << 20
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    depth = int(sys.argv[3]) if len(sys.argv) > 3 else 100000
+    parser = Parser.Parser(generateProgram(size, seed))
+    parser.Parse()
+    root = parser.ASTroot
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {name : os.path.join(directory, name) for name in ('printed', 'text', 'json', 'sexp', 'nested')}
+        print(f"{size:,} B program")
+        seconds, _ = timed(printed, root, paths['printed'])
+        print(f"print()       {seconds:7.3f}s {os.path.getsize(paths['printed']) / 1024:9,.0f} KB")
+        for format in ('text', 'json', 'sexp'):
+            seconds, _ = timed(dumped, root, paths[format], format)
+            print(f"ASTDump {format:5} {seconds:7.3f}s {os.path.getsize(paths[format]) / 1024:9,.0f} KB")
+        ok = same(paths['printed'], paths['text'])
+
+        seconds, count = timed(records, paths['json'])
+        print(f"readJSON      {seconds:7.3f}s {count:,} records")
+        seconds, tree = timed(loaded, paths['json'])
+        print(f"loadJSON      {seconds:7.3f}s")
+        ok = ok and dump(tree) == dump(root)
+
+        parser = Parser.Parser(nestedProgram(depth))
+        parser.Parse()
+        dumpSeconds, _ = timed(dumped, parser.ASTroot, paths['nested'], 'json')
+        loadSeconds, tree = timed(loaded, paths['nested'])
+        ok = ok and dump(tree) == dump(parser.ASTroot)
+        print(f"{depth:,} nested blocks   dump {dumpSeconds:7.3f}s   load {loadSeconds:7.3f}s")
+
+    print("dumps agree" if ok else "dumps DISAGREE")
+    sys.exit(0 if ok else 1)
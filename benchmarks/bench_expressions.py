@@ -0,0 +1,46 @@
+# Parse time of long operator chains, which should grow linearly with the number of operands.
+# Run from the repository root with:  python -m benchmarks.bench_expressions [operands,...] [repeat]
+import random
+import sys
+import time
+
+import Parser
+import Tracing
+
+Operators = ['+', '-', '*', '/', '<', '==', 'and', 'or']
+
+def buildExpression(operands, seed=0):
+    '''A let statement whose expression mixes every binary operator, unary minus and brackets'''
+    rng = random.Random(seed)
+    parts = []
+    for i in range(operands):
+        if i:
+            parts.append(rng.choice(Operators))
+        operand = rng.choice(['x', str(rng.randint(0, 1000)), '( y * 2 )'])
+        parts.append(f"- {operand}" if rng.random() < 0.1 else operand)
+    return f"let x:int = {' '.join(parts)} ;"
+
+def timeParse(source, repeat):
+    best = None
+    for _ in range(repeat):
+        parser = Parser.Parser(source)
+        start = time.perf_counter()
+        parser.Parse()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+if __name__ == '__main__':
+    sizes = [int(n) for n in sys.argv[1].split(',')] if len(sys.argv) > 1 else [1000, 10000, 100000]
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    for operands in sizes:
+        source = buildExpression(operands)
+        elapsed = timeParse(source, repeat)
+        # One counted run, outside the timings, to show the parser never rewinds
+        Tracing.tracer.setCounting(True)
+        Tracing.tracer.reset()
+        Parser.Parser(source).Parse()
+        backtracks = Tracing.tracer.counters['parser.backtracks']
+        Tracing.tracer.setCounting(False)
+        print(f"{operands:>8,} operands  {elapsed:8.4f}s  {elapsed / operands * 1e6:6.2f} us/operand  backtracks {backtracks}")
@@ -0,0 +1,106 @@
+# The flat AST against the object tree of the same generated program: bytes per node, peak memory of parsing
+# into each (every case in a fresh interpreter), also with the whole program in one function body, pickled size
+# and time, and the time to walk every node.
+# Checks that a flat parse, fromTree() and toTree() all give back the object tree the Parser builds.
+# Run from the repository root with:  python -m benchmarks.bench_flat [size] [seed]
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+
+import FlatAST
+import Parser
+
+from benchmarks.bench_memory import nodes, treeBytes
+from benchmarks.bench_nesting import dump
+from benchmarks.generator import generateProgram, parseSize
+
+# Peak RSS in KB before and after parsing the file at argv[1] with the options at argv[2]
+Program = '''
+import sys
+import Parser
+def peak():
+    with open('/proc/self/status') as status:
+        return next(line.split()[1] for line in status if line.startswith('VmHWM:'))
+base = peak()
+parser = Parser.Parser.from_path(sys.argv[1], flat=sys.argv[2] == 'flat')
+parser.Parse()
+print(base, peak())
+'''
+
+def peak(path, mode):
+    result = subprocess.run([sys.executable, '-c', Program, path, mode], capture_output=True, text=True, check=True)
+    before, after = result.stdout.split()
+    return int(after) - int(before)
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+def constantBytes(tree):
+    '''Bytes of the constants table, its tuples and the strings only it holds'''
+    total = sys.getsizeof(tree.constants)
+    for operand in tree.constants:
+        total += sys.getsizeof(operand)
+    return total
+
+def walkFlat(tree):
+    count = 0
+    for _ in tree.walk():
+        count += 1
+    return count
+
+def walkTree(root):
+    return len(nodes(root)[0])
+
+if __name__ == '__main__':
+    size = parseSize(sys.argv[1]) if len(sys.argv) > 1 else 4 << 20
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    source = generateProgram(size, seed)
+
+    parser = Parser.Parser(source)
+    treeSeconds, _ = timed(parser.Parse)
+    root = parser.ASTroot
+    flatParser = Parser.Parser(source, flat=True)
+    flatSeconds, _ = timed(flatParser.Parse)
+    flat = flatParser.ASTroot
+
+    expected = dump(root)
+    fromSeconds, converted = timed(FlatAST.fromTree, root)
+    toSeconds, rebuilt = timed(flat.toTree)
+    same = dump(rebuilt) == expected and dump(converted.toTree()) == expected
+
+    count, nodeBytes, listBytes = treeBytes(root)
+    flatBytes = flat.nbytes() + constantBytes(flat)
+    print(f"{len(source):,} chars, {count:,} nodes, {len(flat):,} flat entries, {len(flat.constants):,} constants")
+    print(f"object tree  {(nodeBytes + listBytes) / count:6.1f} B/node   parse {treeSeconds:7.3f}s")
+    print(f"flat         {flatBytes / count:6.1f} B/node   parse {flatSeconds:7.3f}s  "
+          f"({flat.nbytes() / count:.1f} B/node of arrays)")
+    print(f"fromTree {fromSeconds:7.3f}s   toTree {toSeconds:7.3f}s")
+
+    treeWalk, _ = timed(walkTree, root)
+    flatWalk, _ = timed(walkFlat, flat)
+    print(f"walk every node   object tree {treeWalk:7.3f}s   flat {flatWalk:7.3f}s")
+
+    pickleSeconds, data = timed(pickle.dumps, flat, pickle.HIGHEST_PROTOCOL)
+    loadSeconds, loaded = timed(pickle.loads, data)
+    same = same and dump(loaded.toTree()) == expected
+    print(f"pickled flat      {len(data) / 1024:9,.0f} KB  dumps {pickleSeconds:7.3f}s  loads {loadSeconds:7.3f}s")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'program.parl')
+        with open(path, 'w') as file:
+            file.write(source)
+        print(f"peak memory of a parse  object tree {peak(path, 'tree') / 1024:8,.1f} MB   "
+              f"flat {peak(path, 'flat') / 1024:8,.1f} MB")
+        # Blocks go into the flat AST as they end, a large body is never an object tree of its own
+        with open(path, 'w') as file:
+            file.write("fun main() -> int {\n" + source + "\n}\n")
+        print(f"  in one function body  object tree {peak(path, 'tree') / 1024:8,.1f} MB   "
+              f"flat {peak(path, 'flat') / 1024:8,.1f} MB")
+
+    print("flat and object trees are " + ("identical" if same else "DIFFERENT"))
+    sys.exit(0 if same else 1)
@@ -0,0 +1,102 @@
+# Parses a generated program with and without a HashCons.NodeFactory: distinct node objects and their bytes,
+# parse time, and the repeated subexpressions the shared tree finds by identity. Checks that the shared tree
+# has the same structure as the plain one, offsets aside, and that __random_int expressions are never shared.
+# Run from the repository root with:  python -m benchmarks.bench_hashcons [size] [seed]
+import sys
+import time
+from collections import Counter
+
+import ASTNodes as ast
+import HashCons
+import Parser
+
+from benchmarks.generator import generateProgram, parseSize
+
+def parse(source, factory=None, repeat=3):
+    best = None
+    for _ in range(repeat):
+        parser = Parser.Parser(source, factory=None if factory is None else HashCons.NodeFactory())
+        start = time.perf_counter()
+        parser.Parse()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, parser
+
+def uses(root):
+    '''Counter of every node object by id, with the number of places it is used, and the objects by id'''
+    counts, objects = Counter(), {}
+    pending = [root]
+    while pending:
+        node = pending.pop()
+        counts[id(node)] += 1
+        if id(node) in objects:
+            continue
+        objects[id(node)] = node
+        for _, value in ast.fields(node):
+            if isinstance(value, ast.ASTNode):
+                pending.append(value)
+            elif isinstance(value, list):
+                pending.extend(item for item in value if item is not None)
+    return counts, objects
+
+def structure(root):
+    '''The tree as nested kinds and fields, without offsets and hashes, built without recursion'''
+    lines = []
+    pending = [(root, 0)]
+    while pending:
+        node, depth = pending.pop()
+        children, values = [], []
+        for name, value in ast.fields(node):
+            if name in HashCons.IgnoredFields:
+                continue
+            if isinstance(value, ast.ASTNode):
+                children.append(value)
+            elif isinstance(value, list):
+                children.extend(item for item in value if item is not None)
+            else:
+                values.append(f"{name}={value!r}")
+        lines.append(f"{depth} {type(node).__name__} {' '.join(values)}")
+        pending.extend((child, depth + 1) for child in reversed(children))
+    return lines
+
+if __name__ == '__main__':
+    size = parseSize(sys.argv[1]) if len(sys.argv) > 1 else 1 << 20
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    source = generateProgram(size, seed)
+
+    plainSeconds, plain = parse(source)
+    sharedSeconds, shared = parse(source, True)
+    plainUses, plainObjects = uses(plain.ASTroot)
+    sharedUses, sharedObjects = uses(shared.ASTroot)
+    plainBytes = sum(map(sys.getsizeof, plainObjects.values()))
+    sharedBytes = sum(map(sys.getsizeof, sharedObjects.values()))
+    print(f"{size:,} B program, {sum(plainUses.values()):,} nodes in the tree")
+    print(f"plain        {len(plainObjects):9,} objects {plainBytes / 1024:9,.0f} KB   parse {plainSeconds:7.3f}s")
+    print(f"hash consed  {len(sharedObjects):9,} objects {sharedBytes / 1024:9,.0f} KB   parse {sharedSeconds:7.3f}s"
+          f"   {1 - sharedBytes / plainBytes:.0%} fewer bytes, {shared.factory.shared:,} nodes shared")
+
+    # Common subexpressions are the shared operator nodes used more than once, found without comparing trees
+    repeated = Counter()
+    for key, count in sharedUses.items():
+        node = sharedObjects[key]
+        if count > 1 and isinstance(node, (ast.ASTSimpleExpNode, ast.ASTTermNode, ast.ASTUnaryNode)):
+            repeated[type(node).__name__] += count
+    print("repeated subexpressions  " + ", ".join(f"{name} {count:,} uses" for name, count in repeated.most_common()))
+
+    same = structure(plain.ASTroot) == structure(shared.ASTroot)
+    factory = HashCons.NodeFactory()
+    treeShared = factory.shareTree(plain.ASTroot)
+    same = same and structure(treeShared) == structure(shared.ASTroot) and len(factory) == len(shared.factory)
+    print("shared and plain trees have " + ("the same structure" if same else "DIFFERENT structures"))
+
+    # Two __random_int draws are different values, neither they nor the expressions holding them are merged
+    parser = Parser.Parser("let a:int = __random_int 10 + 1 ; let b:int = __random_int 10 + 1 ;",
+                           factory=HashCons.NodeFactory())
+    parser.Parse()
+    first, second = (statement.expr for statement in parser.ASTroot.block.stmts)
+    _, randoms = uses(parser.ASTroot)
+    randoms = [node for node in randoms.values() if isinstance(node, ast.ASTRandNode)]
+    distinct = first is not second and len(randoms) == 2
+    print("__random_int nodes " + ("stay distinct" if distinct else "are SHARED"))
+    same = same and distinct
+    sys.exit(0 if same else 1)
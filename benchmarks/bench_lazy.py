@@ -0,0 +1,81 @@
+# Cost of reading only function signatures with a lazy parser, against a full parse of the same program.
+# Also checks that forcing every lazy body gives the tree the eager parser builds, also when the parser has been
+# reset() to another program before the bodies are read.
+# Run from the repository root with:  python -m benchmarks.bench_lazy [size] [seed]
+import sys
+import time
+
+import ASTNodes as ast
+import Parser
+
+from benchmarks.bench_nesting import dump
+from benchmarks.generator import generateProgram, parseSize
+
+def parse(source, lazy, repeat=3):
+    '''Fastest of repeat parses, with the tree of the last one'''
+    best = None
+    for _ in range(repeat):
+        parser = Parser.Parser(source, lazy=lazy)
+        start = time.perf_counter()
+        parser.Parse()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, parser.ASTroot
+
+def functions(root):
+    '''Every function node in the tree, reading block parses the body of a lazy one'''
+    found = []
+    pending = [root]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, list):
+            pending.extend(node)
+        elif isinstance(node, ast.ASTNode):
+            if isinstance(node, ast.ASTFunctionNode):
+                found.append(node)
+            pending.extend(value for _, value in ast.fields(node) if isinstance(value, (ast.ASTNode, list)))
+    return found
+
+def outline(root):
+    return [(node.name, [(param.var, param.type) for param in node.params.params], node.returnType)
+            for node in root.block.stmts if isinstance(node, ast.ASTFunctionNode)]
+
+def forcedAfterReset(source, other):
+    '''Tree of a lazy parse of source with its bodies only read once the parser has moved on to other'''
+    parser = Parser.Parser(source, lazy=True)
+    parser.Parse()
+    root = parser.ASTroot
+    parser.reset(other)
+    parser.Parse()
+    functions(root)
+    return root
+
+if __name__ == '__main__':
+    size = parseSize(sys.argv[1]) if len(sys.argv) > 1 else 1 << 20
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    source = generateProgram(size, seed)
+
+    eagerSeconds, eager = parse(source, False)
+    lazySeconds, lazy = parse(source, True)
+    same = outline(eager) == outline(lazy)
+    print(f"{len(source):,} chars, {len(outline(lazy)):,} functions")
+    print(f"full parse      {eagerSeconds:8.4f}s")
+    print(f"signatures only {lazySeconds:8.4f}s  {lazySeconds / eagerSeconds:6.1%} of a full parse")
+
+    start = time.perf_counter()
+    for node in lazy.block.stmts:
+        if isinstance(node, ast.ASTFunctionNode):
+            node.block
+    forceSeconds = time.perf_counter() - start
+    # Functions nested in other blocks as well, before comparing
+    functions(lazy)
+    same = same and dump(eager) == dump(lazy)
+    print(f"every body      {forceSeconds:8.4f}s  parsed on first access")
+    print("lazy and eager trees are " + ("identical" if same else "DIFFERENT"))
+
+    # Bodies read after reset() still come from the program they were skipped in
+    small = generateProgram(64 << 10, seed)
+    _, expected = parse(small, False, repeat=1)
+    kept = dump(forcedAfterReset(small, generateProgram(64 << 10, seed + 1))) == dump(expected)
+    print("bodies read after reset() are " + ("the ones skipped" if kept else "WRONG"))
+    sys.exit(0 if same and kept else 1)
@@ -0,0 +1,51 @@
+# Compares the table driven and master regex lexer engines against the original per character engine.
+# Run from the repository root with:  python -m benchmarks.bench_lexer [size_kb] [repeat]
+import sys
+import time
+
+import Lexer as lex
+
+def buildSource(sizeKb):
+    with open('./something.txt', 'r') as file:
+        unit = file.read() + "\n"
+    return unit * max(1, (sizeKb * 1024) // len(unit))
+
+def timeEngines(source, engines, repeat):
+    '''Best time and last Lexer per engine. The engines take turns, so a slow spell of the machine hits all
+    of them instead of every repeat of one'''
+    best, lexers = {}, {}
+    for _ in range(repeat):
+        for engine in engines:
+            start = time.perf_counter()
+            lexers[engine] = lex.Lexer(source, engine=engine)
+            elapsed = time.perf_counter() - start
+            best[engine] = min(best.get(engine, elapsed), elapsed)
+    return best, lexers
+
+def tokenBytes(tokens):
+    # Bytes held by the token storage itself, the source string is shared by both engines
+    if isinstance(tokens, lex.TokenBuffer):
+        return tokens.nbytes()
+    return sys.getsizeof(tokens) + sum(sys.getsizeof(t) + sys.getsizeof(t.lexeme) for t in tokens)
+
+if __name__ == '__main__':
+    sizeKb = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    source = buildSource(sizeKb)
+
+    times, lexers = timeEngines(source, ["reference", "table", "regex"], repeat)
+    refTime, tableTime, regexTime = times["reference"], times["table"], times["regex"]
+    refLexer, tableLexer, regexLexer = lexers["reference"], lexers["table"], lexers["regex"]
+    refTokens, tableTokens, regexTokens = refLexer.tokens, tableLexer.tokens, regexLexer.tokens
+
+    # The reference engine keeps whitespace and comments in its token list, the others in a side table
+    streams = [[(t.type, t.lexeme) for t in lexer.iter_with_trivia()] for lexer in (refLexer, tableLexer, regexLexer)]
+    same = streams[0] == streams[1] == streams[2]
+    total = len(streams[0])
+    print(f"source     : {len(source)} chars, {total} tokens, {len(tableTokens)} without trivia")
+    print(f"reference  : {refTime:.3f}s  ({total / refTime:,.0f} tokens/s)")
+    print(f"table      : {tableTime:.3f}s  ({total / tableTime:,.0f} tokens/s)")
+    print(f"regex      : {regexTime:.3f}s  ({total / regexTime:,.0f} tokens/s)")
+    print(f"speedup    : {refTime / tableTime:.1f}x table, {refTime / regexTime:.1f}x regex, identical token streams: {same}")
+    print(f"memory     : {tokenBytes(refTokens) / len(refTokens):.1f} bytes/token reference, "
+          f"{(tokenBytes(tableTokens) + tokenBytes(tableLexer.trivia)) / total:.1f} bytes/token table")
@@ -0,0 +1,66 @@
+# Memory taken by the AST of a generated program, per node class: the bytes of the slotted nodes against the
+# same nodes laid out with a per instance __dict__ and a name string, the layout nodes had before slots.
+# Run from the repository root with:  python -m benchmarks.bench_memory [size] [seed]
+import sys
+from collections import Counter
+
+import ASTNodes as ast
+import Parser
+
+from benchmarks.generator import generateProgram, parseSize
+
+# Stand in class per node class with the old layout, attributes in a __dict__. One class per node class keeps
+# the key sharing dicts the old nodes had
+DictClasses = {}
+
+def nodes(root):
+    '''Every node reachable from root, and the lists holding child nodes'''
+    found, lists = [], []
+    pending = [root]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, list):
+            lists.append(node)
+            pending.extend(node)
+        elif isinstance(node, ast.ASTNode):
+            found.append(node)
+            pending.extend(value for _, value in ast.fields(node) if isinstance(value, (ast.ASTNode, list)))
+    return found, lists
+
+def dictLayoutBytes(node):
+    '''Size of node with its attributes and name string in a __dict__, unset slots left out as before'''
+    cls = DictClasses.get(type(node))
+    if cls is None:
+        cls = DictClasses[type(node)] = type(type(node).__name__, (), {})
+    stand = cls()
+    stand.name = node.name
+    for name, value in ast.fields(node):
+        if value is not None or name in ('type', 'elseBlock', 'right', 'op', 'returnType', 'bodyParser', 'block'):
+            setattr(stand, name, value)
+    return sys.getsizeof(stand) + sys.getsizeof(stand.__dict__)
+
+def treeBytes(root):
+    '''(nodes, bytes of the nodes themselves, bytes of the child lists)'''
+    found, lists = nodes(root)
+    return len(found), sum(map(sys.getsizeof, found)), sum(map(sys.getsizeof, lists))
+
+if __name__ == '__main__':
+    size = parseSize(sys.argv[1]) if len(sys.argv) > 1 else 1 << 20
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    parser = Parser.Parser(generateProgram(size, seed))
+    parser.Parse()
+
+    found, lists = nodes(parser.ASTroot)
+    counts, slotted, dicts = Counter(), Counter(), Counter()
+    for node in found:
+        name = type(node).__name__
+        counts[name] += 1
+        slotted[name] += sys.getsizeof(node)
+        dicts[name] += dictLayoutBytes(node)
+    print(f"{size:,} B program, {len(found):,} nodes, {sum(map(sys.getsizeof, lists)):,} B of child lists")
+    print(f"  {'class':22} {'nodes':>9} {'slots B/node':>13} {'__dict__ B/node':>16}")
+    for name, count in counts.most_common():
+        print(f"  {name:22} {count:9,} {slotted[name] / count:13.1f} {dicts[name] / count:16.1f}")
+    total, before = sum(slotted.values()), sum(dicts.values())
+    print(f"  {'every node':22} {len(found):9,} {total / len(found):13.1f} {before / len(found):16.1f}"
+          f"   {1 - total / before:.0%} saved, {(before - total) / len(found):.0f} B per node")
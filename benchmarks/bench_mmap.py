@@ -0,0 +1,48 @@
+# Peak memory of lexing a source file read whole into a str against lexing it memory mapped with
+# Lexer.from_path(), in full and in stream mode. Every case runs in a fresh interpreter so its peak is its own.
+# Run from the repository root with:  python -m benchmarks.bench_mmap [size]
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.generator import generateProgram, parseSize
+
+Cases = {
+    'read()' : "lexer = Lexer.Lexer(open(path).read())",
+    'from_path()' : "lexer = Lexer.Lexer.from_path(path)",
+    'read(), stream' : "count = sum(1 for _ in Lexer.Lexer(open(path).read(), stream=True).iter_tokens())",
+    'from_path(), stream' : "count = sum(1 for _ in Lexer.Lexer.from_path(path, stream=True).iter_tokens())",
+}
+
+# ru_maxrss survives fork and exec on Linux and would report the parent's peak, VmHWM is this process' own
+Program = '''
+import sys
+import Lexer
+def peak():
+    with open('/proc/self/status') as status:
+        return next(line.split()[1] for line in status if line.startswith('VmHWM:'))
+path = sys.argv[1]
+base = peak()
+{case}
+print(base, peak())
+'''
+
+def peak(case, path):
+    '''(peak RSS before lexing, peak RSS after) in KB of one case in a fresh interpreter'''
+    result = subprocess.run([sys.executable, '-c', Program.format(case=case), path], capture_output=True,
+                            text=True, check=True)
+    before, after = result.stdout.split()
+    return int(before), int(after)
+
+if __name__ == '__main__':
+    size = parseSize(sys.argv[1]) if len(sys.argv) > 1 else 64 << 20
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'program.parl')
+        with open(path, 'w') as file:
+            file.write(generateProgram(size))
+        fileKb = os.path.getsize(path) / 1024
+        print(f"{fileKb / 1024:,.1f} MB source file")
+        for name, case in Cases.items():
+            before, after = peak(case, path)
+            print(f"  {name:20} peak {after / 1024:8,.1f} MB  {(after - before) / fileKb:5.2f}x the file over start up")
@@ -0,0 +1,92 @@
+# Parses programs with deeply nested if/while/for blocks. Checks that the explicit stack block parser builds the
+# same trees as the recursive one wherever the recursive one still fits in the recursion limit, and times it
+# on depths far past that limit.
+# Run from the repository root with:  python -m benchmarks.bench_nesting [depth,...] [seed]
+import random
+import sys
+import time
+
+import ASTNodes as ast
+import Parser
+
+from benchmarks.generator import generateProgram
+
+# Deepest nesting compared against the recursive parser, a few Python frames per level must stay under the limit
+RecursiveDepth = 150
+
+def nestedProgram(depth, seed=0):
+    '''depth blocks nested in one another, every level with a statement before and after its inner block. The
+    program passes semantic analysis'''
+    rng = random.Random(seed)
+    opening, closing = [], []
+    for level in range(depth):
+        kind = rng.choice(['if', 'while', 'for', 'else'])
+        head = f"let a{level}:int = {level} ; "
+        if kind == 'if':
+            opening.append(f"{head}if ( a{level} < 1 ) {{ ")
+            closing.append(f"}} a{level} = 2 ; ")
+        elif kind == 'else':
+            opening.append(f"{head}if ( a{level} < 1 ) {{ a{level} = 1 ; }} else {{ ")
+            closing.append("} ")
+        elif kind == 'while':
+            opening.append(f"{head}while ( a{level} < 1 ) {{ ")
+            closing.append(f"}} a{level} = 3 ; ")
+        else:
+            opening.append(f"{head}for ( let i{level}:int = 0 ; i{level} < 2 ; i{level} = i{level} + 1 ) {{ ")
+            closing.append("} ")
+    return "".join(opening) + "let x:int = 1 ; " + "".join(reversed(closing))
+
+def dump(root):
+    '''Flat description of the tree, built without recursion so trees of any depth compare'''
+    lines = []
+    pending = [(root, 0)]
+    while pending:
+        node, depth = pending.pop()
+        if isinstance(node, list):
+            pending.extend((item, depth) for item in reversed(node))
+            continue
+        if not isinstance(node, ast.ASTNode):
+            lines.append(f"{depth} {node!r}")
+            continue
+        children = []
+        fields = []
+        for key, value in ast.fields(node):
+            if isinstance(value, (ast.ASTNode, list)):
+                children.append(value)
+            else:
+                fields.append(f"{key}={value!r}")
+        lines.append(f"{depth} {type(node).__name__} offset={node.offset} {' '.join(fields)}")
+        pending.extend((child, depth + 1) for child in reversed(children))
+    return lines
+
+def parse(source, iterative):
+    parser = Parser.Parser(source, iterative=iterative)
+    start = time.perf_counter()
+    parser.Parse()
+    return time.perf_counter() - start, parser.ASTroot
+
+if __name__ == '__main__':
+    depths = [int(n) for n in sys.argv[1].split(',')] if len(sys.argv) > 1 else [100, 1000, 10000, 100000]
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+
+    failures = 0
+    samples = [generateProgram(16 * 1024, seed), nestedProgram(RecursiveDepth, seed)]
+    for source in samples:
+        _, expected = parse(source, False)
+        _, actual = parse(source, True)
+        if dump(expected) != dump(actual):
+            failures += 1
+    print(f"{len(samples) - failures}/{len(samples)} programs give identical trees with both block parsers")
+
+    limit = sys.getrecursionlimit()
+    for depth in depths:
+        elapsed, root = parse(nestedProgram(depth, seed), True)
+        nested = 1
+        block = root.block
+        while len(block.stmts) > 1:
+            nested += 1
+            inner = block.stmts[1]
+            block = inner.elseBlock if getattr(inner, 'elseBlock', None) is not None else inner.block
+        print(f"{depth:>8,} levels  {elapsed:8.4f}s  {elapsed / depth * 1e6:6.2f} us/level  "
+              f"{nested:,} blocks deep  recursion limit {limit}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,49 @@
+# Lexes one large generated file serially and split between worker processes (Lexer.from_path(path, workers=n)),
+# checks both give the same token and trivia arrays and symbol ids, and counts the chunks lexed again because
+# they did not start in the start state.
+# Run from the repository root with:  python -m benchmarks.bench_parallel_lex [size] [workers,...] [seed]
+import os
+import sys
+import tempfile
+import time
+
+import Lexer as lex
+import Tracing
+
+from benchmarks.generator import generateProgram, parseSize
+
+def arrays(lexer):
+    return [(buffer.types, buffer.starts, buffer.ends, buffer.symbols) for buffer in (lexer.tokens, lexer.trivia)]
+
+def timeLex(path, workers):
+    start = time.perf_counter()
+    lexer = lex.Lexer.from_path(path, workers=workers)
+    return time.perf_counter() - start, lexer
+
+if __name__ == '__main__':
+    size = parseSize(sys.argv[1]) if len(sys.argv) > 1 else 32 << 20
+    counts = [int(n) for n in sys.argv[2].split(',')] if len(sys.argv) > 2 else [2, 4, os.cpu_count() or 1]
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'program.parl')
+        with open(path, 'w') as file:
+            file.write(generateProgram(size, seed))
+        serialSeconds, serial = timeLex(path, 1)
+        expected = arrays(serial)
+        print(f"{os.path.getsize(path):,} B, {len(serial.tokens):,} tokens, {os.cpu_count()} cores")
+        print(f"  serial      {serialSeconds:8.3f}s")
+        del serial
+
+        failures = 0
+        Tracing.tracer.setCounting(True)
+        for workers in sorted(set(counts)):
+            Tracing.tracer.reset()
+            elapsed, lexer = timeLex(path, workers)
+            same = arrays(lexer) == expected
+            failures += not same
+            counters = Tracing.tracer.counters
+            print(f"  {workers:3} workers {elapsed:8.3f}s  speedup {serialSeconds / elapsed:5.2f}x  "
+                  f"{counters['lexer.chunks']} chunks, {counters['lexer.relexed']} lexed again  "
+                  + ("identical" if same else "DIFFERENT"))
+        sys.exit(1 if failures else 0)
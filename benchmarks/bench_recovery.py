@@ -0,0 +1,118 @@
+# Error recovery of the parser: checks that malformed statements give the expected diagnostics and ASTErrorNodes
+# with recover=True and raise with recover=False, in both block parsers and without hanging, then times a parse
+# of a generated program with a broken assignment every so often against the clean program.
+# Run from the repository root with:  python -m benchmarks.bench_recovery [size] [every]
+import re
+import signal
+import sys
+import time
+
+import Parser
+
+from benchmarks.generator import generateProgram, parseSize
+
+# Seconds a case may take before it counts as hanging
+TimeLimit = 5
+
+# (program, start of each diagnostic, statements of the program's block by class name)
+Cases = [
+    ("fun f(x:int ; let y:int = 1;", ["Missing Bracket"], ["ASTErrorNode", "ASTAssignmentNode"]),
+    ("fun f ; let y:int = 1;", ["Missing Bracket"], ["ASTErrorNode", "ASTAssignmentNode"]),
+    ("fun f(", ["Missing Bracket"], ["ASTErrorNode"]),
+    ("fun ", ["Missing Bracket"], ["ASTErrorNode"]),
+    ("for ; let y:int = 1;", ["Missing Bracket"], ["ASTErrorNode", "ASTAssignmentNode"]),
+    ("for (let i:int = 0; i < 2; i = i + 1) ; let y:int = 1;", ["Expected '{'"], ["ASTErrorNode", "ASTAssignmentNode"]),
+    ("if (x) { } else ; let y:int = 1;", ["Expected '{'"], ["ASTErrorNode", "ASTAssignmentNode"]),
+    ("if (x) ; let y:int = 1;", ["Expected '{'"], ["ASTErrorNode", "ASTAssignmentNode"]),
+    ("while (x) ; let y:int = 1;", ["Expected '{'"], ["ASTErrorNode", "ASTAssignmentNode"]),
+    ("let x:int = ; let y:int = 1; let z:int = 2 3;", ["Expected an expression", "Expected ';'"],
+     ["ASTErrorNode", "ASTAssignmentNode", "ASTErrorNode"]),
+    ("fun f(x:int) -> int { return x; } for (let i:int = 0; i < 2; i = i + 1) { } let y:int = 1;", [],
+     ["ASTFunctionNode", "ASTForNode", "ASTAssignmentNode"]),
+]
+
+class Hang(Exception):
+    pass
+
+def timeLimited(function, *args):
+    '''function(*args), raising Hang once it runs longer than TimeLimit seconds'''
+    def expired(signum, frame):
+        raise Hang()
+    previous = signal.signal(signal.SIGALRM, expired)
+    signal.alarm(TimeLimit)
+    try:
+        return function(*args)
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, previous)
+
+def parse(source, iterative, recover):
+    parser = Parser.Parser(source, iterative=iterative, recover=recover)
+    parser.Parse()
+    return parser
+
+def check(source, messages, statements):
+    '''Problems with one case, empty when it behaves as expected'''
+    problems = []
+    for iterative in (True, False):
+        mode = "iterative" if iterative else "recursive"
+        try:
+            parser = timeLimited(parse, source, iterative, True)
+        except Hang:
+            problems.append(f"{mode} parse with recovery hangs")
+            continue
+        got = [str(error) for error in parser.diagnostics]
+        if len(got) != len(messages) or not all(g.startswith(m) for g, m in zip(got, messages)):
+            problems.append(f"{mode} diagnostics {got}")
+        kinds = [type(statement).__name__ for statement in parser.ASTroot.block.stmts]
+        if kinds != statements:
+            problems.append(f"{mode} statements {kinds}")
+        try:
+            timeLimited(parse, source, iterative, False)
+            raised = None
+        except Hang:
+            problems.append(f"{mode} parse without recovery hangs")
+            continue
+        except SyntaxError as error:
+            raised = str(error)
+        if messages and (raised is None or not raised.startswith(messages[0])):
+            problems.append(f"{mode} parse without recovery raised {raised!r}")
+    return problems
+
+def broken(source, every):
+    '''source with the expression of every every'th initialisation dropped, "let x:int = ;"'''
+    count = 0
+    def drop(match):
+        nonlocal count
+        count += 1
+        return match.group(0) if count % every else match.group(1) + ";"
+    return re.sub(r"(let \w+:\w+ = )[^;{}]*;", drop, source)
+
+def timed(source, repeat=3):
+    '''Fastest of repeat parses with recovery, and the number of diagnostics'''
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parser = parse(source, True, True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(parser.diagnostics)
+
+if __name__ == '__main__':
+    size = parseSize(sys.argv[1]) if len(sys.argv) > 1 else 256 << 10
+    every = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    failures = 0
+    for source, messages, statements in Cases:
+        problems = check(source, messages, statements)
+        for problem in problems:
+            print(f"{problem}:  {source}")
+        failures += bool(problems)
+    print(f"{len(Cases) - failures}/{len(Cases)} recovery cases as expected")
+
+    source = generateProgram(size)
+    clean, _ = timed(source)
+    damaged, errors = timed(broken(source, every))
+    print(f"{size:,} B   clean {clean * 1e3:8.1f} ms   every {every}th initialisation broken {damaged * 1e3:8.1f} ms"
+          f"   {errors:,} diagnostics")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,88 @@
+# Scoped symbol table and the semantic analyzer over nested blocks. Enters and leaves scopes under a growing
+# number of global names, with ScopedSymbolTable's undo log against copying the enclosing dict per scope, then
+# times analyze() on programs nested deeper and deeper, which should cost the same per level. Checks the
+# analyzer's scoping rules on small programs.
+# Run from the repository root with:  python -m benchmarks.bench_scopes [depth,...] [scopes]
+import sys
+import time
+
+import Parser
+import SemanticAnalysis
+import SymbolTable
+
+from benchmarks.bench_nesting import nestedProgram
+
+# (program, start of the message analyze() raises, None when it passes)
+Cases = [
+    ("let x:int = 1; if (x < 2) { let x:int = 3; x = 4; } x = 5;", None),
+    ("let x:int = 1; if (x < 2) { let x:int = 2; let x:int = 3; }", "Variable x already declared"),
+    ("if (1 < 2) { let y:int = 3; } y = 4;", "Variable y isn't defined"),
+    ("for (let i:int = 0; i < 2; i = i + 1) { let i:int = 3; i = 4; }", None),
+    ("for (let i:int = 0; i < 2; i = i + 1) { i = 3; } i = 2;", "Variable i isn't defined"),
+    ("let a:int = 1; while (a < 2) { if (a < 1) { a = 2; } else { let b:int = 3; b = a; } }", None),
+    ("while (1 < 2) { f(); }", "Function f is not defined"),
+    ("fun f(a:int) -> int { let a:int = 2; let a:int = 3; }", "Variable a already Declared in function f"),
+    ("fun f(a:int) -> int { let a:int = 1; return a; }", "Variable a already Declared in function f"),
+    ("fun f(a:int) -> int { if (a < 1) { let a:int = 1; a = 2; } }", "Funciton f returns no value"),
+    ("fun f(a:int) -> int { while (a < 1) { fun g() -> int { } } }", "Cannot define nested functions"),
+]
+
+def analyze(source):
+    '''Seconds analyze() took and the message it raised, None when the program passes'''
+    parser = Parser.Parser(source)
+    parser.Parse()
+    analyzer = SemanticAnalysis.SemanticAnalyzer(parser.ASTroot, parser.symbols, parser.lexer.lines())
+    start = time.perf_counter()
+    try:
+        analyzer.analyze()
+    except Exception as error:
+        return time.perf_counter() - start, str(error)
+    return time.perf_counter() - start, None
+
+def scoped(names, scopes):
+    table = SymbolTable.ScopedSymbolTable()
+    for symbol in range(names):
+        table.declare(symbol, None)
+    start = time.perf_counter()
+    for scope in range(scopes):
+        table.enter()
+        table.declare(scope % names, scope)
+        table.lookup(0)
+        table.leave()
+    return time.perf_counter() - start
+
+def copied(names, scopes):
+    # A dict per scope holding everything visible in it
+    table = dict.fromkeys(range(names))
+    start = time.perf_counter()
+    for scope in range(scopes):
+        inner = dict(table)
+        inner[scope % names] = scope
+        inner.get(0)
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    depths = [int(n) for n in sys.argv[1].split(',')] if len(sys.argv) > 1 else [1000, 10000, 100000]
+    scopes = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+
+    failures = 0
+    for source, expected in Cases:
+        _, message = analyze(source)
+        if (message is None) != (expected is None) or (expected is not None and not message.startswith(expected)):
+            print(f"expected {expected!r}, got {message!r}:  {source}")
+            failures += 1
+    print(f"{len(Cases) - failures}/{len(Cases)} scoping cases as expected")
+
+    for names in (10, 1000, 100000):
+        # Copying is timed over fewer scopes, it gets slow with many names
+        copies = max(100, scopes // names)
+        print(f"scopes under {names:>7,} globals   undo log {scoped(names, scopes) / scopes * 1e6:8.2f} us/scope"
+              f"   dict copy {copied(names, copies) / copies * 1e6:8.2f} us/scope")
+
+    for depth in depths:
+        elapsed, message = analyze(nestedProgram(depth))
+        if message is not None:
+            print(f"{depth:,} levels: {message}")
+            failures += 1
+        print(f"{depth:>8,} levels  analyze {elapsed:8.4f}s  {elapsed / depth * 1e6:6.2f} us/level")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,71 @@
+# Start up costs of the compiler: import time of its modules (python -X importtime), the time a fresh process
+# takes to compile one snippet with and without a lexer tables cache file, and the per compile overhead of
+# fresh Parser objects against one Parser reused through reset().
+# Run from the repository root with:  python -m benchmarks.bench_startup [snippets] [processes]
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import Parser
+
+Modules = ('Tracing', 'Lexer', 'ASTNodes', 'Parser', 'SemanticAnalysis', 'CodeGen')
+Snippet = "let x:int = 4 * ( 2 + 3 ) ; x = x - 1 ;"
+
+def importTimes():
+    '''(self, cumulative) microseconds per module of one import of the compiler in a fresh interpreter'''
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import Parser, SemanticAnalysis, CodeGen'],
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        own, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        if own.isdigit():
+            times[name] = (int(own), int(cumulative))
+    return times
+
+def coldStart(processes, cachePath=None):
+    '''Best wall time of a fresh interpreter importing the compiler and parsing Snippet'''
+    setup = "import Lexer; Lexer.lexerTables(%r); " % cachePath if cachePath else ""
+    program = setup + f"import Parser; Parser.Parser({Snippet!r}).Parse()"
+    best = None
+    for _ in range(processes):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', program], check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def perCompile(snippets, reuse):
+    parser = Parser.Parser(Snippet) if reuse else None
+    start = time.perf_counter()
+    for _ in range(snippets):
+        if reuse:
+            parser.reset(Snippet)
+        else:
+            parser = Parser.Parser(Snippet)
+        parser.Parse()
+    return (time.perf_counter() - start) / snippets
+
+if __name__ == '__main__':
+    snippets = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    times = importTimes()
+    print("import time, self / cumulative:")
+    for name in Modules:
+        if name in times:
+            print(f"  {name:18} {times[name][0] / 1000:7.2f} ms {times[name][1] / 1000:7.2f} ms")
+    total = sum(times[name][0] for name in times)
+    print(f"  {'everything':18} {total / 1000:7.2f} ms")
+
+    print(f"cold start, one snippet  {coldStart(processes) * 1000:7.2f} ms")
+    with tempfile.TemporaryDirectory() as directory:
+        cachePath = os.path.join(directory, 'lexer-tables.marshal')
+        coldStart(1, cachePath)
+        print(f"  with a tables cache    {coldStart(processes, cachePath) * 1000:7.2f} ms")
+
+    print(f"per compile, new Parser  {perCompile(snippets, False) * 1e6:7.1f} us")
+    print(f"per compile, reset()     {perCompile(snippets, True) * 1e6:7.1f} us")
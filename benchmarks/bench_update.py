@@ -0,0 +1,73 @@
+# Latency of one small Lexer.update() against source size: a character added to an identifier at random
+# places, an identifier split in two by a space at random places (the token count changes, the gap moves), and
+# typing at one place. Should stay about flat from 64 KB to 16 MB, only moving the gap across the tokens between
+# far apart edits grows with the source. Checks the edited tokens against lexing the edited source afresh.
+# Run from the repository root with:  python -m benchmarks.bench_update [size,...] [edits]
+import random
+import sys
+import time
+
+import Lexer as lex
+
+from benchmarks.generator import generateProgram, parseSize
+
+def identifierAt(lexer, rng):
+    '''Index of a random identifier token'''
+    tokens = lexer.tokens
+    while True:
+        index = rng.randrange(len(tokens))
+        if tokens.typeAt(index) == lex.TokenType.Identifier.value:
+            return index
+
+def renamed(lexer, rng, step, previous):
+    return lexer.tokens.startAt(identifierAt(lexer, rng)), 'x'
+
+def split(lexer, rng, step, previous):
+    return lexer.tokens.startAt(identifierAt(lexer, rng)) + 1, ' '
+
+def typed(lexer, rng, step, previous):
+    # Starts behind a random identifier and keeps typing there, a space every third character
+    if previous is None:
+        return lexer.tokens.endAt(identifierAt(lexer, rng)), ' '
+    offset, text = previous
+    return offset + len(text), ' ' if step % 3 == 0 else 'a'
+
+# Edit pattern name -> (offset, inserted text) of the step'th edit, given the one before
+Edits = {'rename' : renamed, 'split' : split, 'typing' : typed}
+
+def timeEdits(source, edit, edits, seed=0):
+    '''Sorted seconds of every update() and whether the tokens then match a fresh Lexer over the edited source'''
+    rng = random.Random(seed)
+    lexer = lex.Lexer(source)
+    times = []
+    previous = None
+    for step in range(edits):
+        offset, text = edit(lexer, rng, step, previous)
+        previous = offset, text
+        start = time.perf_counter()
+        lexer.update(offset, 0, text)
+        times.append(time.perf_counter() - start)
+        source = source[:offset] + text + source[offset:]
+    fresh = lex.Lexer(source)
+    same = ([(t.type, t.start, t.end, t.lexeme) for t in lexer.tokens] ==
+            [(t.type, t.start, t.end, t.lexeme) for t in fresh.tokens])
+    return sorted(times), same
+
+if __name__ == '__main__':
+    sizes = [parseSize(n) for n in sys.argv[1].split(',')] if len(sys.argv) > 1 else [64 << 10, 1 << 20, 16 << 20]
+    edits = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+    ok = True
+    for size in sizes:
+        source = generateProgram(size)
+        start = time.perf_counter()
+        lex.Lexer(source)
+        print(f"{size:>12,} B   lexing afresh {(time.perf_counter() - start) * 1e3:9.1f} ms")
+        for name, edit in Edits.items():
+            times, same = timeEdits(source, edit, edits)
+            ok = ok and same
+            print(f"    {name:7} update() median {times[len(times) // 2] * 1e6:7.0f} us   "
+                  f"p90 {times[len(times) * 9 // 10] * 1e6:7.0f} us   max {times[-1] * 1e6:7.0f} us"
+                  f"{'' if same else '   tokens DIFFER from a fresh lexer'}")
+    print("updates match fresh lexing" if ok else "updates DIFFER from fresh lexing")
+    sys.exit(0 if ok else 1)
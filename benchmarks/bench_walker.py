@@ -0,0 +1,135 @@
+# ASTWalker against the recursive double dispatch accept() used to be: one visitor counting every node each way,
+# three analysis visitors run as three walks against one fused walk, a search that stops at its first match, and
+# a walk over blocks nested far deeper than the recursion limit. Checks that accept() prints the same tree as a
+# walk does.
+# Run from the repository root with:  python -m benchmarks.bench_walker [size] [seed] [depth]
+import contextlib
+import io
+import sys
+import time
+from collections import Counter
+
+import ASTNodes as ast
+import ASTWalker
+import Parser
+
+from benchmarks.bench_nesting import nestedProgram
+from benchmarks.generator import generateProgram, parseSize
+
+class RecursiveCounter():
+    '''Counts nodes with each visit recursing into the children, how visitors walked before ASTWalker'''
+    def __init__(self):
+        self.count = 0
+
+    def visit(self, node):
+        self.count += 1
+        for name in ASTWalker.ChildFields[node.kind]:
+            value = getattr(node, name)
+            if isinstance(value, ast.ASTNode):
+                self.visit(value)
+            elif isinstance(value, list):
+                for item in value:
+                    if item is not None:
+                        self.visit(item)
+
+class NodeCounter():
+    def __init__(self):
+        self.count = 0
+
+    def visit_node(self, node):
+        self.count += 1
+
+class VariableUses():
+    '''Uses of each symbol'''
+    def __init__(self):
+        self.uses = Counter()
+
+    def visit_variable_node(self, node):
+        self.uses[node.symbol] += 1
+
+class Literals():
+    '''Distinct literal values, skips what cannot hold one'''
+    def __init__(self):
+        self.values = set()
+
+    def visit_integer_node(self, node):
+        self.values.add(node.value)
+
+    visit_float_node = visit_integer_node
+
+    def visit_colour_node(self, node):
+        self.values.add(node.colour)
+
+    def visit_formalparams_node(self, node):
+        return ASTWalker.Skip
+
+class Depth():
+    '''Deepest node, with the depth kept by visit and leave'''
+    def __init__(self):
+        self.depth = self.deepest = 0
+
+    def visit_node(self, node):
+        self.depth += 1
+        self.deepest = max(self.deepest, self.depth)
+
+    def leave_node(self, node):
+        self.depth -= 1
+
+class FirstWhile():
+    def __init__(self):
+        self.found = None
+
+    def visit_while_node(self, node):
+        self.found = node
+        return ASTWalker.Stop
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    size = parseSize(sys.argv[1]) if len(sys.argv) > 1 else 1 << 20
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    depth = int(sys.argv[3]) if len(sys.argv) > 3 else 100000
+    parser = Parser.Parser(generateProgram(size, seed))
+    parser.Parse()
+    root = parser.ASTroot
+
+    recursing, counter = RecursiveCounter(), NodeCounter()
+    recursiveSeconds = timed(recursing.visit, root)
+    walkSeconds = timed(ASTWalker.walk, root, counter)
+    same = recursing.count == counter.count
+    print(f"{size:,} B program, {counter.count:,} nodes")
+    print(f"count nodes   recursion {recursiveSeconds:7.3f}s   walker {walkSeconds:7.3f}s")
+
+    # accept() is a walk, both print the tree of a small program the same
+    small = Parser.Parser(generateProgram(16 * 1024, seed))
+    small.Parse()
+    accepted, walked = io.StringIO(), io.StringIO()
+    with contextlib.redirect_stdout(accepted):
+        small.ASTroot.accept(ast.PrintNodesVisitor())
+    with contextlib.redirect_stdout(walked):
+        ASTWalker.walk(small.ASTroot, ast.PrintNodesVisitor())
+    same = same and accepted.getvalue() == walked.getvalue() and accepted.getvalue().count('\n') > 1000
+
+    passes = [VariableUses(), Literals(), Depth()]
+    separateSeconds = sum(timed(ASTWalker.walk, root, visitor) for visitor in passes)
+    fused = [VariableUses(), Literals(), Depth()]
+    fusedSeconds = timed(ASTWalker.walk, root, *fused)
+    same = same and passes[0].uses == fused[0].uses and passes[1].values == fused[1].values
+    same = same and passes[2].deepest == fused[2].deepest and fused[2].depth == 0
+    print(f"3 analyses    3 walks  {separateSeconds:7.3f}s   fused  {fusedSeconds:7.3f}s")
+
+    search = FirstWhile()
+    print(f"first while   walker {timed(ASTWalker.walk, root, search) * 1000:7.3f}ms"
+          f"   found {type(search.found).__name__}")
+
+    parser = Parser.Parser(nestedProgram(depth))
+    parser.Parse()
+    nested = Depth()
+    print(f"{depth:,} nested blocks   walker {timed(ASTWalker.walk, parser.ASTroot, nested):7.3f}s   "
+          f"{nested.deepest:,} nodes deep, recursion limit {sys.getrecursionlimit()}")
+
+    print("walks agree" if same else "walks DISAGREE")
+    sys.exit(0 if same else 1)
@@ -0,0 +1,197 @@
+# Seeded generator of PArL programs for the benchmarks, the same seed and size always give the same program.
+# Run from the repository root with:  python -m benchmarks.generator [size] [seed] > program.parl
+# Sizes take K/M suffixes, e.g. 64K or 100M.
+import random
+import sys
+
+Types = ['int', 'float', 'bool', 'colour']
+# Top level variables the generator keeps referring to, bounds the work per statement on huge programs
+RecentNames = 64
+ArithmeticOps = ['+', '-', '*', '/']
+RelationalOps = ['<', '>', '<=', '>=', '==', '!=']
+
+def parseSize(text):
+    '''Parses sizes like 512, 64K or 100M into a byte count'''
+    text = text.strip().upper()
+    scale = {'K' : 1 << 10, 'M' : 1 << 20, 'G' : 1 << 30}.get(text[-1:], 1)
+    return int(float(text.rstrip('KMG')) * scale)
+
+class ProgramGenerator():
+    '''Builds valid PArL programs: typed functions with '->' return types, nested if/while/for blocks,
+    let declarations, __write_box/__write calls and deep arithmetic expressions. Every name is unique
+    and declared before it is used. Tokens are always separated by spaces, so no two of them merge. Without
+    functions the program has no functions, calls or returns, only top level statements'''
+    def __init__(self, seed=0, maxDepth=3, expressionDepth=4, functions=True):
+        self.random = random.Random(seed)
+        self.withFunctions = functions
+        self.maxDepth = maxDepth
+        self.expressionDepth = expressionDepth
+        self.nameCount = 0
+        # name -> (parameter types, return type) of every function emitted so far, plus their names by return type
+        self.functions = {}
+        self.functionsByType = {varType : [] for varType in Types}
+        self.functionNames = []
+
+    def program(self, size):
+        '''Returns a program of at least size characters, made of functions and top level statements'''
+        parts = []
+        length = 0
+        scope = self.newScope()
+        while length < size:
+            if self.withFunctions and self.random.random() < 0.3:
+                part = self.function()
+            else:
+                part = self.statement(scope, 0, None, "")
+                # Top level names stay declared, but only the latest ones are referenced again
+                for names in scope.values():
+                    del names[:-RecentNames]
+            parts.append(part)
+            length += len(part)
+        return "".join(parts)
+
+    def newScope(self, parent=None):
+        '''Names visible in a block by type, inner blocks copy the enclosing ones'''
+        if parent is None:
+            return {varType : [] for varType in Types}
+        return {varType : list(names) for varType, names in parent.items()}
+
+    def newName(self, prefix):
+        self.nameCount += 1
+        return f"{prefix}{self.nameCount}"
+
+    def function(self):
+        name = self.newName("fn")
+        params = {self.newName("p") : self.random.choice(Types) for _ in range(self.random.randint(0, 3))}
+        returnType = self.random.choice(Types)
+        paramList = " , ".join(f"{param}:{paramType}" for param, paramType in params.items())
+        scope = self.newScope()
+        for param, paramType in params.items():
+            scope[paramType].append(param)
+        body = self.block(scope, 1, returnType, "    ")
+        # Registered afterwards, so functions never call themselves
+        self.functions[name] = (list(params.values()), returnType)
+        self.functionsByType[returnType].append(name)
+        self.functionNames.append(name)
+        return f"fun {name}( {paramList} ) -> {returnType} {{\n{body}}}\n\n"
+
+    def block(self, scope, depth, returnType, indent):
+        lines = [self.statement(scope, depth, returnType, indent) for _ in range(self.random.randint(1, 4))]
+        if returnType is not None:
+            lines.append(f"{indent}return {self.expression(returnType, scope, self.expressionDepth)} ;\n")
+        return "".join(lines)
+
+    def nested(self, scope, depth, returnType, indent):
+        # Inner blocks see the enclosing names but their own declarations stay local
+        return self.block(self.newScope(scope), depth + 1, returnType, indent + "    ")
+
+    def statement(self, scope, depth, returnType, indent):
+        rng = self.random
+        choices = ['let', 'let', 'assign', 'write', 'write_box']
+        if depth < self.maxDepth:
+            choices += ['if', 'while', 'for']
+        if self.functions:
+            choices.append('call')
+        kind = rng.choice(choices)
+        assignable = [varType for varType in Types if scope[varType]]
+        if kind == 'assign' and not assignable:
+            kind = 'let'
+
+        if kind == 'let':
+            name, varType = self.newName("v"), rng.choice(Types)
+            text = f"{indent}let {name}:{varType} = {self.expression(varType, scope, self.expressionDepth)} ;\n"
+            scope[varType].append(name)
+            return text
+        if kind == 'assign':
+            varType = rng.choice(assignable)
+            name = rng.choice(scope[varType])
+            return f"{indent}{name} = {self.expression(varType, scope, self.expressionDepth)} ;\n"
+        if kind == 'write':
+            return f"{indent}__write {self.coordinate(scope)} , {self.coordinate(scope)} , {self.colour()} ;\n"
+        if kind == 'write_box':
+            args = " , ".join(self.coordinate(scope) for _ in range(4))
+            return f"{indent}__write_box {args} , {self.colour()} ;\n"
+        if kind == 'call':
+            return f"{indent}{self.call(None, scope, 1)} ;\n"
+        condition = self.expression('bool', scope, self.expressionDepth)
+        if kind == 'if':
+            text = f"{indent}if ( {condition} ) {{\n{self.nested(scope, depth, returnType, indent)}{indent}}}"
+            if rng.random() < 0.5:
+                text += f" else {{\n{self.nested(scope, depth, returnType, indent)}{indent}}}"
+            return text + "\n"
+        if kind == 'while':
+            return f"{indent}while ( {condition} ) {{\n{self.nested(scope, depth, returnType, indent)}{indent}}}\n"
+        counter = self.newName("i")
+        inner = self.newScope(scope)
+        inner['int'].append(counter)
+        body = self.block(inner, depth + 1, returnType, indent + "    ")
+        return (f"{indent}for ( let {counter}:int = 0 ; {counter} < {rng.randint(1, 100)} ; "
+                f"{counter} = {counter} + 1 ) {{\n{body}{indent}}}\n")
+
+    def coordinate(self, scope):
+        ints = scope['int']
+        if ints and self.random.random() < 0.5:
+            return self.random.choice(ints)
+        return str(self.random.randint(0, 255))
+
+    def colour(self):
+        return f"#{self.random.randrange(1 << 24):06x}"
+
+    def literal(self, varType):
+        rng = self.random
+        if varType == 'int':
+            return str(rng.randint(0, 1000))
+        if varType == 'float':
+            return f"{rng.randint(0, 1000)}.{rng.randint(0, 99)}"
+        if varType == 'bool':
+            return rng.choice(['true', 'false'])
+        return self.colour()
+
+    def call(self, varType, scope, depth):
+        '''Call of an already emitted function, returning varType unless it is None'''
+        names = self.functionNames if varType is None else self.functionsByType[varType]
+        if not names:
+            return None
+        name = self.random.choice(names)
+        args = " , ".join(self.expression(paramType, scope, depth - 1) for paramType in self.functions[name][0])
+        return f"{name}( {args} )"
+
+    def expression(self, varType, scope, depth):
+        '''Random expression of type varType, nesting at most depth operators deep'''
+        rng = self.random
+        if depth <= 0 or rng.random() < 0.2:
+            names = scope[varType]
+            if names and rng.random() < 0.6:
+                return rng.choice(names)
+            if varType == 'int' and rng.random() < 0.1:
+                return rng.choice(['__width', '__height', f"__random_int {rng.randint(1, 100)}"])
+            if rng.random() < 0.05:
+                call = self.call(varType, scope, 1)
+                if call is not None:
+                    return call
+            return self.literal(varType)
+
+        depth -= 1
+        if varType in ('int', 'float'):
+            roll = rng.random()
+            if roll < 0.1:
+                return f"- {self.expression(varType, scope, depth)}"
+            if roll < 0.25:
+                return f"( {self.expression(varType, scope, depth)} )"
+            return f"{self.expression(varType, scope, depth)} {rng.choice(ArithmeticOps)} {self.expression(varType, scope, depth)}"
+        if varType == 'bool':
+            roll = rng.random()
+            if roll < 0.1:
+                return f"not {self.expression('bool', scope, depth)}"
+            if roll < 0.3:
+                return f"{self.expression('bool', scope, depth)} {rng.choice(['and', 'or'])} {self.expression('bool', scope, depth)}"
+            operandType = rng.choice(['int', 'float'])
+            return f"{self.expression(operandType, scope, depth)} {rng.choice(RelationalOps)} {self.expression(operandType, scope, depth)}"
+        return self.literal(varType)
+
+def generateProgram(size, seed=0, functions=True):
+    return ProgramGenerator(seed, functions=functions).program(size)
+
+if __name__ == '__main__':
+    size = parseSize(sys.argv[1]) if len(sys.argv) > 1 else 4096
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    sys.stdout.write(generateProgram(size, seed))
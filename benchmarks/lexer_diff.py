@@ -0,0 +1,206 @@
+# Differential harness: every lexer engine must produce the same token stream (or the same error) on a corpus,
+# and Lexer.update() must agree with lexing the edited source from scratch, also over long runs of edits to one
+# program, long enough for update() to merge offset segments, grow its gap and join its source pieces. The table and regex engines are
+# compared exactly. The original reference engine fails on '->' and loops forever on a character the others
+# reject, it is compared with the table engine on the part of each source in front of those, see
+# referencePrefix(), with the symbols of DFA quirk tokens left out, see normalized().
+# Run from the repository root with:  python -m benchmarks.lexer_diff [random_cases] [seed]
+import random
+import re
+import sys
+from collections import Counter
+
+import Lexer as lex
+
+from benchmarks.generator import generateProgram
+
+Engines = ["table", "regex", "reference"]
+# Engines whose results must be identical, the reference engine is checked by compareReference()
+ExactEngines = ["table", "regex"]
+
+# Snippets the modules run as __main__, plus the sample program
+Corpus = [
+    """
+                    while ( p1 < p2  and  p2 < 3 ){
+                        let x:int = 2; 
+                         let x:int = 5;               
+                    }
+                              
+                    let x:int = 5;
+                   
+                    """,
+    """
+                    y = 6 + y;
+                    """,
+    """
+                        let y:int =5 ;
+                        y = y + 5;
+ 
+                    """,
+    """
+                    test(5, true);
+                    
+                    """,
+]
+
+# Fragments random programs are stitched from, biased towards the DFA's corner cases
+Fragments = list("ab_Z09 \n\t;:,=<>!+-*/(){}[]#\x1c\xa0") + [
+    '->', 'let ', 'if', 'else', 'fun ', 'true', '__width', '__write_box', 'int', 'float', 'and', 'or',
+    'x1(', 'f())', '3.14', '#ff00aa', '//', '==', '!=', '<=', 'return ', ' ',
+]
+# Characters both engines must reject, kept rare so most cases compare real token streams
+Hazards = ['.', '$', 'é']
+
+def lexAll(source, engine):
+    '''Returns the (type, lexeme, start, end, symbol name) stream of an engine, or the error it raised'''
+    try:
+        lexer = lex.Lexer(source, engine=engine)
+    except SyntaxError as error:
+        return (type(error).__name__, str(error))
+    return streamOf(lexer)
+
+def streamOf(lexer):
+    # Trivia is merged back in, so the trivia table is checked along with the tokens
+    return [(t.type, t.lexeme, t.start, t.end, lexer.symbols.nameOf(t.symbol)) for t in lexer.iter_with_trivia()]
+
+def randomSources(count, seed):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield ''.join(rng.choice(Hazards if rng.random() < 0.01 else Fragments) for _ in range(rng.randint(0, 40)))
+
+def sampleSources():
+    with open('./something.txt', 'r') as file:
+        sample = file.read()
+    return [sample, sample + "\n", sample.encode('ascii') + b"\n"]
+
+def referencePrefix(source, tableResult):
+    '''The part of source the reference engine can lex. It raises UnboundLocalError on '->' (TokenType is a
+    local name in __tokenize, assigned after the '->' case), and where the table engine rejects a character it
+    either never advances or fails on the dead state with KeyError(-1). Both engines drop the lexeme pending at
+    '->' or at the end, so the table engine lexes the prefix to the same tokens it gave in front of the cut'''
+    if isinstance(source, bytes):
+        # Offsets count the characters of the decoded source
+        return referencePrefix(source.decode('utf-8'), tableResult).encode('utf-8')
+    end = source.find('->')
+    end = len(source) if end < 0 else end
+    if isinstance(tableResult, tuple):
+        rejected = re.search(r"at offset (\d+)", tableResult[1])
+        end = min(end, int(rejected.group(1))) if rejected else 0
+    return source[:end]
+
+def normalized(stream):
+    '''stream without the symbols of DFA quirk tokens. The reference engine interns every lexeme ending in the
+    identifier state and the keywords, the table engine every one starting with a letter or '_' and ending in a
+    word state: the two differ on lexemes like '0else' or the 'f' of a colour literal carried over a '->'. Only
+    identifiers and reserved words starting with a letter or '_' keep their symbol'''
+    if isinstance(stream, tuple):
+        return stream
+    result = []
+    for tokenType, lexeme, start, end, name in stream:
+        text = lexeme.decode('latin-1') if isinstance(lexeme, bytes) else lexeme
+        word = text[:1].isalpha() or text[:1] == '_'
+        if not (word and (tokenType == lex.TokenType.Identifier or text in lex.ReservedWords)):
+            name = None
+        result.append((tokenType, lexeme, start, end, name))
+    return result
+
+def compareReference(source, tableResult, counts):
+    '''None when the reference engine agrees with the table engine on the prefix of source it can lex, else
+    both results. counts tallies the sources cut short and those with nothing left to compare'''
+    prefix = referencePrefix(source, tableResult)
+    if len(prefix) < len(source):
+        counts['cut'] += 1
+        tableResult = lexAll(prefix, "table")
+    if isinstance(tableResult, tuple):
+        counts['not lexed'] += 1
+        return None
+    referenceResult = lexAll(prefix, "reference")
+    if normalized(referenceResult) == normalized(tableResult):
+        return None
+    return [normalized(tableResult), normalized(referenceResult)]
+
+def compare(sources, counts=None):
+    '''Lexes every source with every engine, returns the sources the engines disagree on with each engine's
+    result, the reference engine's on the prefix it was compared on'''
+    counts = Counter() if counts is None else counts
+    mismatches = []
+    for source in sources:
+        results = [lexAll(source, engine) for engine in ExactEngines]
+        reference = compareReference(source, results[0], counts)
+        if any(result != results[0] for result in results[1:]) or reference is not None:
+            mismatches.append((source, results + [reference[1] if reference else "agrees"]))
+    return mismatches
+
+def compareUpdates(count, seed, edits=15):
+    '''Applies random edits through Lexer.update() and checks each result against lexing the edited source afresh'''
+    rng = random.Random(seed)
+    mismatches = []
+    for source in randomSources(count, seed):
+        if isinstance(lexAll(source, "table"), tuple):
+            continue
+        lexer = lex.Lexer(source)
+        for _ in range(edits):
+            offset = rng.randint(0, len(lexer.code))
+            removed = rng.randint(0, min(5, len(lexer.code) - offset))
+            inserted = ''.join(rng.choice(Fragments) for _ in range(rng.randint(0, 3)))
+            edited = lexer.code[:offset] + inserted + lexer.code[offset + removed:]
+            expected = lexAll(edited, "table")
+            try:
+                lexer.update(offset, removed, inserted)
+            except SyntaxError as error:
+                if expected != (type(error).__name__, str(error)):
+                    mismatches.append((edited, ["update raised " + str(error), expected]))
+                break
+            result = streamOf(lexer)
+            if result != expected and isinstance(expected, list):
+                mismatches.append((edited, [result, expected]))
+                break
+    return mismatches
+
+def compareSession(seed, size=20000, edits=3000, every=100):
+    '''Applies edits random edits to one generated program through Lexer.update(), checking the tokens and the
+    source against lexing afresh every so often. An edit update() rejects must leave the Lexer as it was'''
+    rng = random.Random(seed)
+    source = generateProgram(size, seed)
+    lexer = lex.Lexer(source)
+    mismatches = []
+    for step in range(edits):
+        offset = rng.randint(0, len(source))
+        removed = rng.randint(0, min(5, len(source) - offset))
+        inserted = ''.join(rng.choice(Fragments) for _ in range(rng.randint(0, 3)))
+        try:
+            lexer.update(offset, removed, inserted)
+        except SyntaxError:
+            continue
+        source = source[:offset] + inserted + source[offset + removed:]
+        if step % every == 0 or step == edits - 1:
+            result, expected = streamOf(lexer), lexAll(source, "table")
+            if result != expected or lexer.code[:] != source:
+                mismatches.append((source, [result, expected]))
+                break
+    return mismatches
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+
+    sources = Corpus + sampleSources() + list(randomSources(count, seed))
+    sources += [s.encode('utf-8') for s in sources if isinstance(s, str)]
+    counts = Counter()
+    mismatches = compare(sources, counts)
+    updateMismatches = compareUpdates(count // 10, seed)
+    updateMismatches += [mismatch for session in range(3) for mismatch in compareSession(seed + session)]
+
+    for source, results in mismatches[:10]:
+        print(repr(source))
+        for engine, result in zip(Engines, results):
+            print(f"    {engine:8}: {result}")
+    for source, results in updateMismatches[:10]:
+        print(repr(source))
+        for label, result in zip(["update", "fresh"], results):
+            print(f"    {label:8}: {result}")
+    print(f"{len(sources)} sources, engines {', '.join(Engines)}: {len(mismatches)} mismatches")
+    print(f"reference engine compared on a prefix of {counts['cut']} sources (before '->' or a rejected "
+          f"character), {counts['not lexed']} with no prefix the table engine lexes")
+    print(f"incremental updates against fresh lexing: {len(updateMismatches)} mismatches")
+    sys.exit(1 if mismatches or updateMismatches else 0)
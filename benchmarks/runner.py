@@ -0,0 +1,214 @@
+# Compiler throughput benchmark over generated PArL programs: tokens/s for the Lexer, nodes/s for Parser.Parse,
+# SemanticAnalyzer.analyze time and peak memory, per program size. Results can be saved as a JSON baseline and
+# later runs compared against it.
+# Run from the repository root with:
+#     python -m benchmarks.runner --sizes 1K,64K,1M --save benchmarks/baselines/mine.json
+#     python -m benchmarks.runner --sizes 1K,64K,1M --compare benchmarks/baselines/mine.json
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import resource
+import subprocess
+import sys
+import time
+
+import ASTNodes as ast
+import Lexer as lex
+import Parser
+import SemanticAnalysis
+
+from benchmarks.bench_memory import treeBytes
+from benchmarks.generator import generateProgram, parseSize
+
+# metric -> True when a higher value is better
+Metrics = {
+    'tokens_per_second' : True,
+    'nodes_per_second' : True,
+    'analyze_seconds' : False,
+    'tree_bytes_per_node' : False,
+    'peak_rss_kb' : False,
+}
+
+def peakRss():
+    # ru_maxrss is in KB on Linux, the run only ever grows so it is the peak up to now
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def countNodes(root):
+    '''Number of AST nodes reachable from root, walked without recursion so deep trees are fine'''
+    count = 0
+    pending = [root]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, list):
+            pending.extend(node)
+        elif isinstance(node, ast.ASTNode):
+            count += 1
+            pending.extend(value for _, value in ast.fields(node) if isinstance(value, (ast.ASTNode, list)))
+    return count
+
+def best(repeat, stage):
+    '''Runs stage() repeat times, returns the fastest time and the last result'''
+    fastest = result = None
+    for _ in range(repeat):
+        elapsed, result = stage()
+        fastest = elapsed if fastest is None else min(fastest, elapsed)
+    return fastest, result
+
+def measure(size, seed, repeat, results):
+    '''Runs every stage on one generated program, posting (key, value) pairs to results as they become known'''
+    def post(**values):
+        for key, value in values.items():
+            results.put((key, value))
+
+    start = time.perf_counter()
+    source = generateProgram(size, seed)
+    post(size=size, chars=len(source), generate_seconds=time.perf_counter() - start, peak_rss_kb=peakRss())
+
+    def lexStage():
+        start = time.perf_counter()
+        lexer = lex.Lexer(source)
+        return time.perf_counter() - start, lexer
+
+    def parseStage():
+        parser = Parser.Parser(source)
+        start = time.perf_counter()
+        parser.Parse()
+        return time.perf_counter() - start, parser
+
+    def analyzeStage():
+        analyzer = SemanticAnalysis.SemanticAnalyzer(checked.ASTroot, checked.symbols, checked.lexer.lines())
+        start = time.perf_counter()
+        analyzer.analyze()
+        return time.perf_counter() - start, analyzer
+
+    try:
+        elapsed, lexer = best(repeat, lexStage)
+        tokens = len(lexer.tokens)
+        trivia = len(lexer.trivia) if lexer.trivia is not None else 0
+        post(tokens=tokens, trivia=trivia, lex_seconds=elapsed, tokens_per_second=tokens / elapsed,
+             peak_rss_kb=peakRss())
+        del lexer
+
+        elapsed, parser = best(repeat, parseStage)
+        nodes = countNodes(parser.ASTroot)
+        _, nodeBytes, listBytes = treeBytes(parser.ASTroot)
+        post(nodes=nodes, parse_seconds=elapsed, nodes_per_second=nodes / elapsed,
+             tree_bytes_per_node=(nodeBytes + listBytes) / nodes, peak_rss_kb=peakRss())
+
+        # Functions never pass the analyzer's return type check, it is timed on a program of the same size
+        # made of top level statements only
+        del parser
+        checked = Parser.Parser(generateProgram(size, seed, functions=False))
+        checked.Parse()
+        elapsed, _ = best(repeat, analyzeStage)
+        post(analyze_seconds=elapsed, peak_rss_kb=peakRss())
+    except Exception as error:
+        post(error=f"{type(error).__name__}: {error}", peak_rss_kb=peakRss())
+    post(done=True)
+
+def run(size, seed, repeat, timeout):
+    '''Measures one size in a fresh process, so peak memory is its own and a stuck stage can be stopped'''
+    results = multiprocessing.Queue()
+    worker = multiprocessing.Process(target=measure, args=(size, seed, repeat, results), daemon=True)
+    worker.start()
+    record = {}
+    deadline = time.monotonic() + timeout
+    while 'done' not in record:
+        try:
+            key, value = results.get(timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+            worker.terminate()
+            record.setdefault('error', f"timed out after {timeout}s")
+            break
+        record[key] = value
+    worker.join()
+    record.pop('done', None)
+    return record
+
+def revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def formatRecord(record):
+    parts = [f"{record['size']:>11,} B"]
+    if 'tokens_per_second' in record:
+        parts.append(f"lex {record['tokens_per_second']:>12,.0f} tokens/s")
+    if 'nodes_per_second' in record:
+        parts.append(f"parse {record['nodes_per_second']:>11,.0f} nodes/s")
+    if 'tree_bytes_per_node' in record:
+        parts.append(f"{record['tree_bytes_per_node']:5.1f} B/node")
+    if 'analyze_seconds' in record:
+        parts.append(f"analyze {record['analyze_seconds']:.4f}s")
+    parts.append(f"peak {record['peak_rss_kb'] / 1024:,.1f} MB")
+    if 'error' in record:
+        parts.append(f"stopped: {record['error']}")
+    return "  ".join(parts)
+
+def compare(baseline, results, threshold):
+    '''Prints every metric next to its baseline value, returns the number of regressions beyond threshold'''
+    previous = {record['size'] : record for record in baseline['results']}
+    regressions = 0
+    print(f"\ncompared with {baseline.get('revision')} from {baseline.get('created')}:")
+    for record in results:
+        old = previous.get(record['size'])
+        if old is None:
+            continue
+        for metric, higherIsBetter in Metrics.items():
+            if metric not in record or metric not in old or not old[metric]:
+                continue
+            change = record[metric] / old[metric] - 1
+            worse = -change if higherIsBetter else change
+            flag = "  REGRESSION" if worse > threshold else ""
+            regressions += bool(flag)
+            print(f"{record['size']:>11,} B  {metric:18} {old[metric]:>14,.4f} -> {record[metric]:>14,.4f}  {change:+.1%}{flag}")
+    return regressions
+
+if __name__ == '__main__':
+    arguments = argparse.ArgumentParser(prog="python -m benchmarks.runner")
+    arguments.add_argument('--sizes', default='1K,16K,256K', help="comma separated program sizes, 1K to 100M")
+    arguments.add_argument('--seed', type=int, default=0)
+    arguments.add_argument('--repeat', type=int, default=3, help="runs per stage, the fastest one counts")
+    arguments.add_argument('--timeout', type=float, default=600, help="seconds allowed per size")
+    arguments.add_argument('--save', help="write the results to this JSON baseline")
+    arguments.add_argument('--compare', help="JSON baseline to compare the results with")
+    arguments.add_argument('--threshold', type=float, default=0.1, help="relative change counted as a regression")
+    options = arguments.parse_args()
+
+    results = []
+    incomplete = 0
+    for size in (parseSize(text) for text in options.sizes.split(',')):
+        record = run(size, options.seed, options.repeat, options.timeout)
+        results.append(record)
+        print(formatRecord(record))
+        # Every stage has to report, a program the analyzer rejects would leave its metric out unnoticed
+        if 'analyze_seconds' not in record:
+            incomplete += 1
+
+    report = {
+        'revision' : revision(),
+        'created' : datetime.datetime.now().isoformat(timespec='seconds'),
+        'python' : platform.python_version(),
+        'machine' : platform.machine(),
+        'seed' : options.seed,
+        'repeat' : options.repeat,
+        'results' : results,
+    }
+    if options.save:
+        os.makedirs(os.path.dirname(options.save) or '.', exist_ok=True)
+        with open(options.save, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"saved {options.save}")
+    if incomplete:
+        print(f"{incomplete} size(s) without analyze_seconds")
+    if options.compare:
+        with open(options.compare) as file:
+            baseline = json.load(file)
+        sys.exit(1 if compare(baseline, results, options.threshold) or incomplete else 0)
+    sys.exit(1 if incomplete else 0)